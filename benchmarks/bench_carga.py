@@ -0,0 +1,198 @@
+"""
+Prueba de carga: miles de instancias concurrentes de los tres workflows
+contra servicios PUENTE simulados (ver servicios_simulados.py).
+
+Cada instancia recorre los pasos automáticos del workflow con las mismas
+funciones del plugin que usa CivicStream, siguiendo las ramas de sus
+condiciones hasta un estado terminal (o hasta valuation_review, que
+espera aprobación). El resultado se escribe en JSON; con --baseline se
+comparan las latencias con una corrida anterior y el script termina con
+código 1 si hay regresiones.
+
+Uso: python benchmarks/bench_carga.py [--instances 3000] [--concurrency 200]
+         [--latency-ms 10] [--latency-sigma 0.5] [--error-rate 0.0]
+         [--output resultados.json] [--baseline anterior.json]
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from itertools import cycle
+from typing import Any, Callable, Dict, List, Tuple
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from puente_catastral import aprobaciones, cache_certificados, eventos_rpp, firma, outbox, servicios
+from puente_catastral.aprobaciones import enqueue_review
+from puente_catastral.busqueda_unificada import rpp_available
+from puente_catastral.cache_certificados import analyze_with_cache, search_with_cache
+from puente_catastral.datos_mercado import gather_market_data
+from puente_catastral.firma import sign_certificate
+from puente_catastral.formularios import validate_form_action
+from puente_catastral.integraciones import CATASTRO_RECORD, RPP_SEARCH, VALUATION_SEARCH, integration_action
+from puente_catastral.sincronizacion import sync_to_rpp, update_catastral_record
+from puente_catastral.valuacion import perform_valuation
+from puente_catastral.vinculacion import MATCH_THRESHOLD, auto_linking_process
+
+from resultados import compare, latency_summary, write_results
+from servicios_simulados import ServiceProfile, start_services
+
+
+# Pasos automáticos por workflow: (step_id, acción) o (step_id, condición, estado si es falsa)
+SCENARIOS: Dict[str, Tuple[Callable[[str], Dict[str, Any]], List[tuple], str]] = {
+    "actualizacion_catastral_v1": (
+        lambda clave: {"clave_catastral": clave, "tipo_actualizacion": "Cambio de propietario"},
+        [
+            ("validate_catastral_data", validate_form_action("actualizacion_catastral_v1")),
+            ("validation_check", lambda context: context.get("validation_result") == "success", "validation_failed"),
+            ("fetch_catastro_record", integration_action(CATASTRO_RECORD, ("clave_catastral",),
+                                                         record="catastro_record")),
+            ("search_rpp_records", integration_action(RPP_SEARCH, ("clave_catastral",), records="rpp_records")),
+            ("auto_linking_process", auto_linking_process),
+            ("linking_decision", lambda context: context.get("match_score", 0) >= MATCH_THRESHOLD,
+             "manual_review_required"),
+            ("update_catastral_record", update_catastral_record),
+            ("sync_to_rpp", sync_to_rpp),
+            ("verify_synchronization", lambda context: context.get("sync_success", True), "rollback_changes"),
+        ],
+        "actualizacion_completada",
+    ),
+    "certificado_libertad_v1": (
+        lambda clave: {"search_type": "Clave Catastral", "clave_catastral": clave,
+                       "solicitante_nombre": "ANA ROJAS", "proposito": "Compraventa"},
+        [
+            ("search_unified_records", search_with_cache),
+            ("candidate_confirmation_check", lambda context: not context.get("candidate_confirmation_required", False),
+             "candidate_confirmation_required"),
+            ("search_results_check", lambda context: context.get("property_found", False), "property_not_found"),
+            ("rpp_availability_check", lambda context: rpp_available(None, context), "rpp_unavailable"),
+            ("lien_index_check", lambda context: eventos_rpp.lien_index_current(None, context),
+             "lien_index_unavailable"),
+            ("analyze_lien_status", analyze_with_cache),
+            ("generate_certificate", lambda instance, context: {
+                "status": "certificate_generated" if not context.get("liens_found", True) else "report_generated"}),
+            ("sign_certificate", sign_certificate),
+        ],
+        "certificado_emitido",
+    ),
+    "avaluo_catastral_v1": (
+        lambda clave: {"clave_catastral": clave, "proposito_avaluo": "Compraventa"},
+        [
+            ("search_property_records", integration_action(VALUATION_SEARCH, ("clave_catastral",))),
+            ("property_records_check", lambda context: context.get("records_complete", False),
+             "incomplete_records_found"),
+            ("gather_market_data", gather_market_data),
+            ("perform_valuation", perform_valuation),
+            ("valuation_data_check", lambda context: context.get("valuation_result") == "success",
+             "insufficient_valuation_data"),
+            ("enqueue_valuation_review", enqueue_review),
+        ],
+        "valuation_review",
+    ),
+}
+
+
+def run_instance(workflow_id: str, clave: str) -> Dict[str, Any]:
+    """Ejecutar una instancia hasta su estado terminal, midiendo cada paso."""
+    form, steps, final_state = SCENARIOS[workflow_id]
+    context = form(clave)
+    timings = {}
+    start = time.perf_counter()
+    state = final_state
+    for step in steps:
+        step_start = time.perf_counter()
+        try:
+            if len(step) == 3:
+                if not step[1](context):
+                    state = step[2]
+                    break
+            else:
+                context.update(step[1](None, context) or {})
+        except Exception as error:
+            state = f"error:{step[0]}:{type(error).__name__}"
+            break
+        finally:
+            timings[step[0]] = time.perf_counter() - step_start
+    return {"workflow_id": workflow_id, "state": state, "elapsed": time.perf_counter() - start, "steps": timings}
+
+
+def run_load(instances: int, concurrency: int, seed: int = 0) -> Dict[str, Any]:
+    """Lanzar ``instances`` instancias repartidas entre los tres workflows."""
+    rng = random.Random(seed)
+    jobs = [(workflow_id, f"{rng.randint(0, 99):02d}-{rng.randint(0, 999):03d}-{rng.randint(0, 999):03d}")
+            for _, workflow_id in zip(range(instances), cycle(SCENARIOS))]
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(lambda job: run_instance(*job), jobs))
+    elapsed = time.perf_counter() - start
+
+    grouped: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+    for result in results:
+        grouped[result["workflow_id"]].append(result)
+    workflows = {}
+    for workflow_id, runs in grouped.items():
+        step_timings: Dict[str, List[float]] = defaultdict(list)
+        for run in runs:
+            for step_id, seconds in run["steps"].items():
+                step_timings[step_id].append(seconds)
+        states = Counter(run["state"] for run in runs)
+        workflows[workflow_id] = {
+            "instances": len(runs),
+            "states": dict(states),
+            "errors": sum(count for state, count in states.items() if state.startswith("error:")),
+            "latency_ms": latency_summary([run["elapsed"] for run in runs]),
+            "steps": {step_id: latency_summary(values) for step_id, values in step_timings.items()},
+        }
+    return {"elapsed_seconds": round(elapsed, 3), "instances_per_second": round(instances / elapsed, 1),
+            "workflows": workflows}
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Prueba de carga de los workflows PUENTE")
+    parser.add_argument("--instances", type=int, default=3000)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--latency-ms", type=float, default=10.0)
+    parser.add_argument("--latency-sigma", type=float, default=0.5)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--output", help="Archivo JSON de resultados (por defecto, salida estándar)")
+    parser.add_argument("--baseline", help="Resultados de una corrida anterior para comparar")
+    args = parser.parse_args(argv)
+
+    # Sin llave privada en la prueba de carga: HMAC configurado explícitamente
+    os.environ.setdefault("PUENTE_SIGNING_KEY", "benchmark")
+    firma.configure_signer(firma.hmac_signer)
+    profile = ServiceProfile(args.latency_ms, args.latency_sigma, args.error_rate)
+    with tempfile.TemporaryDirectory() as tmp, start_services(profile, pool_size=args.concurrency) as services:
+        cache_certificados._default_store = cache_certificados.GenerationStore(
+            os.path.join(tmp, "generations.sqlite3"))
+        outbox._default_outbox = outbox.SyncOutbox(os.path.join(tmp, "outbox.sqlite3"))
+        aprobaciones.APPROVALS_PATH = os.path.join(tmp, "approvals.sqlite3")
+        outbox._default_outbox.ensure_worker()
+        eventos_rpp.default_consumer()
+        results = run_load(args.instances, args.concurrency)
+        results["config"] = {"instances": args.instances, "concurrency": args.concurrency,
+                             "latency_ms": args.latency_ms, "latency_sigma": args.latency_sigma,
+                             "error_rate": args.error_rate}
+        results["services"] = {name: dict(service.metrics) for name, service in services.items()}
+        results["outbox_pending"] = outbox._default_outbox.pending_count()
+        servicios.close_sessions()
+
+    document = write_results("carga", results, args.output)
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as source:
+            regressions = compare(json.load(source), document)
+        for regression in regressions:
+            print("REGRESIÓN", regression, file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,85 @@
+"""
+Benchmark de instantáneas de instancias pausadas: bytes por instancia y
+throughput de guardado/restauración, contra el contexto como JSON.
+
+Uso: python benchmarks/bench_contexto.py [--instances 20000] [--output resultados.json]
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from puente_catastral.contexto import dump_snapshot, load_snapshot
+
+from resultados import write_results
+from servicios_simulados import parcel, rpp_record
+
+
+def paused_contexts(rng: random.Random, clave: str):
+    """Contextos representativos de cada punto de pausa: (workflow, paso, contexto)."""
+    record = parcel(clave)
+    yield "actualizacion_catastral_v1", "collect_catastral_data", {
+        "clave_catastral": clave, "tipo_actualizacion": "Cambio de propietario",
+        "observaciones": "Compraventa protocolizada ante notario", "status": "awaiting_input"}
+    yield "certificado_libertad_v1", "collect_search_criteria", {
+        "search_type": "Clave Catastral", "clave_catastral": clave, "solicitante_nombre": record["propietario"],
+        "status": "awaiting_input"}
+    yield "avaluo_catastral_v1", "valuation_review", {
+        "clave_catastral": clave, "proposito_avaluo": "Compraventa", "solicitante": record["propietario"],
+        "tipo_avaluo": "Documental (sin inspección)", "status": "completed", "records_complete": True,
+        "property_record": record, "zona": clave[:6],
+        "market_data": {"zona": clave[:6], "valor_unitario_suelo": 2500.0},
+        "comparables": [dict(rpp_record(clave), precio_m2=rng.uniform(1500, 4000), distancia_m=rng.uniform(0, 1000))
+                        for _ in range(10)],
+        "valuation_result": "success", "valor_terreno": 500000.0, "valor_construccion": 312345.5,
+        "valor_catastral": 812345.5, "comparables_count": 10, "precio_m2_comparables": 2450.0,
+        "approval_id": "i-" + clave}
+
+
+def _throughput(func, items) -> float:
+    start = time.perf_counter()
+    for item in items:
+        func(item)
+    return round(len(items) / (time.perf_counter() - start), 1)
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Benchmark de instantáneas de contexto")
+    parser.add_argument("--instances", type=int, default=20000)
+    parser.add_argument("--output", help="Archivo JSON de resultados (por defecto, salida estándar)")
+    args = parser.parse_args(argv)
+
+    rng = random.Random(0)
+    by_workflow = {}
+    for i in range(args.instances // 3):
+        clave = f"{i // 100000:02d}-{(i // 100) % 1000:03d}-{i % 1000:03d}"
+        for workflow_id, step_id, context in paused_contexts(rng, clave):
+            by_workflow.setdefault(workflow_id, []).append((step_id, context))
+
+    workflows = {}
+    for workflow_id, items in by_workflow.items():
+        contexts = [context for _, context in items]
+        as_json = [json.dumps(context, ensure_ascii=False).encode("utf-8") for context in contexts]
+        snapshots = [dump_snapshot(workflow_id, context, f"i-{n}", step_id)
+                     for n, (step_id, context) in enumerate(items)]
+        workflows[workflow_id] = {
+            "instances": len(items),
+            "json_bytes_per_instance": round(sum(map(len, as_json)) / len(items), 1),
+            "snapshot_bytes_per_instance": round(sum(map(len, snapshots)) / len(items), 1),
+            "json_save_per_second": _throughput(lambda c: json.dumps(c, ensure_ascii=False).encode("utf-8"),
+                                                contexts),
+            "json_load_per_second": _throughput(json.loads, as_json),
+            "snapshot_save_per_second": _throughput(lambda item: dump_snapshot(workflow_id, item[1], None, item[0]),
+                                                    items),
+            "snapshot_load_per_second": _throughput(load_snapshot, snapshots),
+        }
+    write_results("contexto", {"workflows": workflows}, args.output)
+
+
+if __name__ == "__main__":
+    main()
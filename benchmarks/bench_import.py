@@ -0,0 +1,44 @@
+"""
+Benchmark de arranque: costo de importación del plugin medido con ``python -X importtime``.
+
+Termina con código 1 si el costo supera el presupuesto configurado
+(PUENTE_IMPORT_BUDGET_MS o primer argumento, en milisegundos).
+
+Uso: python benchmarks/bench_import.py [presupuesto_ms]
+"""
+
+import os
+import subprocess
+import sys
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+MODULE = "puente_catastral.catastral_workflows"
+DEFAULT_BUDGET_MS = float(os.environ.get("PUENTE_IMPORT_BUDGET_MS", 50.0))
+
+
+def measure_import_time(module: str = MODULE) -> float:
+    """Costo acumulado de importar el paquete, en milisegundos."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, capture_output=True, text=True, check=True
+    )
+    total_us = 0
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        # Sólo importaciones de primer nivel; las anidadas ya están en el acumulado
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if depth == 0 and name.strip().split(".")[0] == "puente_catastral":
+            total_us += int(cumulative)
+    return total_us / 1000
+
+
+def main(budget_ms: float = DEFAULT_BUDGET_MS) -> int:
+    cost_ms = measure_import_time()
+    print(f"{MODULE}: {cost_ms:.2f}ms (presupuesto {budget_ms:.2f}ms)")
+    return 0 if cost_ms <= budget_ms else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main(float(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_BUDGET_MS))
@@ -0,0 +1,34 @@
+"""
+Benchmark del registro de workflows: construcción completa vs. definición compilada.
+
+Uso: python benchmarks/bench_registry.py [iteraciones]
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from puente_catastral import catastral_workflows
+
+
+def _per_call(func, iterations: int) -> float:
+    """Tiempo medio por llamada en microsegundos."""
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def main(iterations: int = 1000) -> None:
+    for workflow_id in catastral_workflows.WORKFLOW_MODULES:
+        factory = catastral_workflows.workflow_factory(workflow_id)
+        catastral_workflows.get_compiled_workflow(workflow_id)
+        build = _per_call(factory, iterations)
+        lookup = _per_call(lambda: catastral_workflows.get_compiled_workflow(workflow_id), iterations)
+        print(f"{workflow_id:30s} build={build:10.2f}us  registry={lookup:8.3f}us  x{build / lookup:,.0f}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000)
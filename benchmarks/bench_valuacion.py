@@ -0,0 +1,40 @@
+"""
+Benchmark de valuación masiva: revaluación de un municipio sintético.
+
+Uso: python benchmarks/bench_valuacion.py [predios]
+"""
+
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from puente_catastral.valuacion import USE_CLASSES, appraise_sector
+
+
+def synthetic_roll(parcels: int):
+    rng = random.Random(0)
+    for i in range(parcels):
+        yield {
+            "clave_catastral": f"{i // 100000:02d}-{(i // 100) % 1000:03d}-{i % 1000:03d}",
+            "superficie_terreno": rng.uniform(80, 1000),
+            "superficie_construccion": rng.uniform(0, 600),
+            "uso_suelo": rng.choice(USE_CLASSES),
+            "antiguedad": rng.randint(0, 80),
+        }
+
+
+def main(parcels: int = 500000) -> None:
+    zone_values = {f"{z // 1000:02d}-{z % 1000:03d}": 1500.0 + z % 700 for z in range(100000)}
+    records = list(synthetic_roll(parcels))
+
+    start = time.perf_counter()
+    total = sum(valuation["valor_catastral"] for _, valuation in appraise_sector(records, zone_values))
+    elapsed = time.perf_counter() - start
+    print(f"{parcels} predios en {elapsed:.2f}s ({parcels / elapsed:,.0f} predios/s), total ${total:,.0f}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 500000)
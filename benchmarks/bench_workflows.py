@@ -0,0 +1,75 @@
+"""
+Micro-benchmarks de los workflows: construcción completa, consulta al
+registro, recorrido del grafo de pasos (desde el paso inicial siguiendo
+``next_steps``) y costo de la instrumentación por paso. El resultado se
+escribe en JSON.
+
+Uso: python benchmarks/bench_workflows.py [--iterations 1000] [--output resultados.json]
+"""
+
+import argparse
+import os
+import sys
+import time
+from typing import Any, Callable, List
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from puente_catastral import catastral_workflows
+from puente_catastral.instrumentacion import StepMetrics, timed
+
+from resultados import latency_summary, write_results
+
+
+def _timings(func: Callable[[], Any], iterations: int) -> List[float]:
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def traverse(workflow) -> int:
+    """Recorrer en anchura todos los pasos alcanzables; devuelve cuántos hay."""
+    start = workflow.start_step
+    seen = {start.step_id}
+    queue = [start]
+    while queue:
+        step = queue.pop()
+        for next_step in step.next_steps:
+            if next_step.step_id not in seen:
+                seen.add(next_step.step_id)
+                queue.append(next_step)
+    return len(seen)
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Micro-benchmarks de los workflows PUENTE")
+    parser.add_argument("--iterations", type=int, default=1000)
+    parser.add_argument("--output", help="Archivo JSON de resultados (por defecto, salida estándar)")
+    args = parser.parse_args(argv)
+
+    workflows = {}
+    for workflow_id in catastral_workflows.WORKFLOW_MODULES:
+        factory = catastral_workflows.workflow_factory(workflow_id)
+        workflow = catastral_workflows.get_compiled_workflow(workflow_id).workflow
+        workflows[workflow_id] = {
+            "steps": traverse(workflow),
+            "construction_ms": latency_summary(_timings(factory, args.iterations)),
+            "registry_ms": latency_summary(
+                _timings(lambda: catastral_workflows.get_compiled_workflow(workflow_id), args.iterations)),
+            "traversal_ms": latency_summary(_timings(lambda: traverse(workflow), args.iterations)),
+        }
+    step = lambda instance, context: None
+    instrumented = timed("bench", "step", "ActionStep", step, StepMetrics())
+    overhead = {
+        "plain_ms": latency_summary(_timings(lambda: step(None, None), args.iterations)),
+        "instrumented_ms": latency_summary(_timings(lambda: instrumented(None, None), args.iterations)),
+    }
+    write_results("workflows", {"iterations": args.iterations, "workflows": workflows,
+                                "instrumentation": overhead}, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""
+Resultados de benchmarks en JSON, comparables entre versiones.
+"""
+
+import json
+import platform
+import sys
+import time
+from typing import Any, Dict, List, Sequence
+
+import numpy as np
+
+from puente_catastral import __version__
+
+
+def latency_summary(seconds: Sequence[float]) -> Dict[str, float]:
+    """Percentiles de latencia en milisegundos."""
+    if not seconds:
+        return {"count": 0}
+    values = np.asarray(seconds) * 1000.0
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {"count": len(values), "mean": round(float(values.mean()), 3), "p50": round(float(p50), 3),
+            "p95": round(float(p95), 3), "p99": round(float(p99), 3), "max": round(float(values.max()), 3)}
+
+
+def write_results(name: str, results: Dict[str, Any], path: str = None) -> Dict[str, Any]:
+    """Agregar metadatos de la corrida y escribir el JSON (o imprimirlo)."""
+    document = {
+        "benchmark": name,
+        "version": __version__,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        **results,
+    }
+    text = json.dumps(document, ensure_ascii=False, indent=2)
+    if path:
+        with open(path, "w", encoding="utf-8") as target:
+            target.write(text + "\n")
+    else:
+        print(text)
+    return document
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any], metric: str = "p95",
+            tolerance: float = 0.10) -> List[str]:
+    """Regresiones de latencia (``metric``) mayores a ``tolerance`` entre dos corridas."""
+    regressions = []
+    for workflow_id, result in current.get("workflows", {}).items():
+        before = baseline.get("workflows", {}).get(workflow_id, {}).get("latency_ms", {}).get(metric)
+        after = result.get("latency_ms", {}).get(metric)
+        if before and after and after > before * (1 + tolerance):
+            regressions.append(f"{workflow_id}: {metric} {before:.1f}ms -> {after:.1f}ms "
+                               f"({baseline.get('version')} -> {current.get('version')})")
+    return regressions
@@ -0,0 +1,183 @@
+"""
+Servicios PUENTE simulados para benchmarks y pruebas de carga.
+
+Cada servicio es un ThreadingHTTPServer local que responde los endpoints
+usados por los workflows con registros sintéticos, deterministas por clave
+catastral. La latencia sigue una distribución log-normal (mediana y sigma
+configurables) y una fracción de las solicitudes responde con error 503.
+
+Uso:
+    with start_services(ServiceProfile(latency_ms=20, error_rate=0.01)) as services:
+        ...  # <SERVICIO>_URL apunta a los servicios locales
+"""
+
+import contextlib
+import json
+import math
+import os
+import random
+import threading
+import time
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, Iterator, Optional
+
+USOS = ("habitacional", "comercial", "industrial", "mixto")
+
+
+@dataclass(frozen=True)
+class ServiceProfile:
+    """Distribución de latencia y errores de un servicio simulado."""
+
+    latency_ms: float = 10.0
+    latency_sigma: float = 0.5
+    error_rate: float = 0.0
+
+    def sample_latency(self, rng: random.Random) -> float:
+        """Latencia en segundos (log-normal con la mediana configurada)."""
+        if self.latency_ms <= 0:
+            return 0.0
+        return self.latency_ms / 1000.0 * math.exp(self.latency_sigma * rng.gauss(0.0, 1.0))
+
+
+def parcel(clave: str) -> Dict[str, Any]:
+    """Registro catastral sintético de una clave."""
+    rng = random.Random(clave)
+    return {
+        "clave_catastral": clave,
+        "propietario": rng.choice(("ANA ROJAS", "LUIS PEREZ", "MARIA LOPEZ", "JOSE GARCIA")),
+        "direccion": f"CALLE {rng.randint(1, 200)} NUMERO {rng.randint(1, 999)}",
+        "superficie": rng.randint(80, 1000),
+        "superficie_terreno": rng.randint(80, 1000),
+        "superficie_construccion": rng.randint(0, 600),
+        "uso_suelo": rng.choice(USOS),
+        "antiguedad": rng.randint(0, 80),
+    }
+
+
+def rpp_record(clave: str) -> Dict[str, Any]:
+    """Registro RPP sintético que coincide con el predio de la clave."""
+    record = parcel(clave)
+    return {"folio_real": "FR-" + clave, "clave_catastral": clave, "propietario": record["propietario"],
+            "direccion": record["direccion"], "superficie": record["superficie"]}
+
+
+def _each(payload: Dict[str, Any], handler: Callable[[Dict[str, Any]], Dict[str, Any]]) -> Dict[str, Any]:
+    """Responder una solicitud individual o por lote ({"records": [...]})."""
+    if "records" in payload:
+        return {"results": [handler(record) for record in payload["records"]]}
+    return handler(payload)
+
+
+# Servicio -> endpoint -> respuesta
+ROUTES: Dict[str, Dict[str, Callable[[Dict[str, Any]], Dict[str, Any]]]] = {
+    "puente_catastral_service": {
+        "/api/catastro/search-record": lambda p: _each(p, lambda r: {"record": parcel(r["clave_catastral"])}),
+        "/api/catastro/update-record": lambda p: _each(p, lambda r: {"success": True}),
+    },
+    "puente_rpp_service": {
+        "/api/rpp/search-records": lambda p: _each(p, lambda r: {"records": [rpp_record(r["clave_catastral"])]}),
+        "/api/rpp/sync-record": lambda p: _each(p, lambda r: {"sync_success": True}),
+        "/api/rpp/events": lambda p: {"events": [], "last_sequence": 0},
+    },
+    "puente_linking_service": {
+        "/api/unified/search-for-valuation": lambda p: {
+            "status": "found", "records_complete": True, "property_record": parcel(p["clave_catastral"])},
+    },
+    "market_data_service": {
+        "/api/market/zone-analysis": lambda p: {
+            "zona": p["zona"], "valor_unitario_suelo": 1500.0 + random.Random(p["zona"]).randint(0, 3000)},
+    },
+}
+
+
+class StandInService:
+    """Servicio simulado en un puerto local libre."""
+
+    def __init__(self, name: str, profile: ServiceProfile = ServiceProfile(), seed: int = 0):
+        self.name = name
+        self.profile = profile
+        self.routes = ROUTES[name]
+        self.metrics = {"requests": 0, "errors_injected": 0}
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, name=name, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _decide(self):
+        with self._lock:
+            self.metrics["requests"] += 1
+            fail = self._rng.random() < self.profile.error_rate
+            if fail:
+                self.metrics["errors_injected"] += 1
+            return self.profile.sample_latency(self._rng), fail
+
+    def _handler(self):
+        service = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                latency, fail = service._decide()
+                time.sleep(latency)
+                route = service.routes.get(self.path)
+                if route is None:
+                    status, response = 404, {"error": "endpoint desconocido"}
+                elif fail:
+                    status, response = 503, {"error": "error simulado"}
+                else:
+                    status, response = 200, route(json.loads(body or b"{}"))
+                data = json.dumps(response).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self) -> "StandInService":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+
+@contextlib.contextmanager
+def start_services(profile: ServiceProfile = ServiceProfile(),
+                   profiles: Optional[Dict[str, ServiceProfile]] = None,
+                   pool_size: Optional[int] = None) -> Iterator[Dict[str, StandInService]]:
+    """Arrancar todos los servicios simulados y apuntar <SERVICIO>_URL a ellos."""
+    profiles = profiles or {}
+    services = {name: StandInService(name, profiles.get(name, profile), seed=index).start()
+                for index, name in enumerate(ROUTES)}
+    previous = {}
+    settings = {f"{name.upper()}_URL": service.url for name, service in services.items()}
+    if pool_size:
+        settings.update({f"{name.upper()}_POOL_SIZE": str(pool_size) for name in services})
+    for key, value in settings.items():
+        previous[key] = os.environ.get(key)
+        os.environ[key] = value
+    try:
+        yield services
+    finally:
+        for key, value in previous.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+        for service in services.values():
+            service.stop()
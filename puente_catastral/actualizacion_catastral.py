@@ -4,21 +4,14 @@ Workflow de Actualización Catastral Unificada.
 
 from typing import Dict, Any
 
-# Import CivicStream workflow components
-try:
-    from app.workflows.base import (
-        ActionStep, ConditionalStep, IntegrationStep, TerminalStep
-    )
-    from app.workflows.workflow import Workflow
-except ImportError:
-    # Fallback for development
-    import sys
-    import os
-    sys.path.append(os.path.join(os.path.dirname(__file__), '../../backend/app'))
-    from workflows.base import (
-        ActionStep, ConditionalStep, IntegrationStep, TerminalStep
-    )
-    from workflows.workflow import Workflow
+from .civicstream import (
+    ActionStep, ConditionalStep, TerminalStep, Workflow
+)
+from .formularios import ACTUALIZACION_FORM, validate_form_action
+from .integraciones import CATASTRO_RECORD, RPP_SEARCH, integration_action
+from .prefetch import collect_form_action
+from .sincronizacion import sync_to_rpp, update_catastral_record
+from .vinculacion import MATCH_THRESHOLD, auto_linking_process
 
 
 def create_actualizacion_catastral_workflow() -> Workflow:
@@ -34,41 +27,9 @@ def create_actualizacion_catastral_workflow() -> Workflow:
         step_id="collect_catastral_data",
         name="Recopilar Datos Catastrales",
         description="Recolección de información catastral del ciudadano",
-        action=lambda instance, context: {"status": "awaiting_input"},
+        action=collect_form_action("actualizacion_catastral_v1"),
         requires_citizen_input=True,
-        input_form={
-            "title": "Actualización de Registro Catastral",
-            "description": "Proporcione los datos del inmueble a actualizar",
-            "fields": [
-                {
-                    "id": "clave_catastral",
-                    "name": "clave_catastral",
-                    "label": "Clave Catastral",
-                    "type": "text",
-                    "required": True,
-                    "pattern": "^[0-9]{2}-[0-9]{3}-[0-9]{3}$",
-                    "placeholder": "09-123-456",
-                    "helpText": "Formato: XX-XXX-XXX"
-                },
-                {
-                    "id": "tipo_actualizacion",
-                    "name": "tipo_actualizacion",
-                    "label": "Tipo de Actualización",
-                    "type": "select",
-                    "required": True,
-                    "options": ["Cambio de propietario", "Modificación de superficie", "Cambio de uso de suelo", "Actualización de valor"],
-                    "helpText": "Seleccione el tipo de actualización a realizar"
-                },
-                {
-                    "id": "observaciones",
-                    "name": "observaciones",
-                    "label": "Observaciones",
-                    "type": "textarea",
-                    "required": False,
-                    "helpText": "Información adicional sobre la actualización"
-                }
-            ]
-        }
+        input_form=ACTUALIZACION_FORM
     )
     
     # Paso 2: Validar datos catastrales
@@ -76,53 +37,70 @@ def create_actualizacion_catastral_workflow() -> Workflow:
         step_id="validate_catastral_data",
         name="Validar Datos Catastrales",
         description="Validación de la información catastral proporcionada",
-        action=lambda instance, context: {"status": "validated", "validation_result": "success"}
+        action=validate_form_action("actualizacion_catastral_v1")
     )
     
-    # Paso 3: Buscar registros RPP
-    step_search_rpp = IntegrationStep(
+    # Paso 3: Verificar validación
+    step_validation_check = ConditionalStep(
+        step_id="validation_check",
+        name="Verificación de Validación",
+        description="Verificar que los datos capturados pasaron la validación",
+        condition=lambda instance, context: context.get("validation_result") == "success"
+    )
+    
+    # Paso 4: Consultar el registro catastral (propietario, dirección y superficie a vincular)
+    step_fetch_catastro = ActionStep(
+        step_id="fetch_catastro_record",
+        name="Consultar Registro Catastral",
+        description="Obtener el registro vigente del predio en Catastro",
+        # Sin registro no hay con qué comparar: match_score 0 y revisión manual
+        action=integration_action(CATASTRO_RECORD, ("clave_catastral",), fallback={"catastro_record": None},
+                                  record="catastro_record")
+    )
+    
+    # Paso 5: Buscar registros RPP
+    step_search_rpp = ActionStep(
         step_id="search_rpp_records",
         name="Buscar Registros RPP",
         description="Búsqueda automática de registros correspondientes en RPP",
-        service_name="puente_rpp_service",
-        endpoint="/api/rpp/search-records"
+        # Sin respuesta del RPP no hay candidatos: match_score 0 y revisión manual
+        action=integration_action(RPP_SEARCH, ("clave_catastral",), fallback={"rpp_records": []},
+                                  records="rpp_records")
     )
     
-    # Paso 4: Proceso de vinculación automática
+    # Paso 6: Proceso de vinculación automática
     step_auto_linking = ActionStep(
         step_id="auto_linking_process",
         name="Proceso de Vinculación Automática",
         description="Algoritmo de vinculación automática entre Catastro y RPP",
-        action=lambda instance, context: {"status": "processed", "match_score": 95}
+        action=auto_linking_process
     )
     
-    # Paso 5: Decisión de vinculación
+    # Paso 7: Decisión de vinculación
     step_linking_decision = ConditionalStep(
         step_id="linking_decision",
         name="Decisión de Vinculación",
         description="Evaluar resultado de vinculación automática",
-        condition=lambda instance, context: context.get("match_score", 0) >= 90
+        condition=lambda instance, context: context.get("match_score", 0) >= MATCH_THRESHOLD
     )
     
-    # Paso 6: Actualizar registro catastral
-    step_update_catastral = IntegrationStep(
+    # Paso 8: Actualizar registro catastral
+    step_update_catastral = ActionStep(
         step_id="update_catastral_record",
         name="Actualizar Registro Catastral",
         description="Actualizar información en sistema catastral",
-        service_name="puente_catastral_service",
-        endpoint="/api/catastro/update-record"
+        action=update_catastral_record
     )
     
-    # Paso 7: Sincronizar al RPP
-    step_sync_rpp = IntegrationStep(
+    # Paso 9: Sincronizar al RPP
+    step_sync_rpp = ActionStep(
         step_id="sync_to_rpp",
         name="Sincronizar al RPP",
         description="Sincronización bidireccional con RPP",
-        service_name="puente_rpp_service",
-        endpoint="/api/rpp/sync-record"
+        action=sync_to_rpp
     )
     
-    # Paso 8: Verificar sincronización
+    # Paso 10: Verificar sincronización
     step_verify_sync = ConditionalStep(
         step_id="verify_synchronization",
         name="Verificar Sincronización",
@@ -130,7 +108,7 @@ def create_actualizacion_catastral_workflow() -> Workflow:
         condition=lambda instance, context: context.get("sync_success", True)
     )
     
-    # Paso 9: Enviar notificación
+    # Paso 11: Enviar notificación
     step_notification = ActionStep(
         step_id="send_notification",
         name="Enviar Notificación",
@@ -145,6 +123,12 @@ def create_actualizacion_catastral_workflow() -> Workflow:
         description="Actualización catastral unificada completada exitosamente"
     )
     
+    step_validation_failed = TerminalStep(
+        step_id="validation_failed",
+        name="Validación Fallida",
+        description="Los datos capturados no son válidos; se informan los errores al ciudadano"
+    )
+    
     step_manual_review = TerminalStep(
         step_id="manual_review_required",
         name="Revisión Manual Requerida",
@@ -158,15 +142,19 @@ def create_actualizacion_catastral_workflow() -> Workflow:
     )
     
     # Definir flujo usando operador >>
-    step_collect_data >> step_validate_data >> step_search_rpp >> step_auto_linking >> step_linking_decision
+    step_collect_data >> step_validate_data >> step_validation_check
+    step_validation_check >> step_fetch_catastro >> step_search_rpp >> step_auto_linking
+    step_validation_check >> step_validation_failed
+    step_auto_linking >> step_linking_decision
     step_linking_decision >> step_update_catastral >> step_sync_rpp >> step_verify_sync >> step_notification >> step_completed
     step_linking_decision >> step_manual_review
     step_verify_sync >> step_rollback
     
     # Agregar todos los pasos al workflow
-    for step in [step_collect_data, step_validate_data, step_search_rpp, step_auto_linking, 
-                step_linking_decision, step_update_catastral, step_sync_rpp, step_verify_sync,
-                step_notification, step_completed, step_manual_review, step_rollback]:
+    for step in [step_collect_data, step_validate_data, step_validation_check, step_fetch_catastro,
+                step_search_rpp, step_auto_linking, step_linking_decision, step_update_catastral, step_sync_rpp,
+                step_verify_sync, step_notification, step_completed, step_validation_failed, step_manual_review,
+                step_rollback]:
         workflow.add_step(step)
     
     # Configurar workflow
@@ -0,0 +1,204 @@
+"""
+Actualización catastral masiva a partir de archivos CSV o JSONL.
+
+Cada fila recorre las mismas etapas que ``actualizacion_catastral_v1``
+(validación, vinculación, actualización en Catastro y sincronización al
+RPP) y termina en uno de sus estados terminales. Una fila que no pasa la
+validación del formulario termina en validación fallida y una con una
+superficie no numérica en revisión manual, ambas con sus errores y sin
+afectar al resto del lote. Como en el workflow, los registros RPP se
+vinculan contra el registro vigente del predio en Catastro y a Catastro se
+envían sólo los cambios del predio (``update_payload``). Las
+llamadas a los servicios se hacen por lote y las filas se procesan en
+flujo, por lo que la memoria no depende del tamaño del archivo. La sincronización al RPP se
+deja en la bandeja de salida durable, igual que en el workflow.
+
+Uso: python -m puente_catastral.actualizacion_masiva archivo.csv [--output resultados.jsonl]
+"""
+
+import argparse
+import csv
+import json
+import sys
+import time
+from collections import Counter
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator, List, Optional, TextIO, Tuple
+
+from . import servicios
+from .cache_certificados import invalidate_parcel
+from .formularios import FORM_VALIDATORS
+from .integraciones import CATASTRO_RECORD, FALLBACK_ERRORS, RPP_SEARCH
+from .outbox import default_outbox
+from .sincronizacion import CATASTRO_UPDATE, index_parcel, update_payload
+from .vinculacion import MATCH_THRESHOLD, auto_linking_process
+
+BATCH_SIZE = 500
+
+# Estados terminales de actualizacion_catastral_v1
+COMPLETED = "actualizacion_completada"
+VALIDATION_FAILED = "validation_failed"
+MANUAL_REVIEW = "manual_review_required"
+ROLLBACK = "rollback_changes"
+
+# Mismo formulario que el paso collect_catastral_data
+FORM_VALIDATOR = FORM_VALIDATORS["actualizacion_catastral_v1"]
+
+Outcome = Tuple[Dict[str, Any], str, Dict[str, Any]]
+
+
+def read_updates(path: str) -> Iterator[Dict[str, Any]]:
+    """Leer actualizaciones fila por fila desde un archivo CSV o JSONL."""
+    with open(path, encoding="utf-8", newline="") as source:
+        if path.endswith(".csv"):
+            yield from csv.DictReader(source)
+        else:
+            for line in source:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def _row_context(row: Dict[str, Any]) -> Tuple[Dict[str, Any], List[str]]:
+    """Contexto de una fila como el del workflow (sin campos vacíos y superficie numérica) y sus errores."""
+    context = {field: value for field, value in row.items() if value not in (None, "")}
+    errors = []
+    if "superficie" in context:
+        try:
+            context["superficie"] = float(context["superficie"])
+        except (TypeError, ValueError):
+            errors.append("superficie inválido")
+    return context, errors
+
+
+def _batched(rows: Iterable[Dict[str, Any]], size: int) -> Iterator[List[Dict[str, Any]]]:
+    iterator = iter(rows)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def _call_batch(service: Tuple[str, str], records: List[Dict[str, Any]]) -> Optional[List[Dict[str, Any]]]:
+    """Llamada por lote; devuelve un resultado por registro o None si el servicio no respondió."""
+    service_name, endpoint = service
+    try:
+        results = servicios.call_service(service_name, endpoint, {"records": records}).get("results", [])
+    except FALLBACK_ERRORS:
+        return None
+    return results if len(results) == len(records) else None
+
+
+def process_batch(rows: List[Dict[str, Any]]) -> List[Outcome]:
+    """Procesar un lote de filas hasta su estado terminal."""
+    outcomes: List[Outcome] = []
+
+    # Validación
+    valid = []
+    for row, form_errors in zip(rows, FORM_VALIDATOR.validate_many(rows)):
+        context, row_errors = _row_context(row)
+        if form_errors:
+            outcomes.append((row, VALIDATION_FAILED, {"errors": form_errors + row_errors}))
+        elif row_errors:
+            outcomes.append((row, MANUAL_REVIEW, {"errors": row_errors}))
+        else:
+            valid.append((row, context))
+    if not valid:
+        return outcomes
+
+    # Registro vigente en Catastro y búsqueda RPP
+    keys = [{"clave_catastral": context["clave_catastral"]} for _, context in valid]
+    records = _call_batch(CATASTRO_RECORD, keys)
+    searches = _call_batch(RPP_SEARCH, keys) if records is not None else None
+    if searches is None:
+        source = "consulta Catastro" if records is None else "búsqueda RPP"
+        return outcomes + [(row, MANUAL_REVIEW, {"errors": [f"{source} no disponible"]}) for row, _ in valid]
+
+    # Vinculación contra el registro catastral, igual que auto_linking_process
+    linked = []
+    for (row, context), record, search in zip(valid, records, searches):
+        context.update(catastro_record=record.get("record"), rpp_records=search.get("records") or [])
+        context.update(auto_linking_process(None, context))
+        if context["match_score"] >= MATCH_THRESHOLD:
+            linked.append((row, context))
+        else:
+            detail = {"match_score": context["match_score"]}
+            if context.get("linking_issue"):
+                detail["linking_issue"] = context["linking_issue"]
+            outcomes.append((row, MANUAL_REVIEW, detail))
+    if not linked:
+        return outcomes
+
+    # Actualización en Catastro
+    payloads = [update_payload(context) for _, context in linked]
+    updates = _call_batch(CATASTRO_UPDATE, payloads)
+    if updates is None:
+        return outcomes + [(row, ROLLBACK, {"match_score": context["match_score"],
+                                            "errors": ["actualización no disponible"]}) for row, context in linked]
+    updated = []
+    for (row, context), payload, update in zip(linked, payloads, updates):
+        if update.get("success", False):
+            invalidate_parcel(payload["clave_catastral"])
+            index_parcel(payload)
+            updated.append((row, context, payload))
+        else:
+            outcomes.append((row, ROLLBACK, {"match_score": context["match_score"],
+                                             "errors": ["actualización rechazada"]}))
+    if not updated:
+        return outcomes
+
+    # Sincronización al RPP mediante la bandeja de salida
+    try:
+        default_outbox().enqueue_many([payload for _, _, payload in updated])
+        queued = True
+    except Exception:
+        queued = False
+    for row, context, payload in updated:
+        detail = {"match_score": context["match_score"], "folio_real": payload.get("folio_real")}
+        outcomes.append((row, COMPLETED if queued else ROLLBACK, detail))
+    return outcomes
+
+
+def process_updates(rows: Iterable[Dict[str, Any]], batch_size: int = BATCH_SIZE) -> Iterator[Outcome]:
+    """Procesar un flujo de actualizaciones por lotes, generando el resultado de cada fila."""
+    for batch in _batched(rows, batch_size):
+        yield from process_batch(batch)
+
+
+def run_bulk_update(path: str, batch_size: int = BATCH_SIZE, output: Optional[TextIO] = None) -> Dict[str, Any]:
+    """Procesar un archivo completo y devolver el resumen con filas por segundo."""
+    states: Counter = Counter()
+    start = time.perf_counter()
+    for row, state, detail in process_updates(read_updates(path), batch_size):
+        states[state] += 1
+        if output is not None:
+            output.write(json.dumps({"clave_catastral": row.get("clave_catastral"), "state": state, **detail},
+                                    ensure_ascii=False) + "\n")
+    elapsed = time.perf_counter() - start
+    rows = sum(states.values())
+    return {
+        "rows": rows,
+        "elapsed_seconds": round(elapsed, 3),
+        "rows_per_second": round(rows / elapsed, 1) if elapsed else 0.0,
+        "states": dict(states),
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Actualización catastral masiva")
+    parser.add_argument("path", help="Archivo CSV o JSONL de actualizaciones")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--output", help="Archivo JSONL con el resultado por fila")
+    args = parser.parse_args(argv)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output:
+            summary = run_bulk_update(args.path, args.batch_size, output)
+    else:
+        summary = run_bulk_update(args.path, args.batch_size)
+    json.dump(summary, sys.stdout, ensure_ascii=False, indent=2)
+    print()
+
+
+if __name__ == "__main__":
+    main()
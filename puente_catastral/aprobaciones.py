@@ -0,0 +1,486 @@
+"""
+Cola de aprobaciones pendientes para valuation_review.
+
+En campañas de revaluación decenas de miles de avalúos esperan a unos
+cuantos supervisores. El paso enqueue_valuation_review registra cada
+avalúo y el ApprovalStep valuation_review queda en espera hasta que el
+planificador lo resuelve: la decisión del supervisor (``complete``) o el
+vencimiento del plazo de 24 horas se entregan al resolvedor registrado por
+el host de CivicStream con ``set_review_resolver``, que aprueba o rechaza
+el paso. El ApprovalStep lleva el mismo plazo por si el planificador no
+está disponible.
+
+El planificador mantiene:
+
+- Una cola por rol con una deque por propósito del avalúo, en orden de
+  prioridad y, dentro de cada propósito, por antigüedad. Tomar y terminar
+  una aprobación son operaciones O(1).
+- Asignación al supervisor del rol con menos aprobaciones en curso.
+- Una rueda de temporizadores jerárquica para los vencimientos de 24 h,
+  en lugar de revisar periódicamente cada instancia.
+- Métricas de profundidad de cola por rol y propósito.
+- Las aprobaciones abiertas y las decisiones aún no entregadas en una
+  tabla SQLite (PUENTE_APPROVALS_PATH), de modo que un reinicio no pierde
+  la cola ni los plazos. Una decisión que el resolvedor no acepta se
+  reintenta en el siguiente tick.
+
+Los workers de los workflows sólo insertan filas pendientes en la tabla
+(``submit``); el único planificador es el del proceso que atiende a los
+supervisores (``default_scheduler``), que en cada tick carga las filas
+nuevas.
+"""
+
+import json
+import math
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Callable, Deque, Dict, Hashable, List, Optional, Tuple
+
+REVIEW_ROLE = "valuation_supervisor"
+REVIEW_TIMEOUT_HOURS = 24
+TICK_SECONDS = float(os.environ.get("PUENTE_APPROVAL_TICK", 1.0))
+MAX_IN_PROGRESS = int(os.environ.get("PUENTE_APPROVAL_MAX_IN_PROGRESS", 20))
+APPROVALS_PATH = os.environ.get("PUENTE_APPROVALS_PATH")
+
+# Propósitos de avalúo en orden de prioridad (los no listados van al final)
+PROPOSITO_PRIORITY = ("Crédito hipotecario", "Compraventa", "Herencia", "Donación", "Actualización catastral")
+
+PENDING = "pending"
+CLAIMED = "claimed"
+APPROVED = "approved"
+REJECTED = "rejected"
+TIMED_OUT = "timed_out"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS approvals (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    approval_id TEXT NOT NULL UNIQUE,
+    role TEXT NOT NULL,
+    proposito TEXT NOT NULL,
+    enqueued_at REAL NOT NULL,
+    deadline REAL NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL,
+    supervisor TEXT
+)
+"""
+
+
+def connect(path: str) -> sqlite3.Connection:
+    """Abrir la tabla de aprobaciones, compartida por los workers y el planificador."""
+    connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=FULL")
+    connection.execute(SCHEMA)
+    return connection
+
+
+def submit(connection: sqlite3.Connection, role: str, proposito: str, approval_id: str,
+           timeout_hours: float = REVIEW_TIMEOUT_HOURS, payload: Optional[Dict[str, Any]] = None,
+           now: Optional[float] = None) -> None:
+    """Insertar una aprobación pendiente para que la cargue el planificador; ignora las repetidas."""
+    now = time.time() if now is None else now
+    connection.execute(
+        "INSERT INTO approvals (approval_id, role, proposito, enqueued_at, deadline, payload, status) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?) ON CONFLICT (approval_id) DO NOTHING",
+        (approval_id, role, proposito, now, now + timeout_hours * 3600,
+         json.dumps(payload or {}, ensure_ascii=False), PENDING))
+
+
+class TimerWheel:
+    """Rueda de temporizadores jerárquica.
+
+    El nivel 0 tiene una ranura por tick; cada nivel superior cubre el
+    rango completo del anterior en cada ranura. Programar y cancelar son
+    O(1); al avanzar, las ranuras de los niveles superiores se redistribuyen
+    hacia abajo cuando su periodo comienza.
+    """
+
+    def __init__(self, tick: float = TICK_SECONDS, slots: Tuple[int, ...] = (256, 64, 64, 64),
+                 now: Optional[float] = None):
+        self.tick = tick
+        self.slots = slots
+        self.spans = [math.prod(slots[:level]) for level in range(len(slots))]
+        self.current = int((time.time() if now is None else now) // tick)
+        self._levels: List[List[Dict[Hashable, int]]] = [[{} for _ in range(n)] for n in slots]
+        self._overdue: Dict[Hashable, int] = {}
+        self._where: Dict[Hashable, Optional[Tuple[int, int]]] = {}
+
+    def __len__(self) -> int:
+        return len(self._where)
+
+    def schedule(self, key: Hashable, deadline: float) -> None:
+        """Programar (o reprogramar) ``key`` para vencer en ``deadline`` (segundos de época)."""
+        self.cancel(key)
+        self._place(key, math.ceil(deadline / self.tick))
+
+    def _place(self, key: Hashable, due: int) -> None:
+        delta = due - self.current
+        if delta <= 0:
+            self._overdue[key] = due
+            self._where[key] = None
+            return
+        top = len(self.slots) - 1
+        level = next((level for level in range(top + 1) if delta < self.spans[level] * self.slots[level]), top)
+        index = (due // self.spans[level]) % self.slots[level]
+        self._levels[level][index][key] = due
+        self._where[key] = (level, index)
+
+    def cancel(self, key: Hashable) -> bool:
+        """Cancelar un temporizador; False si no existía."""
+        if key not in self._where:
+            return False
+        position = self._where.pop(key)
+        if position is None:
+            del self._overdue[key]
+        else:
+            del self._levels[position[0]][position[1]][key]
+        return True
+
+    def advance(self, now: float) -> List[Hashable]:
+        """Avanzar hasta ``now`` y devolver las llaves vencidas."""
+        expired = list(self._overdue)
+        for key in expired:
+            del self._where[key]
+        self._overdue.clear()
+
+        target = int(now // self.tick)
+        while self.current < target:
+            self.current += 1
+            # Redistribuir las ranuras de los niveles superiores cuyo periodo empieza
+            for level in range(1, len(self.slots)):
+                if self.current % self.spans[level]:
+                    break
+                index = (self.current // self.spans[level]) % self.slots[level]
+                entries, self._levels[level][index] = self._levels[level][index], {}
+                for key, due in entries.items():
+                    self._place(key, due)
+            entries, self._levels[0][self.current % self.slots[0]] = self._levels[0][self.current % self.slots[0]], {}
+            for key, due in entries.items():
+                if due <= self.current:
+                    del self._where[key]
+                    expired.append(key)
+                else:
+                    self._place(key, due)
+            if self._overdue:
+                expired.extend(self._overdue)
+                for key in self._overdue:
+                    del self._where[key]
+                self._overdue.clear()
+        return expired
+
+
+@dataclass
+class Approval:
+    """Aprobación pendiente de una instancia."""
+    approval_id: str
+    role: str
+    proposito: str
+    enqueued_at: float
+    deadline: float
+    payload: Dict[str, Any] = field(default_factory=dict)
+    status: str = PENDING
+    supervisor: Optional[str] = None
+
+
+class _RoleQueue:
+    """Deques por propósito de un rol, en orden de prioridad."""
+
+    def __init__(self):
+        self.queues: Dict[str, Deque[str]] = {proposito: deque() for proposito in PROPOSITO_PRIORITY}
+        self.other: Deque[str] = deque()
+        self.depth: Dict[str, int] = {}
+
+    def queue_for(self, proposito: str) -> Deque[str]:
+        return self.queues.get(proposito, self.other)
+
+
+class ApprovalScheduler:
+    """Planificador de aprobaciones con vencimientos en una rueda de temporizadores.
+
+    ``on_decision`` recibe cada aprobación resuelta (aprobada, rechazada o
+    vencida); si falla, la decisión se vuelve a entregar en el siguiente
+    tick. Con ``path`` el estado se guarda en SQLite y se restaura al abrir.
+    """
+
+    def __init__(self, clock: Callable[[], float] = time.time, max_in_progress: int = MAX_IN_PROGRESS,
+                 on_decision: Optional[Callable[[Approval], None]] = None, path: Optional[str] = None):
+        self.clock = clock
+        self.max_in_progress = max_in_progress
+        self.on_decision = on_decision
+        self.wheel = TimerWheel(now=clock())
+        self._approvals: Dict[str, Approval] = {}
+        self._roles: Dict[str, _RoleQueue] = {}
+        self._supervisors: Dict[str, Dict[str, Dict[str, Approval]]] = {}
+        # Decisiones pendientes de entregar a on_decision
+        self._undelivered: Dict[str, Approval] = {}
+        self._lock = threading.Lock()
+        self._counters = {"enqueued": 0, "approved": 0, "rejected": 0, "timed_out": 0}
+        self._worker: Optional[threading.Thread] = None
+        self._connection: Optional[sqlite3.Connection] = None
+        # Última fila de la tabla ya cargada
+        self._seq = 0
+        if path is not None:
+            self._connection = connect(path)
+            self._load_new()
+
+    def _load_new(self) -> int:
+        """Cargar las filas agregadas desde la última carga (al abrir, todas); devuelve cuántas."""
+        rows = self._connection.execute(
+            "SELECT seq, approval_id, role, proposito, enqueued_at, deadline, payload, status, supervisor "
+            "FROM approvals WHERE seq > ? ORDER BY seq", (self._seq,)).fetchall()
+        loaded = 0
+        for seq, approval_id, role, proposito, enqueued_at, deadline, payload, status, supervisor in rows:
+            self._seq = max(self._seq, seq)
+            if approval_id in self._approvals or approval_id in self._undelivered:
+                continue
+            approval = Approval(approval_id, role, proposito, enqueued_at, deadline, json.loads(payload),
+                                status, supervisor)
+            loaded += 1
+            if status == PENDING:
+                queue = self._roles.setdefault(role, _RoleQueue())
+                queue.queue_for(proposito).append(approval_id)
+                queue.depth[proposito] = queue.depth.get(proposito, 0) + 1
+                self._counters["enqueued"] += 1
+            elif status == CLAIMED:
+                self._roles.setdefault(role, _RoleQueue())
+                self._supervisors.setdefault(role, {}).setdefault(supervisor, {})[approval_id] = approval
+            else:
+                self._undelivered[approval_id] = approval
+                continue
+            self._approvals[approval_id] = approval
+            self.wheel.schedule(approval_id, deadline)
+        return loaded
+
+    def _save(self, approval: Approval) -> None:
+        if self._connection is not None:
+            self._connection.execute(
+                "INSERT INTO approvals (approval_id, role, proposito, enqueued_at, deadline, payload, status, "
+                "supervisor) VALUES (?, ?, ?, ?, ?, ?, ?, ?) ON CONFLICT (approval_id) DO UPDATE SET "
+                "status = excluded.status, supervisor = excluded.supervisor",
+                (approval.approval_id, approval.role, approval.proposito, approval.enqueued_at, approval.deadline,
+                 json.dumps(approval.payload, ensure_ascii=False), approval.status, approval.supervisor))
+
+    def _resolved(self, approval: Approval) -> None:
+        """Registrar una decisión para entregarla a on_decision (con el candado tomado)."""
+        self._counters[approval.status] += 1
+        if self.on_decision is None:
+            if self._connection is not None:
+                self._connection.execute("DELETE FROM approvals WHERE approval_id = ?", (approval.approval_id,))
+            return
+        self._save(approval)
+        self._undelivered[approval.approval_id] = approval
+
+    def deliver_decisions(self) -> int:
+        """Entregar las decisiones pendientes a on_decision; devuelve cuántas se aceptaron."""
+        if self.on_decision is None:
+            return 0
+        with self._lock:
+            pending = list(self._undelivered.values())
+            self._undelivered.clear()
+        delivered = 0
+        for approval in pending:
+            try:
+                self.on_decision(approval)
+            except Exception:
+                # El resolvedor no la aceptó: se reintenta en el siguiente tick
+                with self._lock:
+                    self._undelivered.setdefault(approval.approval_id, approval)
+                continue
+            with self._lock:
+                if self._connection is not None:
+                    self._connection.execute("DELETE FROM approvals WHERE approval_id = ?", (approval.approval_id,))
+            delivered += 1
+        return delivered
+
+    def add_supervisor(self, role: str, supervisor: str) -> None:
+        """Registrar un supervisor en un rol."""
+        with self._lock:
+            self._supervisors.setdefault(role, {}).setdefault(supervisor, {})
+            self._roles.setdefault(role, _RoleQueue())
+
+    def enqueue(self, role: str, proposito: str, timeout_hours: float = REVIEW_TIMEOUT_HOURS,
+                payload: Optional[Dict[str, Any]] = None, approval_id: Optional[str] = None) -> Approval:
+        """Agregar una aprobación pendiente al final de la cola de su propósito.
+
+        Encolar de nuevo una aprobación aún abierta devuelve la existente.
+        """
+        now = self.clock()
+        approval = Approval(approval_id=approval_id or uuid.uuid4().hex, role=role, proposito=proposito,
+                            enqueued_at=now, deadline=now + timeout_hours * 3600, payload=payload or {})
+        with self._lock:
+            if approval.approval_id in self._approvals:
+                return self._approvals[approval.approval_id]
+            queue = self._roles.setdefault(role, _RoleQueue())
+            queue.queue_for(proposito).append(approval.approval_id)
+            queue.depth[proposito] = queue.depth.get(proposito, 0) + 1
+            self._approvals[approval.approval_id] = approval
+            self.wheel.schedule(approval.approval_id, approval.deadline)
+            self._save(approval)
+            self._counters["enqueued"] += 1
+        return approval
+
+    def _pop_next(self, queue: _RoleQueue) -> Optional[Approval]:
+        for pending in (*queue.queues.values(), queue.other):
+            while pending:
+                approval = self._approvals.get(pending.popleft())
+                # Las aprobaciones vencidas se quitan de las deques al llegar a ellas
+                if approval is not None and approval.status == PENDING:
+                    queue.depth[approval.proposito] -= 1
+                    return approval
+        return None
+
+    def claim(self, role: str, supervisor: str) -> Optional[Approval]:
+        """Tomar la siguiente aprobación del rol (por propósito y antigüedad)."""
+        with self._lock:
+            in_progress = self._supervisors.setdefault(role, {}).setdefault(supervisor, {})
+            queue = self._roles.get(role)
+            if queue is None or len(in_progress) >= self.max_in_progress:
+                return None
+            approval = self._pop_next(queue)
+            if approval is not None:
+                approval.status, approval.supervisor = CLAIMED, supervisor
+                in_progress[approval.approval_id] = approval
+                self._save(approval)
+            return approval
+
+    def assign(self, role: str) -> Optional[Approval]:
+        """Asignar la siguiente aprobación al supervisor del rol con menos trabajo en curso."""
+        with self._lock:
+            supervisors = self._supervisors.get(role)
+            if not supervisors:
+                return None
+            supervisor = min(supervisors, key=lambda name: len(supervisors[name]))
+        return self.claim(role, supervisor)
+
+    def complete(self, approval_id: str, approved: bool) -> Approval:
+        """Registrar la decisión de una aprobación tomada y entregarla al workflow."""
+        with self._lock:
+            approval = self._approvals.get(approval_id)
+            if approval is None or approval.status != CLAIMED:
+                raise ValueError(f"Aprobación no tomada o inexistente: {approval_id}")
+            del self._supervisors[approval.role][approval.supervisor][approval_id]
+            del self._approvals[approval_id]
+            self.wheel.cancel(approval_id)
+            approval.status = APPROVED if approved else REJECTED
+            self._resolved(approval)
+        self.deliver_decisions()
+        return approval
+
+    def tick(self, now: Optional[float] = None) -> List[Approval]:
+        """Cargar las filas nuevas, avanzar la rueda, vencer las aprobaciones y entregar las decisiones."""
+        with self._lock:
+            if self._connection is not None:
+                self._load_new()
+            expired = []
+            for approval_id in self.wheel.advance(self.clock() if now is None else now):
+                approval = self._approvals.pop(approval_id)
+                if approval.status == PENDING:
+                    self._roles[approval.role].depth[approval.proposito] -= 1
+                else:
+                    del self._supervisors[approval.role][approval.supervisor][approval_id]
+                approval.status = TIMED_OUT
+                self._resolved(approval)
+                expired.append(approval)
+        self.deliver_decisions()
+        return expired
+
+    def metrics(self) -> Dict[str, Any]:
+        """Profundidad de cola por rol y propósito, trabajo en curso y contadores."""
+        with self._lock:
+            return dict(
+                self._counters,
+                queue_depth={role: {proposito: depth for proposito, depth in queue.depth.items() if depth}
+                             for role, queue in self._roles.items()},
+                in_progress={role: {name: len(claimed) for name, claimed in supervisors.items()}
+                             for role, supervisors in self._supervisors.items()},
+                timers=len(self.wheel),
+                undelivered=len(self._undelivered),
+            )
+
+    def run_forever(self) -> None:
+        while True:
+            try:
+                self.tick()
+            except Exception:
+                pass
+            time.sleep(self.wheel.tick)
+
+    def ensure_worker(self) -> None:
+        """Arrancar el hilo que avanza la rueda si aún no corre."""
+        if self._worker is None:
+            with self._lock:
+                if self._worker is None:
+                    self._worker = threading.Thread(target=self.run_forever, name="approval-wheel", daemon=True)
+                    self._worker.start()
+
+
+_review_resolver: Optional[Callable[[Approval], None]] = None
+
+
+def set_review_resolver(resolver: Callable[[Approval], None]) -> None:
+    """Registrar la función del host que resuelve el ApprovalStep de una instancia.
+
+    Recibe la aprobación resuelta: ``approval_id`` es el id de la instancia
+    y ``status`` es ``approved``, ``rejected`` o ``timed_out`` (que el
+    workflow trata como rechazo). Hasta que se registre, las decisiones se
+    conservan y se reintentan.
+    """
+    global _review_resolver
+    _review_resolver = resolver
+
+
+def resolve_review(approval: Approval) -> None:
+    """Entregar una decisión al resolvedor registrado."""
+    if _review_resolver is None:
+        raise RuntimeError("No hay resolvedor de revisiones registrado (set_review_resolver)")
+    _review_resolver(approval)
+
+
+_default_scheduler: Optional[ApprovalScheduler] = None
+_connection: Optional[sqlite3.Connection] = None
+_default_lock = threading.Lock()
+
+
+def approvals_path() -> str:
+    """Ruta de la tabla de aprobaciones; debe configurarse con PUENTE_APPROVALS_PATH."""
+    if not APPROVALS_PATH:
+        raise RuntimeError("PUENTE_APPROVALS_PATH no configurada")
+    return APPROVALS_PATH
+
+
+def default_scheduler() -> ApprovalScheduler:
+    """Planificador del proceso que atiende a los supervisores, con su worker si PUENTE_APPROVALS_WORKER=1."""
+    global _default_scheduler
+    if _default_scheduler is None:
+        with _default_lock:
+            if _default_scheduler is None:
+                _default_scheduler = ApprovalScheduler(on_decision=resolve_review, path=approvals_path())
+                if os.environ.get("PUENTE_APPROVALS_WORKER", "1") == "1":
+                    _default_scheduler.ensure_worker()
+    return _default_scheduler
+
+
+def default_connection() -> sqlite3.Connection:
+    """Conexión del proceso a la tabla de aprobaciones, para insertar desde los workflows."""
+    global _connection
+    if _connection is None:
+        with _default_lock:
+            if _connection is None:
+                _connection = connect(approvals_path())
+    return _connection
+
+
+def enqueue_review(instance, context: Dict[str, Any]) -> Dict[str, Any]:
+    """Acción del paso enqueue_valuation_review: registrar el avalúo para los supervisores."""
+    instance_id = getattr(instance, "instance_id", None)
+    approval_id = str(instance_id) if instance_id is not None else uuid.uuid4().hex
+    submit(default_connection(), REVIEW_ROLE, context.get("proposito_avaluo", ""), approval_id,
+           payload={"clave_catastral": context.get("clave_catastral"),
+                    "valor_catastral": context.get("valor_catastral")})
+    return {"status": "review_enqueued", "approval_id": approval_id}
@@ -4,21 +4,15 @@ Workflow de Avalúo Catastral Unificado.
 
 from typing import Dict, Any
 
-# Import CivicStream workflow components
-try:
-    from app.workflows.base import (
-        ActionStep, ConditionalStep, IntegrationStep, TerminalStep, ApprovalStep
-    )
-    from app.workflows.workflow import Workflow
-except ImportError:
-    # Fallback for development
-    import sys
-    import os
-    sys.path.append(os.path.join(os.path.dirname(__file__), '../../backend/app'))
-    from workflows.base import (
-        ActionStep, ConditionalStep, IntegrationStep, TerminalStep, ApprovalStep
-    )
-    from workflows.workflow import Workflow
+from .civicstream import (
+    ActionStep, ConditionalStep, TerminalStep, ApprovalStep, Workflow
+)
+from .aprobaciones import REVIEW_ROLE, REVIEW_TIMEOUT_HOURS, enqueue_review
+from .datos_mercado import gather_market_data
+from .formularios import AVALUO_FORM
+from .integraciones import VALUATION_SEARCH, integration_action
+from .prefetch import collect_form_action
+from .valuacion import perform_valuation
 
 
 def create_avaluo_catastral_workflow() -> Workflow:
@@ -34,58 +28,18 @@ def create_avaluo_catastral_workflow() -> Workflow:
         step_id="collect_avaluo_request",
         name="Recopilar Solicitud de Avalúo",
         description="Recolección de información para solicitud de avalúo",
-        action=lambda instance, context: {"status": "awaiting_input"},
+        action=collect_form_action("avaluo_catastral_v1"),
         requires_citizen_input=True,
-        input_form={
-            "title": "Solicitud de Avalúo Catastral",
-            "description": "Proporcione información para realizar el avalúo",
-            "fields": [
-                {
-                    "id": "clave_catastral",
-                    "name": "clave_catastral",
-                    "label": "Clave Catastral",
-                    "type": "text",
-                    "required": True,
-                    "pattern": "^[0-9]{2}-[0-9]{3}-[0-9]{3}$",
-                    "helpText": "Clave catastral del inmueble a valuar"
-                },
-                {
-                    "id": "proposito_avaluo",
-                    "name": "proposito_avaluo",
-                    "label": "Propósito del Avalúo",
-                    "type": "select",
-                    "required": True,
-                    "options": ["Compraventa", "Crédito hipotecario", "Herencia", "Donación", "Actualización catastral"],
-                    "helpText": "Para qué se utilizará el avalúo"
-                },
-                {
-                    "id": "solicitante",
-                    "name": "solicitante",
-                    "label": "Nombre del Solicitante",
-                    "type": "text",
-                    "required": True,
-                    "helpText": "Nombre de quien solicita el avalúo"
-                },
-                {
-                    "id": "tipo_avaluo",
-                    "name": "tipo_avaluo",
-                    "label": "Tipo de Avalúo",
-                    "type": "select",
-                    "required": True,
-                    "options": ["Físico (con inspección)", "Documental (sin inspección)"],
-                    "helpText": "Tipo de avalúo solicitado"
-                }
-            ]
-        }
+        input_form=AVALUO_FORM
     )
     
     # Paso 2: Buscar registros de propiedad
-    step_search_records = IntegrationStep(
+    step_search_records = ActionStep(
         step_id="search_property_records",
         name="Buscar Registros de Propiedad",
         description="Búsqueda de información completa en Catastro y RPP",
-        service_name="puente_linking_service",
-        endpoint="/api/unified/search-for-valuation"
+        # Sin respuesta de la búsqueda el avalúo termina en registros incompletos
+        action=integration_action(VALUATION_SEARCH, ("clave_catastral",), fallback={"records_complete": False})
     )
     
     # Paso 3: Verificar registros
@@ -96,13 +50,12 @@ def create_avaluo_catastral_workflow() -> Workflow:
         condition=lambda instance, context: context.get("records_complete", False)
     )
     
-    # Paso 4: Recopilar datos de mercado
-    step_market_data = IntegrationStep(
+    # Paso 4: Recopilar datos de mercado (caché por zona)
+    step_market_data = ActionStep(
         step_id="gather_market_data",
         name="Recopilar Datos de Mercado", 
         description="Obtener información de mercado inmobiliario de la zona",
-        service_name="market_data_service",
-        endpoint="/api/market/zone-analysis"
+        action=gather_market_data
     )
     
     # Paso 5: Realizar valuación
@@ -110,19 +63,35 @@ def create_avaluo_catastral_workflow() -> Workflow:
         step_id="perform_valuation",
         name="Realizar Valuación",
         description="Valuación considerando todos los datos disponibles",
-        action=lambda instance, context: {"status": "completed", "valuation_result": "success"}
+        action=perform_valuation
+    )
+    
+    # Paso 6: Verificar que hubo datos para valuar
+    step_valuation_check = ConditionalStep(
+        step_id="valuation_data_check",
+        name="Verificación de Datos de Valuación",
+        description="Verificar que se obtuvo un valor unitario de suelo para el predio",
+        condition=lambda instance, context: context.get("valuation_result") == "success"
     )
     
-    # Paso 6: Revisión de valuación
+    # Paso 7: Registrar la revisión para el planificador de aprobaciones
+    step_enqueue_review = ActionStep(
+        step_id="enqueue_valuation_review",
+        name="Encolar Revisión de Valuación",
+        description="Registrar el avalúo para los supervisores por propósito y antigüedad",
+        action=enqueue_review
+    )
+    
+    # Paso 8: Revisión de valuación (la resuelve el planificador de aprobaciones)
     step_review = ApprovalStep(
         step_id="valuation_review",
         name="Revisión de Valuación",
         description="Revisión técnica del avalúo por supervisor",
-        approvers=["valuation_supervisor"],
-        timeout_hours=24
+        approvers=[REVIEW_ROLE],
+        timeout_hours=REVIEW_TIMEOUT_HOURS
     )
     
-    # Paso 7: Generar reporte de avalúo
+    # Paso 9: Generar reporte de avalúo
     step_generate_report = ActionStep(
         step_id="generate_appraisal_report",
         name="Generar Reporte de Avalúo",
@@ -143,21 +112,30 @@ def create_avaluo_catastral_workflow() -> Workflow:
         description="No se encontró información suficiente para realizar el avalúo"
     )
     
+    step_insufficient = TerminalStep(
+        step_id="insufficient_valuation_data",
+        name="Datos de Valuación Insuficientes",
+        description="No hay valor unitario de suelo de la zona ni comparables suficientes para valuar"
+    )
+    
     step_correction = TerminalStep(
         step_id="valuation_requires_correction",
         name="Valuación Requiere Corrección",
-        description="La valuación fue rechazada y requiere correcciones"
+        description="La valuación fue rechazada o su revisión venció y requiere correcciones"
     )
     
     # Definir flujo usando operador >>
     step_collect_request >> step_search_records >> step_records_check
-    step_records_check >> step_market_data >> step_valuation >> step_review >> step_generate_report >> step_completed
+    step_records_check >> step_market_data >> step_valuation >> step_valuation_check
+    step_valuation_check >> step_enqueue_review >> step_review >> step_generate_report >> step_completed
     step_records_check >> step_incomplete
+    step_valuation_check >> step_insufficient
     step_review >> step_correction
     
     # Agregar todos los pasos al workflow
     for step in [step_collect_request, step_search_records, step_records_check, step_market_data,
-                step_valuation, step_review, step_generate_report, step_completed, step_incomplete, step_correction]:
+                step_valuation, step_valuation_check, step_enqueue_review, step_review, step_generate_report,
+                step_completed, step_incomplete, step_insufficient, step_correction]:
         workflow.add_step(step)
     
     # Configurar workflow
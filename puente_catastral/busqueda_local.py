@@ -0,0 +1,294 @@
+"""
+Índice local de búsqueda aproximada por dirección y propietario.
+
+Los textos se normalizan (sin acentos, mayúsculas y, en direcciones,
+abreviaturas expandidas: "Av." -> "AVENIDA", "Col." -> "COLONIA",
+"C." -> "CALLE") y se indexan por trigramas en un índice invertido. Los
+candidatos se ordenan por coeficiente de Dice entre los trigramas de la
+consulta y los del texto indexado.
+
+El índice se actualiza en línea desde la actualización catastral. Con
+PUENTE_SEARCH_INDEX_PATH cada escritura se guarda en una tabla SQLite
+compartida y numerada (``seq``): antes de buscar, cada proceso aplica los
+cambios que otros procesos registraron desde su última lectura, de modo
+que todos ven las mismas actualizaciones. Sin esa variable el índice sólo
+vive en el proceso (desarrollo y pruebas). ``save``/``load`` exportan e
+importan una instantánea JSON comprimida.
+"""
+
+import gzip
+import json
+import os
+import sqlite3
+import threading
+from collections import Counter
+from typing import Dict, List, Optional, Set, Tuple
+
+from .vinculacion import normalize_text
+
+# Abreviaturas comunes en domicilios
+ADDRESS_ABBREVIATIONS = {
+    "AV": "AVENIDA", "AVE": "AVENIDA", "AVDA": "AVENIDA",
+    "C": "CALLE", "CLL": "CALLE",
+    "COL": "COLONIA", "FRACC": "FRACCIONAMIENTO", "BO": "BARRIO",
+    "CDA": "CERRADA", "PRIV": "PRIVADA", "PROL": "PROLONGACION",
+    "CALZ": "CALZADA", "BLVD": "BOULEVARD", "CJON": "CALLEJON", "AND": "ANDADOR",
+    "NO": "NUMERO", "NUM": "NUMERO", "MZ": "MANZANA", "MZA": "MANZANA", "LT": "LOTE",
+    "INT": "INTERIOR", "EXT": "EXTERIOR", "DEPTO": "DEPARTAMENTO",
+    "STA": "SANTA", "STO": "SANTO", "GRAL": "GENERAL", "LIC": "LICENCIADO",
+}
+
+FIELDS = ("direccion", "propietario")
+MIN_SCORE = 0.5
+MIN_SEED_TRIGRAMS = 3
+MAX_CANDIDATES = 2000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS parcels (
+    clave_catastral TEXT PRIMARY KEY,
+    direccion TEXT,
+    propietario TEXT,
+    deleted INTEGER NOT NULL DEFAULT 0,
+    seq INTEGER NOT NULL
+)
+"""
+SEQ_INDEX = "CREATE INDEX IF NOT EXISTS parcels_seq ON parcels (seq)"
+
+
+def normalize_address(value: Optional[str]) -> str:
+    """Normalizar un domicilio expandiendo abreviaturas."""
+    return " ".join(ADDRESS_ABBREVIATIONS.get(token, token) for token in normalize_text(value).split())
+
+
+def normalize_field(field: str, value: Optional[str]) -> str:
+    return normalize_address(value) if field == "direccion" else normalize_text(value)
+
+
+def trigrams(text: str) -> Set[str]:
+    """Trigramas de un texto normalizado, con relleno en los extremos."""
+    if not text:
+        return set()
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class _FieldIndex:
+    """Índice invertido de trigramas de un solo campo."""
+
+    def __init__(self):
+        self.postings: Dict[str, Set[str]] = {}
+        self.sizes: Dict[str, int] = {}
+
+    def add(self, doc_id: str, text: str) -> None:
+        grams = trigrams(text)
+        if not grams:
+            return
+        self.sizes[doc_id] = len(grams)
+        postings = self.postings
+        for gram in grams:
+            posting = postings.get(gram)
+            if posting is None:
+                postings[gram] = {doc_id}
+            else:
+                posting.add(doc_id)
+
+    def remove(self, doc_id: str, text: str) -> None:
+        for gram in trigrams(text):
+            posting = self.postings.get(gram)
+            if posting is not None:
+                posting.discard(doc_id)
+                if not posting:
+                    del self.postings[gram]
+        self.sizes.pop(doc_id, None)
+
+    def search(self, text: str, limit: int) -> List[Tuple[str, float]]:
+        query = trigrams(text)
+        postings = sorted((self.postings.get(gram, set()) for gram in query), key=len)
+        postings = [posting for posting in postings if posting]
+        if not postings:
+            return []
+
+        # Los trigramas menos frecuentes generan candidatos (al menos MIN_SEED_TRIGRAMS,
+        # para tolerar errores de captura); el resto sólo suma coincidencias
+        hits: Counter = Counter()
+        seeds = 0
+        for posting in postings:
+            if seeds >= MIN_SEED_TRIGRAMS and len(hits) >= MAX_CANDIDATES:
+                break
+            hits.update(posting)
+            seeds += 1
+        for posting in postings[seeds:]:
+            hits.update(hits.keys() & posting)
+
+        scored = [(doc_id, 2.0 * common / (len(query) + self.sizes[doc_id])) for doc_id, common in hits.items()]
+        scored.sort(key=lambda item: (-item[1], item[0]))
+        return [(doc_id, round(score, 4)) for doc_id, score in scored[:limit]]
+
+
+class SearchIndex:
+    """Índice de predios por dirección y propietario, compartido entre procesos si tiene ``path``."""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self._documents: Dict[str, Dict[str, str]] = {}
+        self._fields = {field: _FieldIndex() for field in FIELDS}
+        self._lock = threading.Lock()
+        self._connection: Optional[sqlite3.Connection] = None
+        self._seq = 0
+        self._data_version: Optional[int] = None
+        if path:
+            self._connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(SCHEMA)
+            self._connection.execute(SEQ_INDEX)
+            with self._lock:
+                self._refresh()
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._refresh()
+            return len(self._documents)
+
+    def _set(self, clave_catastral: str, document: Dict[str, str]) -> None:
+        """Reemplazar el documento de un predio en el índice en memoria."""
+        previous = self._documents.get(clave_catastral, {})
+        self._documents[clave_catastral] = document
+        for field, index in self._fields.items():
+            if previous.get(field) == document.get(field):
+                continue
+            if previous.get(field):
+                index.remove(clave_catastral, normalize_field(field, previous[field]))
+            index.add(clave_catastral, normalize_field(field, document.get(field)))
+
+    def _discard(self, clave_catastral: str) -> None:
+        document = self._documents.pop(clave_catastral, {})
+        for field, index in self._fields.items():
+            index.remove(clave_catastral, normalize_field(field, document.get(field)))
+
+    def _refresh(self, force: bool = False) -> None:
+        """Aplicar los cambios registrados en la tabla desde la última lectura."""
+        if self._connection is None:
+            return
+        # data_version sólo cambia cuando otra conexión confirma una escritura
+        data_version = self._connection.execute("PRAGMA data_version").fetchone()[0]
+        if data_version == self._data_version and not force:
+            return
+        self._data_version = data_version
+        rows = self._connection.execute(
+            "SELECT clave_catastral, direccion, propietario, deleted, seq FROM parcels WHERE seq > ? ORDER BY seq",
+            (self._seq,)).fetchall()
+        for clave, direccion, propietario, deleted, seq in rows:
+            if deleted:
+                self._discard(clave)
+            else:
+                self._set(clave, {field: value for field, value in (("direccion", direccion),
+                                                                    ("propietario", propietario)) if value})
+            self._seq = seq
+
+    def _write(self, clave_catastral: str, changes: Optional[Dict[str, str]]) -> None:
+        """Registrar en la tabla un cambio (``None`` quita el predio) y aplicar los pendientes."""
+        self._connection.execute("BEGIN IMMEDIATE")
+        try:
+            row = self._connection.execute(
+                "SELECT direccion, propietario FROM parcels WHERE clave_catastral = ? AND deleted = 0",
+                (clave_catastral,)).fetchone()
+            document = {"direccion": row[0], "propietario": row[1]} if row else {}
+            document.update(changes or {})
+            self._connection.execute(
+                "INSERT INTO parcels (clave_catastral, direccion, propietario, deleted, seq) "
+                "VALUES (?, ?, ?, ?, (SELECT COALESCE(MAX(seq), 0) + 1 FROM parcels)) "
+                "ON CONFLICT(clave_catastral) DO UPDATE SET direccion = excluded.direccion, "
+                "propietario = excluded.propietario, deleted = excluded.deleted, seq = excluded.seq",
+                (clave_catastral, document.get("direccion"), document.get("propietario"), int(changes is None)))
+            self._connection.execute("COMMIT")
+        except Exception:
+            self._connection.execute("ROLLBACK")
+            raise
+        self._refresh(force=True)
+
+    def upsert(self, clave_catastral: str, direccion: Optional[str] = None,
+               propietario: Optional[str] = None) -> None:
+        """Agregar o actualizar un predio; los campos omitidos conservan su valor."""
+        changes = {field: value for field, value in (("direccion", direccion), ("propietario", propietario))
+                   if value is not None}
+        with self._lock:
+            if self._connection is not None:
+                self._write(clave_catastral, changes)
+            else:
+                self._set(clave_catastral, dict(self._documents.get(clave_catastral, {}), **changes))
+
+    def remove(self, clave_catastral: str) -> None:
+        """Quitar un predio del índice."""
+        with self._lock:
+            if self._connection is not None:
+                self._write(clave_catastral, None)
+            else:
+                self._discard(clave_catastral)
+
+    def search(self, field: str, text: str, limit: int = 10) -> List[Dict[str, object]]:
+        """Candidatos ordenados por similitud para ``direccion`` o ``propietario``."""
+        with self._lock:
+            self._refresh()
+            results = self._fields[field].search(normalize_field(field, text), limit)
+            return [dict(self._documents[doc_id], clave_catastral=doc_id, score=score)
+                    for doc_id, score in results]
+
+    def save(self, path: str) -> None:
+        """Guardar una instantánea comprimida (una línea JSON por predio)."""
+        with self._lock:
+            self._refresh()
+            tmp_path = path + ".tmp"
+            with gzip.open(tmp_path, "wt", encoding="utf-8") as snapshot:
+                for clave, document in self._documents.items():
+                    snapshot.write(json.dumps([clave, document.get("direccion"), document.get("propietario")],
+                                              ensure_ascii=False, separators=(",", ":")) + "\n")
+            os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "SearchIndex":
+        """Cargar un índice desde su instantánea."""
+        index = cls()
+        with gzip.open(path, "rt", encoding="utf-8") as snapshot:
+            for line in snapshot:
+                clave, direccion, propietario = json.loads(line)
+                index.upsert(clave, direccion, propietario)
+        return index
+
+
+_default_index: Optional[SearchIndex] = None
+_default_lock = threading.Lock()
+
+
+def default_index() -> SearchIndex:
+    """Índice del proceso sobre la tabla compartida PUENTE_SEARCH_INDEX_PATH (sólo en memoria si no se define)."""
+    global _default_index
+    if _default_index is None:
+        with _default_lock:
+            if _default_index is None:
+                _default_index = SearchIndex(os.environ.get("PUENTE_SEARCH_INDEX_PATH"))
+    return _default_index
+
+
+# Tipo de búsqueda del formulario -> campo del índice
+SEARCH_TYPE_FIELDS = {"Dirección": "direccion", "Propietario": "propietario"}
+
+
+def resolve_search_criteria(context: Dict[str, object]) -> Dict[str, object]:
+    """Resolver la clave catastral de una búsqueda por dirección o propietario.
+
+    Sólo se resuelve la clave cuando un único candidato coincide
+    exactamente con el texto buscado (una vez normalizado). Si no, se
+    devuelven los candidatos que superan MIN_SCORE para que el solicitante
+    confirme el predio (``candidate_confirmation_required``): un parecido
+    aproximado no basta para certificar un inmueble.
+    """
+    field = SEARCH_TYPE_FIELDS.get(context.get("search_type"))
+    if context.get("clave_catastral") or field is None or not context.get(field):
+        return {}
+    candidates = [candidate for candidate in default_index().search(field, context[field])
+                  if candidate["score"] >= MIN_SCORE]
+    query = normalize_field(field, context[field])
+    exact = [candidate for candidate in candidates if normalize_field(field, candidate.get(field)) == query]
+    if len(exact) == 1:
+        return {"search_candidates": candidates, "clave_catastral": exact[0]["clave_catastral"]}
+    return {"search_candidates": candidates, "candidate_confirmation_required": bool(candidates)}
@@ -0,0 +1,83 @@
+"""
+Búsqueda simultánea en Catastro y RPP para el certificado de libertad de gravamen.
+"""
+
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Tuple
+
+from .integraciones import fetch_async
+
+# Backends consultados en paralelo: fuente -> (servicio, endpoint)
+SEARCH_BACKENDS = {
+    "catastro": ("puente_catastral_service", "/api/catastro/search-record"),
+    "rpp": ("puente_rpp_service", "/api/rpp/search-records"),
+}
+
+# Timeout propio de cada backend, en segundos
+SEARCH_TIMEOUTS = {
+    "catastro": float(os.environ.get("PUENTE_CATASTRO_SEARCH_TIMEOUT", 5.0)),
+    "rpp": float(os.environ.get("PUENTE_RPP_SEARCH_TIMEOUT", 8.0)),
+}
+
+SEARCH_FIELDS = ("search_type", "clave_catastral")
+
+
+async def _query_backend(source: str, payload: Dict[str, Any]) -> Tuple[str, str, Any]:
+    """Consultar un backend respetando su timeout; devuelve (fuente, estado, respuesta)."""
+    service_name, endpoint = SEARCH_BACKENDS[source]
+    timeout = SEARCH_TIMEOUTS[source]
+    try:
+        result = await asyncio.wait_for(fetch_async(service_name, endpoint, payload, timeout), timeout)
+        return source, "ok", result
+    except asyncio.TimeoutError:
+        return source, "timeout", None
+    except Exception:
+        return source, "error", None
+
+
+async def fan_out_search(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Consultar Catastro y RPP de forma concurrente y combinar los resultados."""
+    outcomes = await asyncio.gather(*(_query_backend(source, payload) for source in SEARCH_BACKENDS))
+    return merge_results(outcomes)
+
+
+def merge_results(outcomes: List[Tuple[str, str, Any]]) -> Dict[str, Any]:
+    """Combinar las respuestas de ambos registros en el contexto del workflow."""
+    responses = {source: result or {} for source, status, result in outcomes if status == "ok"}
+    unavailable = [source for source, status, _ in outcomes if status != "ok"]
+
+    catastro_record = responses.get("catastro", {}).get("record")
+    rpp_records = responses.get("rpp", {}).get("records", [])
+
+    # Sin respuesta del RPP no se conocen sus gravámenes: rpp_available detiene la emisión
+    return {
+        "status": "partial" if unavailable else "searched",
+        "catastro_record": catastro_record,
+        "rpp_records": rpp_records,
+        "property_found": bool(catastro_record) or bool(rpp_records),
+        "partial_results": bool(unavailable),
+        "unavailable_sources": unavailable,
+    }
+
+
+def rpp_available(instance, context: Dict[str, Any]) -> bool:
+    """Condición del paso rpp_availability_check: el RPP respondió a la búsqueda."""
+    return "rpp" not in (context.get("unavailable_sources") or [])
+
+
+def _run(coro):
+    """Ejecutar una corrutina desde código síncrono, haya o no un event loop activo."""
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(asyncio.run, coro).result()
+
+
+def search_unified_records(instance, context: Dict[str, Any]) -> Dict[str, Any]:
+    """Acción del paso search_unified_records."""
+    payload = {field: context.get(field) for field in SEARCH_FIELDS}
+    return _run(fan_out_search(payload))
@@ -0,0 +1,211 @@
+"""
+Caché de resultados del certificado de libertad de gravamen.
+
+Cada resultado (búsqueda y análisis de gravámenes) se guarda junto con la
+generación del predio con la que se calculó. Cualquier escritura
+confirmada sobre el predio (actualización en Catastro, entrega de la
+sincronización al RPP o evento de gravamen) le asigna una generación nueva,
+de modo que un resultado calculado antes de la escritura nunca vuelve a
+servirse.
+
+Las generaciones viven en una tabla SQLite compartida por todos los
+procesos (PUENTE_CACHE_GENERATIONS_PATH): una escritura registrada por el
+worker de la bandeja de salida o por el consumidor de eventos del RPP
+invalida también las cachés de los demás procesos. Cada generación es un
+valor aleatorio, no un contador, por lo que las filas sin escrituras en
+más de CACHE_TTL segundos se pueden borrar sin que una generación vuelva a
+coincidir con la de un resultado guardado.
+"""
+
+import os
+import random
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from . import integraciones
+from .busqueda_local import resolve_search_criteria
+from .busqueda_unificada import search_unified_records
+from .gravamenes import analyze_lien_status
+
+CACHE_SIZE = int(os.environ.get("PUENTE_CERTIFICATE_CACHE_SIZE", 10000))
+CACHE_TTL = float(os.environ.get("PUENTE_CERTIFICATE_CACHE_TTL", 3600))
+GENERATIONS_PATH = os.environ.get("PUENTE_CACHE_GENERATIONS_PATH", "puente_cache_generations.sqlite3")
+
+# Cada cuántas escrituras se borran las generaciones vencidas
+PRUNE_EVERY = 1000
+
+# Campos del contexto que se reutilizan en un acierto
+CACHED_FIELDS = ("property_found", "catastro_record", "rpp_records", "liens_found", "gravamenes")
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS generations (
+    clave_catastral TEXT PRIMARY KEY,
+    generation INTEGER NOT NULL,
+    updated_at REAL NOT NULL
+)
+"""
+
+
+class GenerationStore:
+    """Generación vigente de cada predio, compartida entre procesos mediante SQLite."""
+
+    def __init__(self, path: str = GENERATIONS_PATH, ttl: float = CACHE_TTL):
+        self.path = path
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute(SCHEMA)
+
+    def get(self, clave_catastral: str) -> int:
+        """Generación actual del predio (0 si no tiene escrituras recientes)."""
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT generation FROM generations WHERE clave_catastral = ?", (clave_catastral,)).fetchone()
+        return row[0] if row else 0
+
+    def bump(self, clave_catastral: str) -> int:
+        """Asignar una generación nueva al predio."""
+        generation = random.getrandbits(62) + 1
+        now = time.time()
+        with self._lock:
+            self._connection.execute(
+                "INSERT INTO generations (clave_catastral, generation, updated_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(clave_catastral) DO UPDATE SET generation = excluded.generation, "
+                "updated_at = excluded.updated_at",
+                (clave_catastral, generation, now))
+            self._writes += 1
+            if self._writes % PRUNE_EVERY == 0:
+                # Un resultado más antiguo que el TTL ya no se sirve: su generación no hace falta
+                self._connection.execute("DELETE FROM generations WHERE updated_at < ?", (now - self.ttl,))
+        return generation
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM generations").fetchone()[0]
+
+
+_default_store: Optional[GenerationStore] = None
+_default_lock = threading.Lock()
+
+
+def default_generation_store() -> GenerationStore:
+    """Almacén de generaciones compartido (PUENTE_CACHE_GENERATIONS_PATH)."""
+    global _default_store
+    if _default_store is None:
+        with _default_lock:
+            if _default_store is None:
+                _default_store = GenerationStore()
+    return _default_store
+
+
+class CertificateCache:
+    """Caché LRU de resultados por predio, invalidada por generación."""
+
+    def __init__(self, max_size: int = CACHE_SIZE, ttl: float = CACHE_TTL,
+                 generations: Optional[GenerationStore] = None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._generations = generations
+        self._entries: "OrderedDict[str, Tuple[int, float, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._metrics = {"hits": 0, "misses": 0, "invalidations": 0, "stale_puts": 0}
+
+    @property
+    def generations(self) -> GenerationStore:
+        """Almacén de generaciones; por omisión el compartido entre procesos."""
+        return self._generations if self._generations is not None else default_generation_store()
+
+    def generation(self, clave_catastral: str) -> int:
+        """Generación actual del predio (estado del registro)."""
+        return self.generations.get(clave_catastral)
+
+    def get(self, clave_catastral: str) -> Optional[Dict[str, Any]]:
+        """Resultado vigente del predio, o None."""
+        with self._lock:
+            entry = self._entries.get(clave_catastral)
+            if (entry is None or entry[0] != self.generation(clave_catastral)
+                    or time.monotonic() - entry[1] >= self.ttl):
+                self._metrics["misses"] += 1
+                return None
+            self._metrics["hits"] += 1
+            self._entries.move_to_end(clave_catastral)
+            return entry[2]
+
+    def put(self, clave_catastral: str, result: Dict[str, Any], generation: int) -> None:
+        """Guardar un resultado calculado con la generación indicada."""
+        with self._lock:
+            if generation != self.generation(clave_catastral):
+                # El predio cambió mientras se calculaba el resultado
+                self._metrics["stale_puts"] += 1
+                return
+            self._entries[clave_catastral] = (generation, time.monotonic(), result)
+            self._entries.move_to_end(clave_catastral)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, clave_catastral: str) -> None:
+        """Registrar una escritura sobre el predio."""
+        self.generations.bump(clave_catastral)
+        with self._lock:
+            self._entries.pop(clave_catastral, None)
+            self._metrics["invalidations"] += 1
+
+    def metrics(self) -> Dict[str, Any]:
+        """Aciertos, fallos, proporción de aciertos e invalidaciones."""
+        with self._lock:
+            metrics = dict(self._metrics, size=len(self._entries))
+        lookups = metrics["hits"] + metrics["misses"]
+        metrics["hit_ratio"] = round(metrics["hits"] / lookups, 4) if lookups else 0.0
+        return metrics
+
+
+certificate_cache = CertificateCache()
+
+
+def invalidate_parcel(clave_catastral: Optional[str]) -> None:
+    """Invalidar los certificados en caché y las consultas precargadas de un predio."""
+    if clave_catastral:
+        certificate_cache.invalidate(clave_catastral)
+        integraciones.prefetcher.discard(clave_catastral)
+
+
+def search_with_cache(instance, context: Dict[str, Any]) -> Dict[str, Any]:
+    """Acción del paso search_unified_records, reutilizando resultados vigentes.
+
+    Las búsquedas por dirección o propietario se resuelven primero a una
+    clave catastral con el índice local; si sólo hay candidatos aproximados
+    no se consulta a Catastro ni al RPP hasta que el solicitante confirme.
+    """
+    resolved = resolve_search_criteria(context)
+    if resolved.get("candidate_confirmation_required"):
+        return {"status": "awaiting_confirmation", "certificate_cache_hit": False, **resolved}
+    context = dict(context, **resolved)
+    clave = context.get("clave_catastral")
+    cached = certificate_cache.get(clave) if clave else None
+    if cached is not None:
+        return {"status": "searched", "certificate_cache_hit": True, **resolved, **cached}
+
+    generation = certificate_cache.generation(clave) if clave else None
+    return {**resolved, **search_unified_records(instance, context),
+            "certificate_cache_hit": False, "certificate_generation": generation}
+
+
+def analyze_with_cache(instance, context: Dict[str, Any]) -> Dict[str, Any]:
+    """Acción del paso analyze_lien_status; guarda el resultado completo en caché."""
+    if context.get("certificate_cache_hit"):
+        return {"status": "analyzed"}
+
+    result = analyze_lien_status(instance, context)
+    clave = context.get("clave_catastral")
+    if clave and not context.get("partial_results"):
+        merged = dict(context, **result)
+        certificate_cache.put(clave, {field: merged.get(field) for field in CACHED_FIELDS},
+                              context.get("certificate_generation", 0))
+    return result
@@ -1,8 +1,180 @@
 """
 Workflows catastrales PUENTE para MuniStream.
 Módulo principal que incorpora todos los workflows.
+
+Cada workflow se importa al solicitarlo por primera vez y se construye
+y valida una sola vez por proceso; las llamadas posteriores reciben la
+misma definición compilada desde el registro. Al compilarse, sus pasos se
+instrumentan (ver instrumentacion.py). La definición es compartida por
+convención: quien la recibe no debe modificarla.
+
+La versión de una definición es el hash de todos los módulos del paquete
+de los que depende (sus importaciones, de forma transitiva: formularios,
+acciones, etc.). Se calcula al cargarla por primera vez y sólo se vuelve a
+calcular con ``reload_definitions``.
 """
 
-from .actualizacion_catastral import create_actualizacion_catastral_workflow
-from .certificado_libertad import create_certificado_libertad_workflow
-from .avaluo_catastral import create_avaluo_catastral_workflow
\ No newline at end of file
+import ast
+import hashlib
+import importlib
+import importlib.util
+import os
+import re
+import threading
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Tuple
+
+import yaml
+
+from . import __version__
+from .instrumentacion import instrument_workflow
+
+MANIFEST_PATH = os.environ.get("PUENTE_MANIFEST_PATH",
+                               os.path.join(os.path.dirname(__file__), "..", "civicstream.yaml"))
+
+
+@dataclass(frozen=True)
+class CompiledWorkflow:
+    """Definición de workflow ya construida y validada."""
+    workflow_id: str
+    version: str
+    workflow: Any
+
+
+def load_manifest(path: str = MANIFEST_PATH) -> Dict[str, Tuple[str, str]]:
+    """Workflows declarados en civicstream.yaml: workflow_id -> (módulo, función).
+
+    Cada entrada de ``workflows`` declara ``module`` y ``function`` y, si no
+    es la primera versión, ``id``. Las funciones que el manifiesto toma de
+    este módulo (``create_<nombre>_workflow``) se construyen con la función
+    del mismo nombre del módulo ``.<nombre>``; las de otro módulo, con la
+    función declarada. Sin ``id`` el workflow es ``<nombre>_v1``.
+    """
+    with open(path, encoding="utf-8") as manifest:
+        entries = (yaml.safe_load(manifest) or {}).get("workflows") or []
+    modules = {}
+    for entry in entries:
+        function = entry["function"]
+        module = entry.get("module", __name__)
+        match = re.fullmatch(r"create_(\w+)_workflow", function)
+        if match is None and (module == __name__ or "id" not in entry):
+            raise ValueError(f"Función de workflow no reconocida en civicstream.yaml: {function}")
+        workflow_id = entry.get("id") or f"{match.group(1)}_v1"
+        modules[workflow_id] = (f".{match.group(1)}", function) if module == __name__ else (module, function)
+    return modules
+
+
+# Workflows registrados, tomados de civicstream.yaml para que no diverjan del manifiesto
+WORKFLOW_MODULES: Dict[str, Tuple[str, str]] = load_manifest()
+
+_factories: Dict[str, Callable[[], Any]] = {}
+_versions: Dict[Callable[[], Any], str] = {}
+_compiled: Dict[Tuple[str, str], CompiledWorkflow] = {}
+_lock = threading.Lock()
+
+
+def workflow_factory(workflow_id: str) -> Callable[[], Any]:
+    """Obtener la fábrica de un workflow, importando su módulo sólo cuando se necesita."""
+    factory = _factories.get(workflow_id)
+    if factory is None:
+        module_name, function_name = WORKFLOW_MODULES[workflow_id]
+        module = importlib.import_module(module_name, __package__)
+        factory = _factories[workflow_id] = getattr(module, function_name)
+    return factory
+
+
+def _module_file(module_name: str) -> str:
+    spec = importlib.util.find_spec(module_name)
+    return spec.origin
+
+
+def definition_modules(module_name: str) -> List[str]:
+    """Módulos del paquete de los que depende ``module_name`` (incluido), según sus importaciones."""
+    root = __package__.split(".")[0]
+    pending, seen = [module_name], set()
+    while pending:
+        name = pending.pop()
+        if name in seen:
+            continue
+        seen.add(name)
+        path = _module_file(name)
+        package = name if path.endswith("__init__.py") else name.rpartition(".")[0]
+        with open(path, encoding="utf-8") as source:
+            tree = ast.parse(source.read())
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                pending += [alias.name for alias in node.names if alias.name.split(".")[0] == root]
+            elif isinstance(node, ast.ImportFrom):
+                base = importlib.util.resolve_name("." * node.level + (node.module or ""), package)
+                if base.split(".")[0] != root:
+                    continue
+                # "from . import servicios" importa módulos; "from .x import y", nombres de x
+                submodules = [f"{base}.{alias.name}" for alias in node.names] if node.module is None else []
+                found = [sub for sub in submodules if importlib.util.find_spec(sub) is not None]
+                pending += found or [base]
+    return sorted(seen)
+
+
+def definition_version(factory: Callable[[], Any]) -> str:
+    """Clave de versión de una definición: hash de los módulos de los que depende."""
+    version = _versions.get(factory)
+    if version is None:
+        digest = hashlib.sha256(__version__.encode("utf-8"))
+        for name in definition_modules(factory.__module__):
+            with open(_module_file(name), "rb") as source:
+                digest.update(name.encode("utf-8") + b"\0" + source.read())
+        version = _versions[factory] = digest.hexdigest()[:16]
+    return version
+
+
+def reload_definitions() -> None:
+    """Recalcular las versiones al usarse de nuevo; las definiciones que cambiaron se reconstruyen."""
+    with _lock:
+        _versions.clear()
+
+
+def get_compiled_workflow(workflow_id: str) -> CompiledWorkflow:
+    """Obtener la definición compilada de un workflow, construyéndola si no existe."""
+    factory = workflow_factory(workflow_id)
+    key = (workflow_id, definition_version(factory))
+    compiled = _compiled.get(key)
+    if compiled is None:
+        with _lock:
+            compiled = _compiled.get(key)
+            if compiled is None:
+                workflow = instrument_workflow(workflow_id, factory())
+                compiled = CompiledWorkflow(workflow_id=workflow_id, version=key[1], workflow=workflow)
+                # Descartar versiones anteriores del mismo workflow
+                for stale_key in [k for k in _compiled if k[0] == workflow_id]:
+                    del _compiled[stale_key]
+                _compiled[key] = compiled
+    return compiled
+
+
+def clear_registry() -> None:
+    """Vaciar el registro (p. ej. tras recargar módulos en desarrollo)."""
+    with _lock:
+        _compiled.clear()
+        _versions.clear()
+        _factories.clear()
+
+
+def _manifest_id(function_name: str) -> str:
+    """Workflow que el manifiesto construye con ``function_name`` de este módulo."""
+    return next(workflow_id for workflow_id, (module_name, function) in WORKFLOW_MODULES.items()
+                if function == function_name and module_name.startswith("."))
+
+
+def create_actualizacion_catastral_workflow():
+    """Obtener el workflow de actualización catastral unificada."""
+    return get_compiled_workflow(_manifest_id("create_actualizacion_catastral_workflow")).workflow
+
+
+def create_certificado_libertad_workflow():
+    """Obtener el workflow de certificado de libertad de gravamen."""
+    return get_compiled_workflow(_manifest_id("create_certificado_libertad_workflow")).workflow
+
+
+def create_avaluo_catastral_workflow():
+    """Obtener el workflow de avalúo catastral unificado."""
+    return get_compiled_workflow(_manifest_id("create_avaluo_catastral_workflow")).workflow
@@ -4,25 +4,22 @@ Workflow de Certificado de Libertad de Gravamen Unificado.
 
 from typing import Dict, Any
 
-# Import CivicStream workflow components
-try:
-    from app.workflows.base import (
-        ActionStep, ConditionalStep, IntegrationStep, TerminalStep
-    )
-    from app.workflows.workflow import Workflow
-except ImportError:
-    # Fallback for development
-    import sys
-    import os
-    sys.path.append(os.path.join(os.path.dirname(__file__), '../../backend/app'))
-    from workflows.base import (
-        ActionStep, ConditionalStep, IntegrationStep, TerminalStep
-    )
-    from workflows.workflow import Workflow
+from .civicstream import (
+    ActionStep, ConditionalStep, TerminalStep, Workflow
+)
+
+from .busqueda_unificada import rpp_available
+from .cache_certificados import analyze_with_cache, search_with_cache
+from .eventos_rpp import lien_index_current
+from .firma import check_signing_configuration, sign_certificate
+from .formularios import CERTIFICADO_FORM
+from .prefetch import collect_form_action
 
 
 def create_certificado_libertad_workflow() -> Workflow:
     """Crear workflow de certificado de libertad de gravamen unificado."""
+    # Sin firmante el workflow no podría emitir certificados: fallar al cargarlo
+    check_signing_configuration()
     workflow = Workflow(
         workflow_id="certificado_libertad_v1",
         name="Certificado de Libertad de Gravamen",
@@ -34,52 +31,28 @@ def create_certificado_libertad_workflow() -> Workflow:
         step_id="collect_search_criteria",
         name="Recopilar Criterios de Búsqueda",
         description="Recolección de criterios para búsqueda de la propiedad",
-        action=lambda instance, context: {"status": "awaiting_input"},
+        action=collect_form_action("certificado_libertad_v1"),
         requires_citizen_input=True,
-        input_form={
-            "title": "Certificado de Libertad de Gravamen",
-            "description": "Proporcione información para localizar la propiedad",
-            "fields": [
-                {
-                    "id": "search_type",
-                    "name": "search_type",
-                    "label": "Tipo de Búsqueda",
-                    "type": "select",
-                    "required": True,
-                    "options": ["Clave Catastral", "Folio Real", "Dirección", "Propietario"],
-                    "helpText": "Seleccione el tipo de criterio de búsqueda"
-                },
-                {
-                    "id": "clave_catastral",
-                    "name": "clave_catastral",
-                    "label": "Clave Catastral",
-                    "type": "text",
-                    "required": False,
-                    "pattern": "^[0-9]{2}-[0-9]{3}-[0-9]{3}$",
-                    "helpText": "Clave catastral si se conoce"
-                },
-                {
-                    "id": "solicitante_nombre",
-                    "name": "solicitante_nombre",
-                    "label": "Nombre del Solicitante",
-                    "type": "text",
-                    "required": True,
-                    "helpText": "Nombre de quien solicita el certificado"
-                }
-            ]
-        }
-    )
-    
-    # Paso 2: Buscar registros unificados
-    step_search_records = IntegrationStep(
+        input_form=CERTIFICADO_FORM
+    )
+    
+    # Paso 2: Buscar registros unificados (Catastro y RPP en paralelo, con caché por predio)
+    step_search_records = ActionStep(
         step_id="search_unified_records",
         name="Buscar Registros Unificados",
         description="Búsqueda simultánea en Catastro y RPP",
-        service_name="puente_linking_service",
-        endpoint="/api/unified/search-property"
+        action=search_with_cache
+    )
+    
+    # Paso 3: Verificar que la búsqueda no quedó en candidatos aproximados por confirmar
+    step_confirmation_check = ConditionalStep(
+        step_id="candidate_confirmation_check",
+        name="Verificación de Predio Identificado",
+        description="Verificar que la búsqueda identificó un único predio sin ambigüedad",
+        condition=lambda instance, context: not context.get("candidate_confirmation_required", False)
     )
     
-    # Paso 3: Verificar resultados
+    # Paso 4: Verificar resultados
     step_results_check = ConditionalStep(
         step_id="search_results_check",
         name="Verificación de Resultados",
@@ -87,15 +60,31 @@ def create_certificado_libertad_workflow() -> Workflow:
         condition=lambda instance, context: context.get("property_found", False)
     )
     
-    # Paso 4: Analizar estado de gravámenes
+    # Paso 5: Verificar que el RPP respondió (sin él no se certifica libertad de gravamen)
+    step_rpp_check = ConditionalStep(
+        step_id="rpp_availability_check",
+        name="Verificación de Disponibilidad del RPP",
+        description="Verificar que la búsqueda incluyó los registros del RPP",
+        condition=rpp_available
+    )
+    
+    # Paso 6: Verificar que el índice de gravámenes está al día con el feed del RPP
+    step_lien_index_check = ConditionalStep(
+        step_id="lien_index_check",
+        name="Verificación del Índice de Gravámenes",
+        description="Verificar que el índice local refleja los últimos eventos del RPP",
+        condition=lien_index_current
+    )
+    
+    # Paso 7: Analizar estado de gravámenes
     step_analyze_liens = ActionStep(
         step_id="analyze_lien_status",
         name="Analizar Estado de Gravámenes",
         description="Analizar información de gravámenes de ambos sistemas",
-        action=lambda instance, context: {"status": "analyzed", "liens_found": False}
+        action=analyze_with_cache
     )
     
-    # Paso 5: Decisión sobre gravámenes
+    # Paso 8: Decisión sobre gravámenes
     step_lien_decision = ConditionalStep(
         step_id="lien_analysis_result",
         name="Resultado de Análisis de Gravámenes",
@@ -103,7 +92,7 @@ def create_certificado_libertad_workflow() -> Workflow:
         condition=lambda instance, context: not context.get("liens_found", True)
     )
     
-    # Paso 6: Generar certificado libre
+    # Paso 9: Generar certificado libre
     step_generate_clean = ActionStep(
         step_id="generate_clean_certificate",
         name="Generar Certificado Libre",
@@ -111,7 +100,7 @@ def create_certificado_libertad_workflow() -> Workflow:
         action=lambda instance, context: {"status": "certificate_generated"}
     )
     
-    # Paso 7: Generar reporte de gravámenes
+    # Paso 10: Generar reporte de gravámenes
     step_generate_report = ActionStep(
         step_id="generate_lien_report",
         name="Generar Reporte de Gravámenes",
@@ -119,12 +108,12 @@ def create_certificado_libertad_workflow() -> Workflow:
         action=lambda instance, context: {"status": "report_generated"}
     )
     
-    # Paso 8: Firmar certificado
+    # Paso 11: Firmar certificado
     step_sign = ActionStep(
         step_id="sign_certificate",
         name="Firmar Certificado",
         description="Aplicar firma digital al certificado",
-        action=lambda instance, context: {"status": "signed"}
+        action=sign_certificate
     )
     
     # Pasos terminales
@@ -140,17 +129,39 @@ def create_certificado_libertad_workflow() -> Workflow:
         description="No se pudo localizar la propiedad con los criterios proporcionados"
     )
     
+    step_confirmation_required = TerminalStep(
+        step_id="candidate_confirmation_required",
+        name="Predio por Confirmar",
+        description="La búsqueda encontró predios parecidos; el solicitante debe confirmar su clave catastral"
+    )
+    
+    step_rpp_unavailable = TerminalStep(
+        step_id="rpp_unavailable",
+        name="RPP No Disponible",
+        description="No se pudo consultar el RPP; el certificado no se emite sin verificar gravámenes"
+    )
+    
+    step_lien_index_unavailable = TerminalStep(
+        step_id="lien_index_unavailable",
+        name="Índice de Gravámenes No Actualizado",
+        description="El índice de gravámenes no está al día con el RPP; el certificado no se emite"
+    )
+    
     # Definir flujo usando operador >>
-    step_collect_criteria >> step_search_records >> step_results_check
-    step_results_check >> step_analyze_liens >> step_lien_decision
+    step_collect_criteria >> step_search_records >> step_confirmation_check >> step_results_check
+    step_confirmation_check >> step_confirmation_required
+    step_results_check >> step_rpp_check >> step_lien_index_check >> step_analyze_liens >> step_lien_decision
     step_results_check >> step_not_found
+    step_rpp_check >> step_rpp_unavailable
+    step_lien_index_check >> step_lien_index_unavailable
     step_lien_decision >> step_generate_clean >> step_sign >> step_completed
     step_lien_decision >> step_generate_report >> step_sign >> step_completed
     
     # Agregar todos los pasos al workflow
-    for step in [step_collect_criteria, step_search_records, step_results_check, step_analyze_liens,
-                step_lien_decision, step_generate_clean, step_generate_report, step_sign, 
-                step_completed, step_not_found]:
+    for step in [step_collect_criteria, step_search_records, step_confirmation_check, step_results_check,
+                step_rpp_check, step_lien_index_check, step_analyze_liens, step_lien_decision,
+                step_generate_clean, step_generate_report, step_sign, step_completed, step_not_found,
+                step_confirmation_required, step_rpp_unavailable, step_lien_index_unavailable]:
         workflow.add_step(step)
     
     # Configurar workflow
@@ -0,0 +1,21 @@
+"""
+Componentes de workflow de CivicStream, importados una sola vez por proceso.
+"""
+
+# Import CivicStream workflow components
+try:
+    from app.workflows.base import (
+        ActionStep, ConditionalStep, IntegrationStep, TerminalStep, ApprovalStep
+    )
+    from app.workflows.workflow import Workflow
+except ImportError:
+    # Fallback for development
+    import sys
+    import os
+    _backend_path = os.path.join(os.path.dirname(__file__), '../../backend/app')
+    if _backend_path not in sys.path:
+        sys.path.append(_backend_path)
+    from workflows.base import (
+        ActionStep, ConditionalStep, IntegrationStep, TerminalStep, ApprovalStep
+    )
+    from workflows.workflow import Workflow
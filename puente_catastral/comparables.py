@@ -0,0 +1,157 @@
+"""
+Índice espacial en memoria de compraventas recientes para avalúos.
+
+Las ventas se guardan en una rejilla de celdas cuadradas sobre los
+centroides de los predios (proyectados a metros). Insertar una venta es
+O(1) y nunca requiere reconstruir el índice; buscar comparables sólo
+revisa las celdas que cubren el radio solicitado.
+
+El índice del proceso arranca con las ventas exportadas del RPP en
+``PUENTE_COMPARABLES_PATH`` (JSONL, una venta por línea con su
+``sequence`` del feed) y recibe las siguientes como eventos
+``compraventa`` del feed del RPP (ver eventos_rpp.py).
+"""
+
+import heapq
+import json
+import math
+import os
+import threading
+from datetime import date
+from typing import Any, Dict, List, Optional, Tuple
+
+from .gravamenes import DateLike, date_ordinal
+
+EARTH_RADIUS_M = 6371008.8
+CELL_SIZE_M = float(os.environ.get("PUENTE_COMPARABLES_CELL_M", 250.0))
+
+# Parámetros por defecto de la búsqueda de comparables
+COMPARABLES_K = 10
+COMPARABLES_RADIUS_M = 1000.0
+COMPARABLES_WINDOW_DAYS = 730
+
+
+class ComparablesIndex:
+    """Rejilla de ventas por celda para consultas de k vecinos en radio y ventana de tiempo."""
+
+    def __init__(self, cell_size: float = CELL_SIZE_M, reference_latitude: Optional[float] = None):
+        self.cell_size = cell_size
+        self.reference_latitude = reference_latitude
+        self._cells: Dict[Tuple[int, int], List[Tuple[float, float, int, Dict[str, Any]]]] = {}
+        self._lock = threading.Lock()
+        self._size = 0
+        # Último evento del feed del RPP reflejado en el índice
+        self.last_sequence = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _project(self, latitude: float, longitude: float) -> Tuple[float, float]:
+        """Proyección equirectangular a metros alrededor de la latitud de referencia."""
+        if self.reference_latitude is None:
+            self.reference_latitude = latitude
+        scale = math.cos(math.radians(self.reference_latitude))
+        return (EARTH_RADIUS_M * math.radians(longitude) * scale,
+                EARTH_RADIUS_M * math.radians(latitude))
+
+    def _cell(self, x: float, y: float) -> Tuple[int, int]:
+        return int(x // self.cell_size), int(y // self.cell_size)
+
+    def insert(self, sale: Dict[str, Any]) -> None:
+        """Registrar una venta (``latitud``, ``longitud``, ``fecha``, ``uso_suelo``, ``precio_m2``)."""
+        with self._lock:
+            x, y = self._project(float(sale["latitud"]), float(sale["longitud"]))
+            entry = (x, y, date_ordinal(sale.get("fecha"), date.today().toordinal()), sale)
+            self._cells.setdefault(self._cell(x, y), []).append(entry)
+            self._size += 1
+            self.last_sequence = max(self.last_sequence, sale.get("sequence", 0))
+
+    def advance(self, sequence: int) -> None:
+        """Marcar como leído un evento del feed que no agrega ventas."""
+        with self._lock:
+            self.last_sequence = max(self.last_sequence, sequence)
+
+    def nearest(self, latitude: float, longitude: float, k: int = COMPARABLES_K,
+                radius: float = COMPARABLES_RADIUS_M, window_days: int = COMPARABLES_WINDOW_DAYS,
+                on: DateLike = None, uso_suelo: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Las k ventas más cercanas dentro del radio (m) y de la ventana de tiempo."""
+        if not self._size:
+            return []
+        x, y = self._project(latitude, longitude)
+        day = date_ordinal(on, date.today().toordinal())
+        since = day - window_days
+        cx, cy = self._cell(x, y)
+        reach = int(math.ceil(radius / self.cell_size))
+        radius_sq = radius * radius
+
+        candidates = []
+        for i in range(cx - reach, cx + reach + 1):
+            for j in range(cy - reach, cy + reach + 1):
+                for sx, sy, sale_day, sale in self._cells.get((i, j), ()):
+                    if not since <= sale_day <= day:
+                        continue
+                    if uso_suelo and sale.get("uso_suelo") != uso_suelo:
+                        continue
+                    distance_sq = (sx - x) ** 2 + (sy - y) ** 2
+                    if distance_sq <= radius_sq:
+                        candidates.append((distance_sq, id(sale), sale))
+
+        return [dict(sale, distancia_m=round(math.sqrt(distance_sq), 1))
+                for distance_sq, _, sale in heapq.nsmallest(k, candidates)]
+
+
+def is_recent_sale(sale: Dict[str, Any], window_days: int = COMPARABLES_WINDOW_DAYS) -> bool:
+    """True si la venta tiene ubicación y cae en la ventana de búsqueda de comparables."""
+    if sale.get("latitud") is None or sale.get("longitud") is None:
+        return False
+    return date_ordinal(sale.get("fecha"), date.today().toordinal()) >= date.today().toordinal() - window_days
+
+
+def load_sales(path: str, index: Optional[ComparablesIndex] = None) -> ComparablesIndex:
+    """Cargar un índice con las ventas recientes de un archivo JSONL."""
+    index = index if index is not None else ComparablesIndex()
+    with open(path, encoding="utf-8") as source:
+        for line in source:
+            if line.strip():
+                sale = json.loads(line)
+                if is_recent_sale(sale):
+                    index.insert(sale)
+                else:
+                    index.advance(sale.get("sequence", 0))
+    return index
+
+
+_default_index: Optional[ComparablesIndex] = None
+_default_lock = threading.Lock()
+
+
+def default_index() -> ComparablesIndex:
+    """Índice del proceso, cargado desde PUENTE_COMPARABLES_PATH si existe."""
+    global _default_index
+    if _default_index is None:
+        with _default_lock:
+            if _default_index is None:
+                path = os.environ.get("PUENTE_COMPARABLES_PATH")
+                _default_index = load_sales(path) if path and os.path.exists(path) else ComparablesIndex()
+    return _default_index
+
+
+def register_sale(sale: Dict[str, Any], index: Optional[ComparablesIndex] = None) -> bool:
+    """Agregar una compraventa registrada al índice (el del proceso por defecto).
+
+    Las ventas sin ubicación o fuera de la ventana de búsqueda sólo avanzan
+    el cursor del feed; devuelve True si la venta se agregó.
+    """
+    index = index if index is not None else default_index()
+    if not is_recent_sale(sale):
+        index.advance(sale.get("sequence", 0))
+        return False
+    index.insert(sale)
+    return True
+
+
+def find_comparables(record: Dict[str, Any], **options) -> List[Dict[str, Any]]:
+    """Comparables de un predio con ``latitud`` y ``longitud``; lista vacía si no tiene ubicación."""
+    if record.get("latitud") is None or record.get("longitud") is None:
+        return []
+    return default_index().nearest(float(record["latitud"]), float(record["longitud"]), **options)
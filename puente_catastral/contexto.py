@@ -0,0 +1,219 @@
+"""
+Contextos tipados por workflow e instantáneas binarias compactas.
+
+Las instancias pausadas (captura del ciudadano, valuation_review) se
+guardan como instantáneas binarias:
+
+    encabezado (struct) | JSON posicional compacto (zlib si conviene)
+
+El encabezado lleva la firma ``PCS1``, la versión del formato, el
+workflow, las banderas, cuántos campos del modelo tenía el esquema al
+guardarse y la huella de esos campos. Los campos del modelo se guardan por
+posición (sin nombres), los campos fuera del esquema viajan en un
+diccionario aparte y los campos asignados explícitamente a None se listan
+por posición, para distinguirlos de los no asignados.
+
+Los campos nuevos deben agregarse al final de cada modelo: una instantánea
+cuyos campos son un prefijo del esquema actual se restaura (los campos
+agregados quedan sin asignar); cualquier otro cambio de esquema hace que
+se rechace.
+"""
+
+import json
+import struct
+import zlib
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Type
+
+from pydantic import BaseModel
+
+try:
+    from pydantic import ConfigDict
+    PYDANTIC_V2 = True
+except ImportError:  # pydantic 1.x
+    from pydantic import Extra
+    PYDANTIC_V2 = False
+
+
+if PYDANTIC_V2:
+    class WorkflowContext(BaseModel):
+        """Contexto base: campos comunes y campos adicionales permitidos."""
+        model_config = ConfigDict(extra="allow")
+
+        clave_catastral: Optional[str] = None
+        status: Optional[str] = None
+else:
+    class WorkflowContext(BaseModel):
+        """Contexto base: campos comunes y campos adicionales permitidos."""
+        clave_catastral: Optional[str] = None
+        status: Optional[str] = None
+
+        class Config:
+            extra = Extra.allow
+
+
+class ActualizacionContext(WorkflowContext):
+    tipo_actualizacion: Optional[str] = None
+    observaciones: Optional[str] = None
+    propietario: Optional[str] = None
+    direccion: Optional[str] = None
+    superficie: Optional[float] = None
+    uso_suelo: Optional[str] = None
+    validation_result: Optional[str] = None
+    rpp_records: Optional[List[Dict[str, Any]]] = None
+    match_score: Optional[float] = None
+    linked_rpp_record: Optional[Dict[str, Any]] = None
+    catastro_update: Optional[Dict[str, Any]] = None
+    sync_success: Optional[bool] = None
+    sync_idempotency_key: Optional[str] = None
+    sync_error: Optional[str] = None
+    catastro_record: Optional[Dict[str, Any]] = None
+    catastro_update_success: Optional[bool] = None
+    validation_errors: Optional[List[str]] = None
+    linking_issue: Optional[str] = None
+
+
+class CertificadoContext(WorkflowContext):
+    search_type: Optional[str] = None
+    direccion: Optional[str] = None
+    propietario: Optional[str] = None
+    solicitante_nombre: Optional[str] = None
+    search_candidates: Optional[List[Dict[str, Any]]] = None
+    candidate_confirmation_required: Optional[bool] = None
+    catastro_record: Optional[Dict[str, Any]] = None
+    rpp_records: Optional[List[Dict[str, Any]]] = None
+    property_found: Optional[bool] = None
+    partial_results: Optional[bool] = None
+    unavailable_sources: Optional[List[str]] = None
+    certificate_cache_hit: Optional[bool] = None
+    certificate_generation: Optional[int] = None
+    liens_found: Optional[bool] = None
+    gravamenes: Optional[List[Dict[str, Any]]] = None
+    fecha_emision: Optional[str] = None
+    document_hash: Optional[str] = None
+    merkle_root: Optional[str] = None
+    signature: Optional[str] = None
+    inclusion_proof: Optional[List[List[str]]] = None
+    batch_size: Optional[int] = None
+
+
+class AvaluoContext(WorkflowContext):
+    proposito_avaluo: Optional[str] = None
+    solicitante: Optional[str] = None
+    tipo_avaluo: Optional[str] = None
+    records_complete: Optional[bool] = None
+    property_record: Optional[Dict[str, Any]] = None
+    zona: Optional[str] = None
+    market_data: Optional[Dict[str, Any]] = None
+    comparables: Optional[List[Dict[str, Any]]] = None
+    valuation_result: Optional[str] = None
+    valor_terreno: Optional[float] = None
+    valor_construccion: Optional[float] = None
+    valor_catastral: Optional[float] = None
+    comparables_count: Optional[int] = None
+    precio_m2_comparables: Optional[float] = None
+    approval_id: Optional[str] = None
+
+
+# El índice de cada workflow se guarda en el encabezado: sólo agregar al final
+CONTEXT_MODELS: Dict[str, Type[WorkflowContext]] = {
+    "actualizacion_catastral_v1": ActualizacionContext,
+    "certificado_libertad_v1": CertificadoContext,
+    "avaluo_catastral_v1": AvaluoContext,
+}
+WORKFLOW_IDS = list(CONTEXT_MODELS)
+
+MAGIC = b"PCS1"
+FORMAT_VERSION = 2
+FLAG_COMPRESSED = 1
+COMPRESS_MIN_BYTES = 256
+HEADER = struct.Struct("<4sBBBxHII")  # firma, versión, workflow, banderas, campos, huella, longitud
+
+
+def _field_names(model: Type[WorkflowContext]) -> List[str]:
+    return list(model.model_fields if PYDANTIC_V2 else model.__fields__)
+
+
+def _fingerprint(fields: List[str]) -> int:
+    return zlib.crc32(",".join(fields).encode("ascii"))
+
+
+_FIELDS = {workflow_id: _field_names(model) for workflow_id, model in CONTEXT_MODELS.items()}
+_FINGERPRINTS = {workflow_id: _fingerprint(fields) for workflow_id, fields in _FIELDS.items()}
+
+
+def typed_context(workflow_id: str, context: Dict[str, Any]) -> WorkflowContext:
+    """Validar un contexto libre contra el modelo del workflow."""
+    model = CONTEXT_MODELS[workflow_id]
+    return model.model_validate(context) if PYDANTIC_V2 else model.parse_obj(context)
+
+
+def context_dict(context: WorkflowContext) -> Dict[str, Any]:
+    """Contexto como diccionario, sólo con los campos asignados."""
+    return context.model_dump(exclude_unset=True) if PYDANTIC_V2 else context.dict(exclude_unset=True)
+
+
+@dataclass(frozen=True)
+class Snapshot:
+    """Instancia restaurada desde una instantánea."""
+    workflow_id: str
+    instance_id: Optional[str]
+    step_id: Optional[str]
+    context: WorkflowContext
+
+
+def dump_snapshot(workflow_id: str, context: Any, instance_id: Optional[str] = None,
+                  step_id: Optional[str] = None) -> bytes:
+    """Serializar una instancia pausada (contexto dict o tipado)."""
+    if not isinstance(context, WorkflowContext):
+        context = typed_context(workflow_id, context)
+    values = context_dict(context)
+    fields = _FIELDS[workflow_id]
+    nulls = [index for index, field in enumerate(fields) if field in values and values[field] is None]
+    # None marca un campo no asignado (o uno de ``nulls``); se recortan los del final
+    positional = [values.pop(field, None) for field in fields]
+    while positional and positional[-1] is None:
+        positional.pop()
+
+    payload = json.dumps([instance_id, step_id, positional, values, nulls],
+                         ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    flags = 0
+    if len(payload) >= COMPRESS_MIN_BYTES:
+        payload, flags = zlib.compress(payload, 6), FLAG_COMPRESSED
+    header = HEADER.pack(MAGIC, FORMAT_VERSION, WORKFLOW_IDS.index(workflow_id), flags, len(fields),
+                         _FINGERPRINTS[workflow_id], len(payload))
+    return header + payload
+
+
+def _schema_prefix(workflow_id: str, field_count: int, fingerprint: int) -> List[str]:
+    """Campos del esquema actual con los que se guardó la instantánea."""
+    fields = _FIELDS[workflow_id]
+    if field_count == len(fields):
+        expected = _FINGERPRINTS[workflow_id]
+    elif field_count < len(fields):
+        expected = _fingerprint(fields[:field_count])
+    else:
+        expected = None
+    if fingerprint != expected:
+        raise ValueError(f"La instantánea corresponde a otro esquema de {workflow_id}")
+    return fields[:field_count]
+
+
+def load_snapshot(data: bytes) -> Snapshot:
+    """Restaurar una instancia desde su instantánea, sin volver a validarla."""
+    magic, version, workflow_index, flags, field_count, fingerprint, length = HEADER.unpack_from(data)
+    if magic != MAGIC or version != FORMAT_VERSION:
+        raise ValueError("Instantánea con formato desconocido")
+    workflow_id = WORKFLOW_IDS[workflow_index]
+    fields = _schema_prefix(workflow_id, field_count, fingerprint)
+
+    payload = data[HEADER.size:HEADER.size + length]
+    if flags & FLAG_COMPRESSED:
+        payload = zlib.decompress(payload)
+    instance_id, step_id, positional, extras, nulls = json.loads(payload)
+    values = {field: value for field, value in zip(fields, positional) if value is not None}
+    values.update({fields[index]: None for index in nulls})
+    values.update(extras)
+    model = CONTEXT_MODELS[workflow_id]
+    context = model.model_construct(**values) if PYDANTIC_V2 else model.construct(**values)
+    return Snapshot(workflow_id, instance_id, step_id, context)
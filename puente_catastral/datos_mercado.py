@@ -0,0 +1,151 @@
+"""
+Caché por zona de los análisis de mercado para el workflow de avalúo.
+
+Los predios de una misma zona (``XX-XXX`` de la clave catastral)
+comparten el análisis de ``market_data_service``. Las entradas vencidas
+se siguen sirviendo durante una ventana de gracia mientras se
+revalidan en segundo plano, y las solicitudes simultáneas de una zona
+sin caché esperan una sola consulta al servicio.
+
+Si el servicio no responde o su circuito está abierto, el paso
+gather_market_data marca el avalúo como ``insufficient_data`` para que
+valuation_data_check lo lleve a insufficient_valuation_data.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from . import servicios
+from .comparables import find_comparables
+from .integraciones import FALLBACK_ERRORS
+from .vinculacion import block_key
+
+MARKET_SERVICE = ("market_data_service", "/api/market/zone-analysis")
+
+CACHE_SIZE = int(os.environ.get("PUENTE_MARKET_CACHE_SIZE", 2048))
+CACHE_TTL = float(os.environ.get("PUENTE_MARKET_CACHE_TTL", 6 * 3600))
+STALE_TTL = float(os.environ.get("PUENTE_MARKET_CACHE_STALE_TTL", 24 * 3600))
+
+
+def zone_key(clave_catastral: Optional[str]) -> Optional[str]:
+    """Zona de una clave catastral: sus dos primeros segmentos (``XX-XXX``)."""
+    return block_key(clave_catastral)
+
+
+def fetch_zone_analysis(zone: str) -> Dict[str, Any]:
+    """Consultar el análisis de mercado de una zona."""
+    service_name, endpoint = MARKET_SERVICE
+    return servicios.call_service(service_name, endpoint, {"zona": zone})
+
+
+class ZoneCache:
+    """Caché LRU con TTL, revalidación en segundo plano y protección contra estampidas."""
+
+    def __init__(self, loader: Callable[[str], Any], max_size: int = CACHE_SIZE,
+                 ttl: float = CACHE_TTL, stale_ttl: float = STALE_TTL,
+                 clock: Callable[[], float] = time.monotonic, executor: Optional[ThreadPoolExecutor] = None):
+        self.loader = loader
+        self.max_size = max_size
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.clock = clock
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._loading: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self._executor = executor or ThreadPoolExecutor(max_workers=2, thread_name_prefix="zone-cache")
+        self._metrics = {"hits": 0, "stale_hits": 0, "misses": 0, "refreshes": 0,
+                         "refresh_errors": 0, "evictions": 0}
+
+    def get(self, zone: str) -> Any:
+        """Obtener el análisis de una zona."""
+        now = self.clock()
+        with self._lock:
+            entry = self._entries.get(zone)
+            if entry is not None:
+                age = now - entry[0]
+                if age < self.ttl:
+                    self._metrics["hits"] += 1
+                    self._entries.move_to_end(zone)
+                    return entry[1]
+                if age < self.ttl + self.stale_ttl:
+                    self._metrics["stale_hits"] += 1
+                    self._entries.move_to_end(zone)
+                    if zone not in self._loading:
+                        self._metrics["refreshes"] += 1
+                        self._loading[zone] = self._executor.submit(self._load, zone)
+                    return entry[1]
+
+            self._metrics["misses"] += 1
+            future = self._loading.get(zone)
+            leader = future is None
+            if leader:
+                future = self._loading[zone] = Future()
+
+        if leader:
+            try:
+                future.set_result(self._load(zone, raise_errors=True))
+            except Exception as error:
+                future.set_exception(error)
+        return future.result()
+
+    def _load(self, zone: str, raise_errors: bool = False) -> Any:
+        try:
+            value = self.loader(zone)
+        except Exception:
+            with self._lock:
+                self._loading.pop(zone, None)
+                if not raise_errors:
+                    self._metrics["refresh_errors"] += 1
+            if raise_errors:
+                raise
+            return None
+        with self._lock:
+            self._entries[zone] = (self.clock(), value)
+            self._entries.move_to_end(zone)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self._metrics["evictions"] += 1
+            self._loading.pop(zone, None)
+        return value
+
+    def invalidate(self, zone: str) -> None:
+        """Descartar el análisis de una zona."""
+        with self._lock:
+            self._entries.pop(zone, None)
+
+    def metrics(self) -> Dict[str, Any]:
+        """Contadores de aciertos, fallos, revalidaciones y desalojos."""
+        with self._lock:
+            metrics = dict(self._metrics, size=len(self._entries))
+        lookups = metrics["hits"] + metrics["stale_hits"] + metrics["misses"]
+        metrics["hit_ratio"] = round((metrics["hits"] + metrics["stale_hits"]) / lookups, 4) if lookups else 0.0
+        return metrics
+
+
+zone_cache = ZoneCache(fetch_zone_analysis)
+
+
+def gather_market_data(instance, context: Dict[str, Any]) -> Dict[str, Any]:
+    """Acción del paso gather_market_data: análisis de la zona y ventas comparables cercanas."""
+    zone = zone_key(context.get("clave_catastral"))
+    record = context.get("property_record") or context
+    try:
+        market_data = zone_cache.get(zone)
+    except FALLBACK_ERRORS:
+        return {
+            "status": "market_data_unavailable",
+            "zona": zone,
+            "market_data": None,
+            "valuation_result": "insufficient_data",
+            "unavailable_sources": [MARKET_SERVICE[0]],
+        }
+    return {
+        "status": "market_data_gathered",
+        "zona": zone,
+        "market_data": market_data,
+        "comparables": find_comparables(record, uso_suelo=record.get("uso_suelo")),
+    }
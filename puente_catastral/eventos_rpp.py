@@ -0,0 +1,237 @@
+"""
+Consumo del feed de eventos de cambio del RPP.
+
+El RPP publica sus cambios como eventos numerados (``sequence``). Un worker
+del proceso los lee en orden a partir del último aplicado y los reparte:
+
+- inscripciones y cancelaciones de gravámenes al índice local
+  (gravamenes.py), invalidando los certificados en caché de cada predio
+  afectado;
+- compraventas al índice de comparables para avalúos (comparables.py).
+
+Cada índice lleva su propio cursor; el feed se lee desde el menor de los
+dos y cada evento se aplica sólo al índice que aún no lo tiene.
+
+El índice sólo se considera al día si, en una lectura de hace menos de
+``PUENTE_LIEN_MAX_LAG`` segundos, el último evento aplicado alcanzó la
+cabeza del feed. Si el índice falta (se reconstruye desde el primer
+evento), va atrasado o el feed no responde, el certificado de libertad de
+gravamen no se emite (condición ``lien_index_current``).
+
+El proceso que lee el feed (PUENTE_RPP_EVENTS_WORKER=1, o el worker
+independiente) lo pone al día de forma síncrona al arrancar y publica el
+índice en PUENTE_LIEN_INDEX_PATH: compacta los cambios cada
+``PUENTE_LIEN_COMPACT_INTERVAL`` segundos y registra en los metadatos del
+archivo la cabeza del feed y la última sincronización. Los procesos con
+PUENTE_RPP_EVENTS_WORKER=0 no leen el feed: recargan ese archivo y toman
+de él si el índice está al día. Conviene que un solo proceso lea el feed.
+
+Uso como worker independiente: python -m puente_catastral.eventos_rpp
+"""
+
+import os
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from . import servicios
+from .cache_certificados import invalidate_parcel
+from .comparables import ComparablesIndex, register_sale
+from .comparables import default_index as default_comparables
+from .gravamenes import INDEX_PATH, LienIndex, default_index, read_meta, write_meta
+
+RPP_EVENTS = ("puente_rpp_service", "/api/rpp/events")
+BATCH_SIZE = int(os.environ.get("PUENTE_RPP_EVENTS_BATCH_SIZE", 1000))
+POLL_INTERVAL_SECONDS = float(os.environ.get("PUENTE_RPP_EVENTS_INTERVAL", 2.0))
+MAX_LAG_SECONDS = float(os.environ.get("PUENTE_LIEN_MAX_LAG", 60.0))
+COMPACT_INTERVAL_SECONDS = float(os.environ.get("PUENTE_LIEN_COMPACT_INTERVAL", 10.0))
+
+LIEN_EVENTS = {"inscripcion", "cancelacion"}
+SALE_EVENT = "compraventa"
+
+
+class RppEventConsumer:
+    """Lector del feed del RPP que mantiene al día el índice de gravámenes.
+
+    Con ``path`` publica el índice para los demás procesos tras cada lectura
+    (ver ``publish``) o, en un proceso que no lee el feed, lo sigue desde
+    ese archivo (ver ``refresh``).
+    """
+
+    def __init__(self, index: Optional[LienIndex] = None, comparables: Optional[ComparablesIndex] = None,
+                 max_lag: float = MAX_LAG_SECONDS, path: Optional[str] = None,
+                 compact_interval: float = COMPACT_INTERVAL_SECONDS):
+        self._index = index
+        self._comparables = comparables
+        self.max_lag = max_lag
+        self.path = path
+        self.compact_interval = compact_interval
+        self.head_sequence: Optional[int] = None
+        # Momento (epoch) de la última lectura en la que el índice alcanzó la cabeza del feed
+        self.synced_at: Optional[float] = None
+        self._compacted_at = 0.0
+        self._meta_version: Optional[Tuple[int, int]] = None
+        self._lock = threading.Lock()
+        self._worker: Optional[threading.Thread] = None
+        self.metrics = {"polls": 0, "applied": 0, "sales": 0, "errors": 0, "compactions": 0}
+
+    @property
+    def index(self) -> LienIndex:
+        return self._index if self._index is not None else default_index()
+
+    @property
+    def comparables(self) -> ComparablesIndex:
+        return self._comparables if self._comparables is not None else default_comparables()
+
+    def dispatch(self, event: Dict[str, Any]) -> None:
+        """Aplicar un evento del feed a los índices que aún no lo tienen."""
+        index, comparables = self.index, self.comparables
+        sequence = event.get("sequence", 0)
+        if event["event"] in LIEN_EVENTS and sequence > index.last_sequence:
+            index.apply_event(event)
+            claves = [event.get("clave_catastral")]
+            if event["event"] == "cancelacion" and not event.get("clave_catastral"):
+                claves = index.lien_keys(str(event["lien_id"]))
+            for clave in claves:
+                invalidate_parcel(clave)
+            self.metrics["applied"] += 1
+        if event["event"] == SALE_EVENT and sequence > comparables.last_sequence:
+            self.metrics["sales"] += register_sale(event, comparables)
+        index.advance(sequence)
+        comparables.advance(sequence)
+
+    def poll(self, limit: int = BATCH_SIZE) -> int:
+        """Leer y aplicar el siguiente lote de eventos; devuelve cuántos se leyeron."""
+        service_name, endpoint = RPP_EVENTS
+        with self._lock:
+            index = self.index
+            cursor = min(index.last_sequence, self.comparables.last_sequence)
+            response = servicios.call_service(service_name, endpoint, {"after_sequence": cursor, "limit": limit})
+            events = sorted(response.get("events", []), key=lambda event: event.get("sequence", 0))
+            for event in events:
+                self.dispatch(event)
+            self.head_sequence = response.get("last_sequence", index.last_sequence)
+            if index.last_sequence >= self.head_sequence:
+                self.synced_at = time.time()
+            self.metrics["polls"] += 1
+            if self.path:
+                self.publish()
+        return len(events)
+
+    def sync(self, limit: int = BATCH_SIZE) -> None:
+        """Leer el feed hasta alcanzar su cabeza y publicar el índice resultante."""
+        while self.poll(limit) >= limit:
+            pass
+        if self.path:
+            self.publish(force=True)
+
+    def publish(self, force: bool = False) -> None:
+        """Publicar el índice en ``path`` para los procesos que no leen el feed.
+
+        Los cambios pendientes se compactan a lo más cada ``compact_interval``
+        segundos; mientras no se compactan, los metadatos conservan la última
+        sincronización publicada y los demás procesos dejan de considerar el
+        índice al día al vencer ``max_lag``.
+        """
+        index = self.index
+        if index.pending and not force and time.time() - self._compacted_at < self.compact_interval:
+            return
+        meta = {"head_sequence": self.head_sequence, "synced_at": self.synced_at}
+        if index.pending or not os.path.exists(self.path):
+            index.compact(self.path, **meta)
+            self._compacted_at = time.time()
+            self.metrics["compactions"] += 1
+        else:
+            write_meta(self.path, last_sequence=index.last_sequence, **meta)
+
+    def refresh(self) -> None:
+        """Seguir el índice publicado por el proceso que lee el feed."""
+        if not self.path:
+            return
+        try:
+            stat = os.stat(self.path + ".json")
+        except FileNotFoundError:
+            return
+        # Los metadatos se reemplazan con os.replace: un archivo nuevo cambia de inodo
+        version = (stat.st_ino, stat.st_mtime_ns)
+        if version == self._meta_version:
+            return
+        with self._lock:
+            self.index.reload(self.path)
+            meta = read_meta(self.path)
+            self.head_sequence = meta.get("head_sequence")
+            self.synced_at = meta.get("synced_at")
+            self._meta_version = version
+
+    def is_current(self) -> bool:
+        """True si el índice alcanzó la cabeza del feed hace menos de ``max_lag`` segundos."""
+        return self.synced_at is not None and time.time() - self.synced_at <= self.max_lag
+
+    def run_forever(self, interval: float = POLL_INTERVAL_SECONDS) -> None:
+        """Leer el feed continuamente; sin eventos nuevos espera ``interval`` segundos."""
+        while True:
+            try:
+                read = self.poll()
+            except Exception:
+                self.metrics["errors"] += 1
+                read = 0
+            if not read:
+                time.sleep(interval)
+
+    def start(self) -> None:
+        """Poner el índice al día antes de atender certificados y arrancar el worker."""
+        try:
+            self.sync()
+        except Exception:
+            self.metrics["errors"] += 1  # El worker reintenta; mientras tanto el índice no está al día
+        self.ensure_worker()
+
+    @property
+    def reads_feed(self) -> bool:
+        return self._worker is not None
+
+    def ensure_worker(self) -> None:
+        """Arrancar el worker en segundo plano del proceso si aún no corre."""
+        if self._worker is None:
+            with self._lock:
+                if self._worker is None:
+                    self._worker = threading.Thread(target=self.run_forever, name="rpp-events", daemon=True)
+                    self._worker.start()
+
+
+_default_consumer: Optional[RppEventConsumer] = None
+_default_lock = threading.Lock()
+
+
+def default_consumer(reads_feed: Optional[bool] = None) -> RppEventConsumer:
+    """Consumidor del proceso (PUENTE_LIEN_INDEX_PATH).
+
+    Si lee el feed (PUENTE_RPP_EVENTS_WORKER, por defecto sí) se pone al día
+    antes de devolverse y deja su worker corriendo; si no, sigue el índice
+    publicado en el archivo.
+    """
+    global _default_consumer
+    if _default_consumer is None:
+        with _default_lock:
+            if _default_consumer is None:
+                if reads_feed is None:
+                    reads_feed = os.environ.get("PUENTE_RPP_EVENTS_WORKER", "1") == "1"
+                consumer = RppEventConsumer(path=INDEX_PATH)
+                if reads_feed:
+                    consumer.start()
+                else:
+                    consumer.refresh()
+                _default_consumer = consumer
+    return _default_consumer
+
+
+def lien_index_current(instance, context: Dict[str, Any]) -> bool:
+    """Condición del paso lien_index_check: el índice de gravámenes está al día con el RPP."""
+    consumer = default_consumer()
+    if not consumer.reads_feed:
+        consumer.refresh()
+    return consumer.is_current()
+
+
+if __name__ == "__main__":
+    RppEventConsumer(path=INDEX_PATH).run_forever()
@@ -0,0 +1,230 @@
+"""
+Firma por lotes de certificados mediante árboles de Merkle.
+
+Los certificados que llegan dentro de una ventana corta (o hasta
+completar un lote) se agrupan; se construye un árbol de Merkle sobre sus
+hashes y sólo se firma la raíz. Cada certificado recibe la raíz, la firma
+y su prueba de inclusión, con lo que puede verificarse por sí solo.
+
+La raíz se firma por defecto con la llave privada Ed25519 o RSA (PEM) de
+PUENTE_SIGNING_KEY_PATH (con PUENTE_SIGNING_KEY_PASSWORD si está cifrada;
+requiere ``cryptography``), de modo que cualquiera puede verificar el
+certificado con la llave pública. ``configure_signer`` permite otro
+firmante (p. ej. un HSM); ``hmac_signer`` sólo se usa si se configura
+explícitamente, en pruebas. Sin llave privada ni firmante configurado el
+workflow certificado_libertad_v1 no se construye
+(``SigningConfigurationError``), en lugar de fallar al firmar el primer
+certificado.
+"""
+
+import hashlib
+import hmac
+import json
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+SIGNING_KEY_PATH = os.environ.get("PUENTE_SIGNING_KEY_PATH")
+BATCH_SIZE = int(os.environ.get("PUENTE_SIGN_BATCH_SIZE", 64))
+MAX_WAIT_SECONDS = float(os.environ.get("PUENTE_SIGN_MAX_WAIT", 0.05))
+SIGN_TIMEOUT_SECONDS = 10.0
+
+# Campos del contexto que forman el documento firmado
+CERTIFICATE_FIELDS = ("clave_catastral", "search_type", "solicitante_nombre",
+                      "liens_found", "gravamenes", "fecha_emision")
+
+Proof = List[Tuple[str, str]]
+
+
+def _hash(data: bytes) -> bytes:
+    return hashlib.sha256(data).digest()
+
+
+def leaf_hash(document_hash: bytes) -> bytes:
+    """Hash de hoja (prefijo 0x00, distinto de los nodos internos)."""
+    return _hash(b"\x00" + document_hash)
+
+
+def node_hash(left: bytes, right: bytes) -> bytes:
+    """Hash de nodo interno (prefijo 0x01)."""
+    return _hash(b"\x01" + left + right)
+
+
+def merkle_tree(document_hashes: List[bytes]) -> Tuple[bytes, List[Proof]]:
+    """Raíz del árbol y prueba de inclusión de cada documento.
+
+    Cada prueba es la lista de hermanos ``("L" | "R", hash hex)`` desde la
+    hoja hasta la raíz. Un nodo sin pareja sube sin modificarse.
+    """
+    level = [leaf_hash(h) for h in document_hashes]
+    positions = list(range(len(level)))
+    proofs: List[Proof] = [[] for _ in level]
+    while len(level) > 1:
+        for leaf, position in enumerate(positions):
+            sibling = position ^ 1
+            if sibling < len(level):
+                proofs[leaf].append(("L" if sibling < position else "R", level[sibling].hex()))
+        level = [node_hash(level[i], level[i + 1]) if i + 1 < len(level) else level[i]
+                 for i in range(0, len(level), 2)]
+        positions = [position // 2 for position in positions]
+    return level[0], proofs
+
+
+def verify_inclusion(document_hash: bytes, proof: Proof, root: bytes) -> bool:
+    """Verificar que un documento pertenece al árbol con la raíz dada."""
+    current = leaf_hash(document_hash)
+    for side, sibling in proof:
+        sibling_hash = bytes.fromhex(sibling)
+        current = node_hash(sibling_hash, current) if side == "L" else node_hash(current, sibling_hash)
+    return hmac.compare_digest(current, root)
+
+
+class SigningConfigurationError(RuntimeError):
+    """No hay firmante de certificados configurado."""
+
+
+def private_key_signer(path: str, password: Optional[str] = None) -> Callable[[bytes], str]:
+    """Firmante con una llave privada Ed25519 o RSA en formato PEM; la firma va en hexadecimal."""
+    try:
+        from cryptography.hazmat.primitives import hashes, serialization
+        from cryptography.hazmat.primitives.asymmetric import ed25519, padding, rsa
+    except ImportError as error:
+        raise SigningConfigurationError("La firma con llave privada requiere el paquete cryptography") from error
+
+    try:
+        with open(path, "rb") as pem:
+            key = serialization.load_pem_private_key(pem.read(), password.encode("utf-8") if password else None)
+    except (OSError, ValueError, TypeError) as error:
+        raise SigningConfigurationError(f"No se pudo cargar la llave de firma {path}: {error}") from error
+
+    if isinstance(key, ed25519.Ed25519PrivateKey):
+        return lambda root: key.sign(root).hex()
+    if isinstance(key, rsa.RSAPrivateKey):
+        pss = padding.PSS(mgf=padding.MGF1(hashes.SHA256()), salt_length=padding.PSS.DIGEST_LENGTH)
+        return lambda root: key.sign(root, pss, hashes.SHA256()).hex()
+    raise SigningConfigurationError(f"Tipo de llave de firma no soportado: {type(key).__name__}")
+
+
+def hmac_signer(root: bytes) -> str:
+    """Firmante HMAC-SHA256 con PUENTE_SIGNING_KEY, sólo para pruebas (``configure_signer(hmac_signer)``)."""
+    key = os.environ.get("PUENTE_SIGNING_KEY")
+    if not key:
+        raise SigningConfigurationError("PUENTE_SIGNING_KEY no configurada")
+    return hmac.new(key.encode("utf-8"), root, hashlib.sha256).hexdigest()
+
+
+class BatchSigner:
+    """Agrupa documentos por tamaño de lote o tiempo máximo de espera y firma una raíz por lote."""
+
+    def __init__(self, sign_root: Callable[[bytes], str], batch_size: int = BATCH_SIZE,
+                 max_wait: float = MAX_WAIT_SECONDS):
+        self.sign_root = sign_root
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+        self._queue: "queue.Queue[Tuple[bytes, Future]]" = queue.Queue()
+        self._worker: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.batches_signed = 0
+        self.documents_signed = 0
+
+    def submit(self, document_hash: bytes) -> Future:
+        """Encolar un documento; el futuro se resuelve con su firma y prueba."""
+        if self._worker is None:
+            with self._lock:
+                if self._worker is None:
+                    self._worker = threading.Thread(target=self._run, name="batch-signer", daemon=True)
+                    self._worker.start()
+        future: Future = Future()
+        self._queue.put((document_hash, future))
+        return future
+
+    def sign(self, document_hash: bytes, timeout: float = SIGN_TIMEOUT_SECONDS) -> Dict[str, Any]:
+        """Firmar un documento esperando a que se cierre su lote."""
+        return self.submit(document_hash).result(timeout)
+
+    def _collect(self) -> List[Tuple[bytes, Future]]:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._collect()
+            try:
+                root, proofs = merkle_tree([document_hash for document_hash, _ in batch])
+                signature = self.sign_root(root)
+            except Exception as error:
+                for _, future in batch:
+                    future.set_exception(error)
+                continue
+            self.batches_signed += 1
+            self.documents_signed += len(batch)
+            for (document_hash, future), proof in zip(batch, proofs):
+                future.set_result({
+                    "document_hash": document_hash.hex(),
+                    "merkle_root": root.hex(),
+                    "signature": signature,
+                    "inclusion_proof": proof,
+                    "batch_size": len(batch),
+                })
+
+
+_signer: Optional[BatchSigner] = None
+
+
+_signer_lock = threading.Lock()
+
+
+def check_signing_configuration() -> None:
+    """Verificar que hay con qué firmar (y que la llave carga); se llama al construir el workflow de certificados."""
+    signer()
+
+
+def signer() -> BatchSigner:
+    """Firmante del proceso; sin ``configure_signer`` usa la llave privada de PUENTE_SIGNING_KEY_PATH."""
+    global _signer
+    if _signer is None:
+        with _signer_lock:
+            if _signer is None:
+                if not SIGNING_KEY_PATH:
+                    raise SigningConfigurationError(
+                        "No hay firmante de certificados: defina PUENTE_SIGNING_KEY_PATH o llame a "
+                        "puente_catastral.firma.configure_signer() antes de cargar certificado_libertad_v1")
+                _signer = BatchSigner(private_key_signer(SIGNING_KEY_PATH,
+                                                         os.environ.get("PUENTE_SIGNING_KEY_PASSWORD")))
+    return _signer
+
+
+def configure_signer(sign_root: Callable[[bytes], str], batch_size: int = BATCH_SIZE,
+                     max_wait: float = MAX_WAIT_SECONDS) -> BatchSigner:
+    """Reemplazar el firmante del proceso (p. ej. con una llave privada o un HSM)."""
+    global _signer
+    _signer = BatchSigner(sign_root, batch_size, max_wait)
+    return _signer
+
+
+def certificate_hash(document: Dict[str, Any]) -> bytes:
+    """Hash SHA-256 de la representación JSON canónica de un certificado."""
+    canonical = json.dumps(document, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+    return _hash(canonical.encode("utf-8"))
+
+
+def sign_certificate(instance, context: Dict[str, Any]) -> Dict[str, Any]:
+    """Acción del paso sign_certificate."""
+    fecha_emision = datetime.now(timezone.utc).isoformat()
+    document = {field: context.get(field) for field in CERTIFICATE_FIELDS}
+    document["fecha_emision"] = fecha_emision
+    signed = signer().sign(certificate_hash(document))
+    return {"status": "signed", "fecha_emision": fecha_emision, **signed}
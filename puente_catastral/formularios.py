@@ -0,0 +1,212 @@
+"""
+Formularios de captura de los workflows y su validación compilada.
+
+Cada ``input_form`` se compila una sola vez al cargar el módulo: las
+expresiones regulares quedan compiladas, las opciones de los campos
+``select`` en conjuntos y los campos requeridos en una tupla. La misma
+validación sirve al paso interactivo y a la actualización masiva, que
+valida miles de filas por llamada con ``validate_many``.
+"""
+
+import re
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, FrozenSet, List, Mapping, Pattern, Sequence, Tuple
+
+CLAVE_CATASTRAL_PATTERN = "^[0-9]{2}-[0-9]{3}-[0-9]{3}$"
+CLAVE_CATASTRAL_RE = re.compile(CLAVE_CATASTRAL_PATTERN)
+
+
+ACTUALIZACION_FORM = {
+    "title": "Actualización de Registro Catastral",
+    "description": "Proporcione los datos del inmueble a actualizar",
+    "fields": [
+        {
+            "id": "clave_catastral",
+            "name": "clave_catastral",
+            "label": "Clave Catastral",
+            "type": "text",
+            "required": True,
+            "pattern": CLAVE_CATASTRAL_PATTERN,
+            "placeholder": "09-123-456",
+            "helpText": "Formato: XX-XXX-XXX"
+        },
+        {
+            "id": "tipo_actualizacion",
+            "name": "tipo_actualizacion",
+            "label": "Tipo de Actualización",
+            "type": "select",
+            "required": True,
+            "options": ["Cambio de propietario", "Modificación de superficie", "Cambio de uso de suelo", "Actualización de valor"],
+            "helpText": "Seleccione el tipo de actualización a realizar"
+        },
+        {
+            "id": "observaciones",
+            "name": "observaciones",
+            "label": "Observaciones",
+            "type": "textarea",
+            "required": False,
+            "helpText": "Información adicional sobre la actualización"
+        }
+    ]
+}
+
+
+CERTIFICADO_FORM = {
+    "title": "Certificado de Libertad de Gravamen",
+    "description": "Proporcione información para localizar la propiedad",
+    "fields": [
+        {
+            "id": "search_type",
+            "name": "search_type",
+            "label": "Tipo de Búsqueda",
+            "type": "select",
+            "required": True,
+            "options": ["Clave Catastral", "Folio Real", "Dirección", "Propietario"],
+            "helpText": "Seleccione el tipo de criterio de búsqueda"
+        },
+        {
+            "id": "clave_catastral",
+            "name": "clave_catastral",
+            "label": "Clave Catastral",
+            "type": "text",
+            "required": False,
+            "pattern": CLAVE_CATASTRAL_PATTERN,
+            "helpText": "Clave catastral si se conoce"
+        },
+        {
+            "id": "direccion",
+            "name": "direccion",
+            "label": "Dirección",
+            "type": "text",
+            "required": False,
+            "helpText": "Domicilio del inmueble para búsqueda por dirección"
+        },
+        {
+            "id": "propietario",
+            "name": "propietario",
+            "label": "Propietario",
+            "type": "text",
+            "required": False,
+            "helpText": "Nombre del propietario para búsqueda por propietario"
+        },
+        {
+            "id": "solicitante_nombre",
+            "name": "solicitante_nombre",
+            "label": "Nombre del Solicitante",
+            "type": "text",
+            "required": True,
+            "helpText": "Nombre de quien solicita el certificado"
+        }
+    ]
+}
+
+
+AVALUO_FORM = {
+    "title": "Solicitud de Avalúo Catastral",
+    "description": "Proporcione información para realizar el avalúo",
+    "fields": [
+        {
+            "id": "clave_catastral",
+            "name": "clave_catastral",
+            "label": "Clave Catastral",
+            "type": "text",
+            "required": True,
+            "pattern": CLAVE_CATASTRAL_PATTERN,
+            "helpText": "Clave catastral del inmueble a valuar"
+        },
+        {
+            "id": "proposito_avaluo",
+            "name": "proposito_avaluo",
+            "label": "Propósito del Avalúo",
+            "type": "select",
+            "required": True,
+            "options": ["Compraventa", "Crédito hipotecario", "Herencia", "Donación", "Actualización catastral"],
+            "helpText": "Para qué se utilizará el avalúo"
+        },
+        {
+            "id": "solicitante",
+            "name": "solicitante",
+            "label": "Nombre del Solicitante",
+            "type": "text",
+            "required": True,
+            "helpText": "Nombre de quien solicita el avalúo"
+        },
+        {
+            "id": "tipo_avaluo",
+            "name": "tipo_avaluo",
+            "label": "Tipo de Avalúo",
+            "type": "select",
+            "required": True,
+            "options": ["Físico (con inspección)", "Documental (sin inspección)"],
+            "helpText": "Tipo de avalúo solicitado"
+        }
+    ]
+}
+
+
+@dataclass(frozen=True)
+class FormValidator:
+    """Validador precompilado de un formulario."""
+    required: Tuple[str, ...]
+    patterns: Tuple[Tuple[str, Pattern], ...]
+    options: Tuple[Tuple[str, FrozenSet[str]], ...]
+
+    def validate(self, record: Mapping[str, Any]) -> List[str]:
+        """Errores de un registro (lista vacía si es válido)."""
+        return self.validate_many([record])[0]
+
+    def validate_many(self, records: Sequence[Mapping[str, Any]]) -> List[List[str]]:
+        """Errores por fila de un lote de registros, validando campo por campo."""
+        errors: List[List[str]] = [[] for _ in records]
+        for name in self.required:
+            message = f"{name} requerido"
+            for row_errors, record in zip(errors, records):
+                if record.get(name) in (None, ""):
+                    row_errors.append(message)
+        for name, pattern in self.patterns:
+            message, match = f"{name} inválido", pattern.fullmatch
+            for row_errors, record in zip(errors, records):
+                value = record.get(name)
+                if value not in (None, "") and not match(str(value)):
+                    row_errors.append(message)
+        for name, allowed in self.options:
+            message = f"{name} inválido"
+            for row_errors, record in zip(errors, records):
+                value = record.get(name)
+                try:
+                    valid = value in (None, "") or value in allowed
+                except TypeError:
+                    valid = False  # Listas o diccionarios nunca son una opción válida
+                if not valid:
+                    row_errors.append(message)
+        return errors
+
+
+def compile_form(form: Dict[str, Any]) -> FormValidator:
+    """Compilar la definición de un ``input_form``."""
+    fields = form["fields"]
+    return FormValidator(
+        required=tuple(field["name"] for field in fields if field.get("required")),
+        patterns=tuple((field["name"], re.compile(field["pattern"])) for field in fields if field.get("pattern")),
+        options=tuple((field["name"], frozenset(field["options"])) for field in fields if field.get("options")),
+    )
+
+
+FORMS: Dict[str, Dict[str, Any]] = {
+    "actualizacion_catastral_v1": ACTUALIZACION_FORM,
+    "certificado_libertad_v1": CERTIFICADO_FORM,
+    "avaluo_catastral_v1": AVALUO_FORM,
+}
+FORM_VALIDATORS: Dict[str, FormValidator] = {workflow_id: compile_form(form) for workflow_id, form in FORMS.items()}
+
+
+def validate_form_action(workflow_id: str) -> Callable:
+    """Acción de un paso de validación con el validador compilado del workflow."""
+    validator = FORM_VALIDATORS[workflow_id]
+
+    def action(instance, context: Dict[str, Any]) -> Dict[str, Any]:
+        errors = validator.validate(context)
+        if errors:
+            return {"status": "validation_failed", "validation_result": "failed", "validation_errors": errors}
+        return {"status": "validated", "validation_result": "success"}
+    return action
@@ -0,0 +1,238 @@
+"""
+Índice local de gravámenes (hipotecas, embargos, usufructos) por predio.
+
+Cada gravamen es un intervalo de fechas [inicio, fin) registrado bajo la
+clave catastral y el folio real del predio. La base persistente es un
+arreglo de NumPy ordenado por (llave, inicio) y abierto con ``mmap`` para
+que los workers arranquen con el índice listo; los eventos de cambio del
+RPP (ver eventos_rpp.py) se aplican sobre una capa en memoria hasta la
+siguiente compactación. ``last_sequence`` es el último evento aplicado.
+
+El archivo compactado (PUENTE_LIEN_INDEX_PATH) y sus metadatos
+(``<archivo>.json``: cursor del feed y última sincronización) son el
+estado compartido entre procesos: el proceso que lee el feed compacta
+periódicamente y los demás recargan el archivo cuando cambia
+(``LienIndex.reload``).
+
+Consultar los gravámenes vigentes de un predio localiza su tramo con
+búsqueda binaria (O(log n)) sin recorrer las inscripciones del RPP.
+"""
+
+import bisect
+import json
+import os
+import threading
+from datetime import date, datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+
+import numpy as np
+from dateutil.parser import isoparse
+
+OPEN_END = np.iinfo(np.int32).max
+
+INDEX_DTYPE = np.dtype([
+    ("key", "U32"),
+    ("lien_id", "U32"),
+    ("tipo", "U24"),
+    ("start", "i4"),
+    ("end", "i4"),
+])
+
+DateLike = Union[date, datetime, str, None]
+
+INDEX_PATH = os.environ.get("PUENTE_LIEN_INDEX_PATH")
+
+
+def read_meta(path: str) -> Dict[str, Any]:
+    """Metadatos de un índice persistido; vacío si aún no existe."""
+    try:
+        with open(path + ".json", encoding="utf-8") as meta:
+            return json.load(meta)
+    except FileNotFoundError:
+        return {}
+
+
+def write_meta(path: str, **meta: Any) -> None:
+    """Reemplazar de forma atómica los metadatos de un índice persistido."""
+    tmp_path = path + ".json.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as target:
+        json.dump(meta, target)
+    os.replace(tmp_path, path + ".json")
+
+
+def date_ordinal(value: DateLike, default: int) -> int:
+    """Ordinal de una fecha (``date``, ``datetime`` o texto ISO); ``default`` si está vacía."""
+    if value in (None, ""):
+        return default
+    if isinstance(value, str):
+        value = isoparse(value)
+    if isinstance(value, datetime):
+        value = value.date()
+    return value.toordinal()
+
+
+def _as_date(ordinal: int) -> Optional[str]:
+    return None if ordinal == OPEN_END else date.fromordinal(ordinal).isoformat()
+
+
+class LienIndex:
+    """Índice de intervalos de gravámenes por clave catastral y folio real."""
+
+    def __init__(self, base: Optional[np.ndarray] = None, last_sequence: int = 0):
+        self._base = base if base is not None else np.zeros(0, dtype=INDEX_DTYPE)
+        # Capa incremental: llave -> [(inicio, fin, lien_id, tipo)] ordenada por inicio
+        self._delta: Dict[str, List[Tuple[int, int, str, str]]] = {}
+        # Cancelaciones posteriores a la base: lien_id -> nueva fecha fin
+        self._cancelled: Dict[str, int] = {}
+        # Llaves de la capa incremental por gravamen y orden de la base por lien_id
+        self._delta_keys: Dict[str, List[str]] = {}
+        self._base_by_lien: Optional[Tuple[np.ndarray, np.ndarray]] = None
+        self._lock = threading.Lock()
+        self.last_sequence = last_sequence
+
+    @classmethod
+    def load(cls, path: str) -> "LienIndex":
+        """Abrir un índice persistido, mapeado en memoria."""
+        # Los metadatos se leen antes que el arreglo, que se reemplaza primero al compactar
+        last_sequence = read_meta(path).get("last_sequence", 0)
+        return cls(np.load(path, mmap_mode="r"), last_sequence)
+
+    def __len__(self) -> int:
+        return len(self._base) + sum(len(entries) for entries in self._delta.values())
+
+    @property
+    def pending(self) -> bool:
+        """True si hay cambios en memoria que aún no están en el archivo compactado."""
+        return bool(self._delta or self._cancelled)
+
+    def apply_event(self, event: Dict[str, Any]) -> None:
+        """Aplicar un evento de cambio del RPP (``inscripcion`` o ``cancelacion``)."""
+        with self._lock:
+            if event["event"] == "inscripcion":
+                entry = (date_ordinal(event.get("fecha_inicio"), date.today().toordinal()),
+                         date_ordinal(event.get("fecha_fin"), OPEN_END),
+                         str(event["lien_id"]), event.get("tipo_gravamen", ""))
+                for key in (event.get("clave_catastral"), event.get("folio_real")):
+                    if key:
+                        bisect.insort(self._delta.setdefault(key, []), entry)
+                        self._delta_keys.setdefault(entry[2], []).append(key)
+            elif event["event"] == "cancelacion":
+                self._cancelled[str(event["lien_id"])] = date_ordinal(
+                    event.get("fecha_cancelacion"), date.today().toordinal())
+            else:
+                raise ValueError(f"Evento de RPP desconocido: {event['event']}")
+            self.last_sequence = max(self.last_sequence, event.get("sequence", 0))
+
+    def apply_events(self, events: Iterable[Dict[str, Any]]) -> None:
+        """Aplicar una secuencia de eventos en orden."""
+        for event in events:
+            self.apply_event(event)
+
+    def advance(self, sequence: int) -> None:
+        """Marcar como leído un evento del feed que no afecta gravámenes."""
+        with self._lock:
+            self.last_sequence = max(self.last_sequence, sequence)
+
+    def lien_keys(self, lien_id: str) -> List[str]:
+        """Claves y folios bajo los que está registrado un gravamen."""
+        with self._lock:
+            if self._base_by_lien is None:
+                order = np.argsort(self._base["lien_id"], kind="stable")
+                self._base_by_lien = (order, np.asarray(self._base["lien_id"])[order])
+            base, (order, lien_ids) = self._base, self._base_by_lien
+            keys = list(self._delta_keys.get(lien_id, []))
+        lo = np.searchsorted(lien_ids, lien_id, side="left")
+        hi = np.searchsorted(lien_ids, lien_id, side="right")
+        return [str(key) for key in base["key"][order[lo:hi]]] + keys
+
+    def active_liens(self, key: str, on: DateLike = None) -> List[Dict[str, Any]]:
+        """Gravámenes vigentes sobre un predio (clave o folio) en la fecha indicada."""
+        day = date_ordinal(on, date.today().toordinal())
+        with self._lock:
+            base, delta, cancelled = self._base, self._delta.get(key, []), self._cancelled
+        lo = np.searchsorted(base["key"], key, side="left")
+        hi = np.searchsorted(base["key"], key, side="right")
+        base = base[lo:hi]
+        # El tramo está ordenado por inicio: sólo se revisan los que ya iniciaron
+        started = base[:np.searchsorted(base["start"], day, side="right")]
+        entries = [(int(r["start"]), int(r["end"]), str(r["lien_id"]), str(r["tipo"])) for r in started]
+
+        entries += delta[:bisect.bisect_right(delta, (day, OPEN_END, chr(0x10FFFF), ""))]
+
+        liens = []
+        for start, end, lien_id, tipo in entries:
+            end = min(end, cancelled.get(lien_id, end))
+            if day < end:
+                liens.append({"lien_id": lien_id, "tipo_gravamen": tipo,
+                              "fecha_inicio": _as_date(start), "fecha_fin": _as_date(end)})
+        return liens
+
+    def compact(self, path: str, **meta: Any) -> "LienIndex":
+        """Fusionar la capa incremental en ``path`` y reabrirlo mapeado en este mismo índice.
+
+        ``meta`` se agrega a los metadatos del archivo junto con ``last_sequence``.
+        """
+        with self._lock:
+            delta = np.array([(key, lien_id, tipo, start, end)
+                              for key, entries in self._delta.items()
+                              for start, end, lien_id, tipo in entries], dtype=INDEX_DTYPE)
+            merged = np.concatenate([np.asarray(self._base), delta])
+            for row in np.flatnonzero(np.isin(merged["lien_id"], list(self._cancelled))):
+                merged["end"][row] = min(merged["end"][row], self._cancelled[str(merged["lien_id"][row])])
+            merged = merged[np.lexsort((merged["start"], merged["key"]))]
+
+            tmp_path = path + ".tmp.npy"
+            np.save(tmp_path, merged)
+            os.replace(tmp_path, path)
+            write_meta(path, last_sequence=self.last_sequence, **meta)
+            self._replace_base(np.load(path, mmap_mode="r"))
+        return self
+
+    def reload(self, path: str) -> bool:
+        """Adoptar el archivo compactado por otro proceso si va más adelante; True si se recargó."""
+        last_sequence = read_meta(path).get("last_sequence", 0)
+        if last_sequence <= self.last_sequence or not os.path.exists(path):
+            return False
+        base = np.load(path, mmap_mode="r")
+        with self._lock:
+            self._replace_base(base)
+            self.last_sequence = max(self.last_sequence, last_sequence)
+        return True
+
+    def _replace_base(self, base: np.ndarray) -> None:
+        # Se reemplazan los objetos (no se vacían) para que las consultas en curso sigan consistentes
+        self._base = base
+        self._delta, self._cancelled, self._delta_keys = {}, {}, {}
+        self._base_by_lien = None
+
+
+_default_index: Optional[LienIndex] = None
+_default_lock = threading.Lock()
+
+
+def default_index() -> LienIndex:
+    """Índice del proceso, cargado desde PUENTE_LIEN_INDEX_PATH si existe.
+
+    Sin archivo el índice arranca vacío y el consumidor del feed del RPP lo
+    reconstruye desde el primer evento; mientras tanto no está al día.
+    """
+    global _default_index
+    if _default_index is None:
+        with _default_lock:
+            if _default_index is None:
+                path = INDEX_PATH
+                _default_index = LienIndex.load(path) if path and os.path.exists(path) else LienIndex()
+    return _default_index
+
+
+def analyze_lien_status(instance, context: Dict[str, Any]) -> Dict[str, Any]:
+    """Acción del paso analyze_lien_status: gravámenes vigentes a la fecha."""
+    index = default_index()
+    keys = [context.get("clave_catastral")]
+    keys += [record.get("folio_real") for record in context.get("rpp_records") or []]
+
+    liens: Dict[str, Dict[str, Any]] = {}
+    for key in filter(None, keys):
+        for lien in index.active_liens(key):
+            liens[lien["lien_id"]] = lien
+    return {"status": "analyzed", "liens_found": bool(liens), "gravamenes": list(liens.values())}
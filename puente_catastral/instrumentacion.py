@@ -0,0 +1,245 @@
+"""
+Instrumentación por paso de los workflows PUENTE.
+
+Al compilar cada workflow en el registro se envuelven sus pasos:
+
+- ``execute`` (o ``action`` si el paso no lo expone): histograma de
+  latencia y conteo de resultados (``ok`` / ``error``) por paso.
+- ``condition`` de los ConditionalStep: conteo de ramas, con el paso al
+  que lleva cada rama (p. ej. linking_decision -> manual_review_required).
+
+Las métricas se exportan en formato de texto de Prometheus con
+``render_prometheus()``. Con ``PUENTE_TRACE=1`` se guardan además spans por
+instancia (los más recientes, en memoria) y, si OpenTelemetry está
+instalado, se emiten también como spans de OpenTelemetry.
+
+El costo por paso es un par de lecturas de reloj y un incremento bajo
+lock, por lo que la instrumentación queda activa por defecto
+(``PUENTE_INSTRUMENTATION=0`` la desactiva).
+"""
+
+import functools
+import inspect
+import os
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+from collections.abc import Mapping
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+ENABLED = os.environ.get("PUENTE_INSTRUMENTATION", "1") == "1"
+TRACE = os.environ.get("PUENTE_TRACE", "0") == "1"
+TRACE_BUFFER_SIZE = int(os.environ.get("PUENTE_TRACE_BUFFER_SIZE", 10000))
+
+# Límites de los buckets del histograma, en segundos
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+StepKey = Tuple[str, str, str]
+
+
+class Histogram:
+    """Histograma acumulativo con buckets fijos."""
+
+    __slots__ = ("counts", "total", "count")
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, seconds: float) -> None:
+        self.counts[bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        self.total += seconds
+        self.count += 1
+
+
+class StepMetrics:
+    """Latencia, resultados y ramas por (workflow, paso)."""
+
+    def __init__(self):
+        self._latency: Dict[StepKey, Histogram] = {}
+        self._outcomes: Dict[Tuple[str, str, str], int] = {}
+        self._branches: Dict[Tuple[str, str, str], int] = {}
+        self._spans: Deque[Dict[str, Any]] = deque(maxlen=TRACE_BUFFER_SIZE)
+        self._lock = threading.Lock()
+
+    def observe(self, workflow_id: str, step_id: str, kind: str, seconds: float, outcome: str) -> None:
+        """Registrar una ejecución de un paso."""
+        key = (workflow_id, step_id, kind)
+        with self._lock:
+            histogram = self._latency.get(key)
+            if histogram is None:
+                histogram = self._latency[key] = Histogram()
+            histogram.observe(seconds)
+            outcome_key = (workflow_id, step_id, outcome)
+            self._outcomes[outcome_key] = self._outcomes.get(outcome_key, 0) + 1
+
+    def count_branch(self, workflow_id: str, step_id: str, branch: str) -> None:
+        """Registrar la rama tomada por un paso condicional."""
+        key = (workflow_id, step_id, branch)
+        with self._lock:
+            self._branches[key] = self._branches.get(key, 0) + 1
+
+    def record_span(self, span: Dict[str, Any]) -> None:
+        self._spans.append(span)
+
+    def spans(self, instance_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Spans recientes, opcionalmente de una sola instancia."""
+        spans = list(self._spans)
+        return spans if instance_id is None else [span for span in spans if span["instance_id"] == instance_id]
+
+    def branch_counts(self, workflow_id: str, step_id: str) -> Dict[str, int]:
+        with self._lock:
+            return {branch: count for (wf, step, branch), count in self._branches.items()
+                    if wf == workflow_id and step == step_id}
+
+    def outcome_counts(self, workflow_id: str, step_id: str) -> Dict[str, int]:
+        with self._lock:
+            return {outcome: count for (wf, step, outcome), count in self._outcomes.items()
+                    if wf == workflow_id and step == step_id}
+
+    def reset(self) -> None:
+        with self._lock:
+            self._latency.clear()
+            self._outcomes.clear()
+            self._branches.clear()
+            self._spans.clear()
+
+    def render_prometheus(self) -> str:
+        """Métricas en formato de texto de Prometheus."""
+        with self._lock:
+            latency = [(key, list(h.counts), h.total, h.count) for key, h in sorted(self._latency.items())]
+            outcomes = sorted(self._outcomes.items())
+            branches = sorted(self._branches.items())
+
+        lines = ["# HELP puente_step_duration_seconds Duración de cada paso de workflow.",
+                 "# TYPE puente_step_duration_seconds histogram"]
+        for (workflow_id, step_id, kind), counts, total, count in latency:
+            labels = f'workflow="{workflow_id}",step="{step_id}",kind="{kind}"'
+            cumulative = 0
+            for bound, bucket_count in zip(LATENCY_BUCKETS, counts):
+                cumulative += bucket_count
+                lines.append(f'puente_step_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'puente_step_duration_seconds_bucket{{{labels},le="+Inf"}} {count}')
+            lines.append(f"puente_step_duration_seconds_sum{{{labels}}} {total:.6f}")
+            lines.append(f"puente_step_duration_seconds_count{{{labels}}} {count}")
+
+        lines += ["# HELP puente_step_outcomes_total Ejecuciones de cada paso por resultado.",
+                  "# TYPE puente_step_outcomes_total counter"]
+        lines += [f'puente_step_outcomes_total{{workflow="{wf}",step="{step}",outcome="{outcome}"}} {count}'
+                  for (wf, step, outcome), count in outcomes]
+
+        lines += ["# HELP puente_step_branches_total Ramas tomadas por cada paso condicional.",
+                  "# TYPE puente_step_branches_total counter"]
+        lines += [f'puente_step_branches_total{{workflow="{wf}",step="{step}",branch="{branch}"}} {count}'
+                  for (wf, step, branch), count in branches]
+        return "\n".join(lines) + "\n"
+
+
+metrics = StepMetrics()
+
+
+def render_prometheus() -> str:
+    """Métricas de todos los workflows en formato de texto de Prometheus."""
+    return metrics.render_prometheus()
+
+
+def _instance_id(instance: Any) -> Optional[str]:
+    value = getattr(instance, "instance_id", None) or getattr(instance, "id", None)
+    return str(value) if value is not None else None
+
+
+def _otel_tracer():
+    try:
+        from opentelemetry import trace
+    except ImportError:
+        return None
+    return trace.get_tracer("puente_catastral")
+
+
+_tracer = _otel_tracer() if TRACE else None
+
+
+def _finish(workflow_id: str, step_id: str, kind: str, instance: Any, start: float,
+            outcome: str, registry: StepMetrics) -> None:
+    elapsed = time.perf_counter() - start
+    registry.observe(workflow_id, step_id, kind, elapsed, outcome)
+    if TRACE:
+        wall_start = time.time() - elapsed
+        span = {"instance_id": _instance_id(instance), "workflow_id": workflow_id, "step_id": step_id,
+                "kind": kind, "start": wall_start, "duration": elapsed, "outcome": outcome}
+        registry.record_span(span)
+        if _tracer is not None:
+            otel_span = _tracer.start_span(f"{workflow_id}.{step_id}", start_time=int(wall_start * 1e9),
+                                           attributes={"puente.instance_id": span["instance_id"] or "",
+                                                       "puente.outcome": outcome})
+            otel_span.end(end_time=int((wall_start + elapsed) * 1e9))
+
+
+def timed(workflow_id: str, step_id: str, kind: str, func: Callable, registry: StepMetrics = metrics) -> Callable:
+    """Envolver una función de paso (síncrona o asíncrona) midiendo su latencia y resultado.
+
+    La instancia del workflow debe ser el primer argumento, como en
+    ``execute(instance, context)`` y ``action(instance, context)``.
+    """
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(instance, *args, **kwargs):
+            start, outcome = time.perf_counter(), "error"
+            try:
+                result = await func(instance, *args, **kwargs)
+                outcome = "ok"
+                return result
+            finally:
+                _finish(workflow_id, step_id, kind, instance, start, outcome, registry)
+        return async_wrapper
+
+    @functools.wraps(func)
+    def wrapper(instance, *args, **kwargs):
+        start, outcome = time.perf_counter(), "error"
+        try:
+            result = func(instance, *args, **kwargs)
+            outcome = "ok"
+            return result
+        finally:
+            _finish(workflow_id, step_id, kind, instance, start, outcome, registry)
+    return wrapper
+
+
+def counted_branches(workflow_id: str, step_id: str, condition: Callable, targets: Tuple[str, str],
+                     registry: StepMetrics = metrics) -> Callable:
+    """Envolver la condición de un paso condicional contando la rama tomada."""
+    @functools.wraps(condition)
+    def wrapper(instance, context):
+        taken = bool(condition(instance, context))
+        registry.count_branch(workflow_id, step_id, targets[0] if taken else targets[1])
+        return taken
+    return wrapper
+
+
+def _steps(workflow: Any) -> List[Any]:
+    steps = getattr(workflow, "steps", None) or []
+    return list(steps.values()) if isinstance(steps, Mapping) else list(steps)
+
+
+def _branch_targets(step: Any) -> Tuple[str, str]:
+    """Pasos destino de las ramas verdadera y falsa (en el orden en que se encadenaron)."""
+    next_ids = [getattr(next_step, "step_id", str(next_step)) for next_step in getattr(step, "next_steps", None) or []]
+    return (next_ids[0] if next_ids else "true", next_ids[1] if len(next_ids) > 1 else "false")
+
+
+def instrument_workflow(workflow_id: str, workflow: Any, registry: StepMetrics = metrics) -> Any:
+    """Instrumentar todos los pasos de un workflow ya construido; devuelve el mismo workflow."""
+    if not ENABLED:
+        return workflow
+    for step in _steps(workflow):
+        step_id = getattr(step, "step_id", type(step).__name__)
+        kind = type(step).__name__
+        if callable(getattr(step, "execute", None)):
+            step.execute = timed(workflow_id, step_id, kind, step.execute, registry)
+        elif callable(getattr(step, "action", None)):
+            step.action = timed(workflow_id, step_id, kind, step.action, registry)
+        if callable(getattr(step, "condition", None)):
+            step.condition = counted_branches(workflow_id, step_id, step.condition, _branch_targets(step), registry)
+    return workflow
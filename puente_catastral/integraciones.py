@@ -0,0 +1,209 @@
+"""
+Consultas de los pasos de integración y almacén de consultas precargadas.
+
+Los pasos de integración llaman a los servicios con ``fetch`` (o
+``fetch_async`` desde corrutinas), que consumen el resultado que la
+precarga especulativa (ver prefetch.py) haya dejado en ``prefetcher`` y,
+si no hay, consultan el servicio normalmente. Una escritura sobre un
+predio descarta sus consultas precargadas (``Prefetcher.discard``) para
+que ningún paso consuma datos anteriores a la escritura.
+
+Los resultados de formularios abandonados expiran a los
+``PUENTE_PREFETCH_TTL`` segundos y un token bucket limita la tasa de
+precargas para no saturar los servicios.
+"""
+
+import asyncio
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, Set, Tuple, Type
+
+import requests
+
+from . import servicios
+from .resiliencia import CircuitOpenError
+
+PREFETCH_ENABLED = os.environ.get("PUENTE_PREFETCH", "0") == "1"
+PREFETCH_TTL = float(os.environ.get("PUENTE_PREFETCH_TTL", 60))
+PREFETCH_RATE = float(os.environ.get("PUENTE_PREFETCH_RATE", 20))
+PREFETCH_BURST = int(os.environ.get("PUENTE_PREFETCH_BURST", 40))
+PREFETCH_WORKERS = int(os.environ.get("PUENTE_PREFETCH_WORKERS", 4))
+MAX_ENTRIES = 10000
+
+CATASTRO_RECORD = ("puente_catastral_service", "/api/catastro/search-record")
+RPP_SEARCH = ("puente_rpp_service", "/api/rpp/search-records")
+VALUATION_SEARCH = ("puente_linking_service", "/api/unified/search-for-valuation")
+
+Service = Tuple[str, str]
+
+# Fallas que llevan un paso con ``fallback`` a su rama de resultado negativo;
+# cualquier otro error es un defecto y se propaga
+FALLBACK_ERRORS: Tuple[Type[BaseException], ...] = (CircuitOpenError, requests.RequestException, OSError)
+if servicios.TRANSPORT == "httpx":
+    import httpx
+    FALLBACK_ERRORS += (httpx.TransportError, httpx.HTTPStatusError)
+
+
+class TokenBucket:
+    """Limitador de tasa: ``rate`` fichas por segundo con ráfagas de hasta ``burst``."""
+
+    def __init__(self, rate: float = PREFETCH_RATE, burst: int = PREFETCH_BURST):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def try_acquire(self) -> bool:
+        """Tomar una ficha si hay disponible, sin esperar."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+
+class Prefetcher:
+    """Consultas lanzadas por adelantado, consumidas una sola vez antes de expirar."""
+
+    def __init__(self, ttl: float = PREFETCH_TTL, bucket: Optional[TokenBucket] = None,
+                 workers: int = PREFETCH_WORKERS, max_entries: int = MAX_ENTRIES):
+        self.ttl = ttl
+        self.bucket = bucket or TokenBucket()
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, Future, Optional[str]]]" = OrderedDict()
+        # Clave catastral -> llaves de sus consultas precargadas
+        self._parcels: Dict[str, Set[str]] = {}
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="prefetch")
+        self._lock = threading.Lock()
+        self._metrics = {"started": 0, "rate_limited": 0, "hits": 0, "misses": 0, "expired": 0, "discarded": 0}
+
+    def _pop(self, key: str) -> Optional[Tuple[float, Future, Optional[str]]]:
+        entry = self._entries.pop(key, None)
+        if entry is not None and entry[2] is not None:
+            keys = self._parcels.get(entry[2])
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._parcels[entry[2]]
+        return entry
+
+    def _purge(self, now: float) -> None:
+        while self._entries:
+            key, (expires, _, _) = next(iter(self._entries.items()))
+            if expires > now and len(self._entries) <= self.max_entries:
+                return
+            self._pop(key)
+            self._metrics["expired"] += 1
+
+    def _submit(self, func: Callable, *args) -> Optional[Future]:
+        if not self.bucket.try_acquire():
+            self._metrics["rate_limited"] += 1
+            return None
+        self._metrics["started"] += 1
+        return self._executor.submit(func, *args)
+
+    def start(self, service: Service, payload: Dict[str, Any]) -> bool:
+        """Lanzar una consulta en segundo plano; False si ya existía o no hubo cupo."""
+        service_name, endpoint = service
+        key = servicios.request_key(service_name, endpoint, payload)
+        now = time.monotonic()
+        with self._lock:
+            self._purge(now)
+            if key in self._entries:
+                return False
+            future = self._submit(lambda: servicios.call_service(service_name, endpoint, payload))
+            if future is None:
+                return False
+            clave = payload.get("clave_catastral")
+            self._entries[key] = (now + self.ttl, future, clave)
+            if clave:
+                self._parcels.setdefault(clave, set()).add(key)
+        return True
+
+    def warm(self, func: Callable, *args) -> bool:
+        """Ejecutar en segundo plano una función que llena su propia caché."""
+        with self._lock:
+            return self._submit(func, *args) is not None
+
+    def take(self, service_name: str, endpoint: str, payload: Dict[str, Any]) -> Optional[Future]:
+        """Retirar la consulta precargada de una solicitud, si sigue vigente."""
+        with self._lock:
+            self._purge(time.monotonic())
+            entry = self._pop(servicios.request_key(service_name, endpoint, payload))
+            self._metrics["hits" if entry else "misses"] += 1
+        return entry[1] if entry else None
+
+    def discard(self, clave_catastral: str) -> int:
+        """Descartar las consultas precargadas de un predio tras una escritura; devuelve cuántas."""
+        with self._lock:
+            keys = self._parcels.pop(clave_catastral, set())
+            for key in keys:
+                self._entries.pop(key, None)
+            self._metrics["discarded"] += len(keys)
+        return len(keys)
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self._metrics, size=len(self._entries))
+
+
+prefetcher = Prefetcher()
+
+
+def fetch(service_name: str, endpoint: str, payload: Dict[str, Any],
+          timeout: Optional[float] = None) -> Dict[str, Any]:
+    """Como ``servicios.call_service``, pero usando el resultado precargado si existe."""
+    future = prefetcher.take(service_name, endpoint, payload) if PREFETCH_ENABLED else None
+    if future is not None:
+        try:
+            return future.result(timeout=timeout or servicios.service_timeout(service_name))
+        except Exception:
+            pass  # La precarga falló o tardó demasiado: consultar normalmente
+    return servicios.call_service(service_name, endpoint, payload, timeout)
+
+
+async def fetch_async(service_name: str, endpoint: str, payload: Dict[str, Any],
+                      timeout: Optional[float] = None) -> Dict[str, Any]:
+    """Como ``fetch`` para corrutinas."""
+    future = prefetcher.take(service_name, endpoint, payload) if PREFETCH_ENABLED else None
+    if future is not None:
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future),
+                                          timeout or servicios.service_timeout(service_name))
+        except Exception:
+            pass  # La precarga falló o tardó demasiado: consultar normalmente
+    return await servicios.call_service_async(service_name, endpoint, payload, timeout)
+
+
+def integration_action(service: Service, fields: Tuple[str, ...],
+                       fallback: Optional[Dict[str, Any]] = None, **renames: str) -> Callable:
+    """Acción equivalente a un IntegrationStep que aprovecha los resultados precargados.
+
+    Sólo para los pasos que necesitan la precarga, el duplicado de lecturas
+    lentas o el resultado negativo ante una falla; los demás usan
+    IntegrationStep.
+
+    Envía los ``fields`` del contexto al servicio; ``renames`` mapea campos
+    de la respuesta a campos del contexto. Con ``fallback``, si el servicio
+    no responde (``FALLBACK_ERRORS``) o su circuito está abierto el paso
+    devuelve ``fallback`` para que el workflow siga su rama de resultado
+    negativo; los demás errores se propagan.
+    """
+    service_name, endpoint = service
+
+    def action(instance, context: Dict[str, Any]) -> Dict[str, Any]:
+        try:
+            result = fetch(service_name, endpoint, {field: context.get(field) for field in fields})
+        except FALLBACK_ERRORS:
+            if fallback is None:
+                raise
+            return dict(fallback, unavailable_sources=[service_name])
+        return {renames.get(field, field): value for field, value in result.items()}
+    return action
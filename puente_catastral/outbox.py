@@ -0,0 +1,270 @@
+"""
+Bandeja de salida durable para la sincronización Catastro → RPP.
+
+Los cambios se guardan en una tabla SQLite (PUENTE_OUTBOX_PATH): los
+cambios pendientes de un mismo predio que aún no se están enviando se
+combinan en una sola entrada con una nueva llave de idempotencia. Un
+worker envía las entradas al RPP por lotes; las que fallan se reintentan
+con espera exponencial y, al agotar los intentos o ante un rechazo
+definitivo, se compensan revirtiendo en Catastro cada cambio combinado en
+la entrada, con la llave que se le devolvió a su workflow.
+
+Cada lote se toma con un arrendamiento (``claimed_by``/``lease_until``)
+en una sola sentencia, de modo que varios workers no envían la misma
+entrada; un cambio que llega mientras su predio se está enviando queda en
+una entrada nueva. El workflow termina en cuanto el cambio queda guardado
+en la bandeja. Los procesos de los workflows no arrancan worker salvo con
+PUENTE_OUTBOX_WORKER=1; el vaciado normal lo hace un worker independiente:
+
+    python -m puente_catastral.outbox
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from . import servicios
+from .cache_certificados import invalidate_parcel
+
+OUTBOX_PATH = os.environ.get("PUENTE_OUTBOX_PATH")
+BATCH_SIZE = int(os.environ.get("PUENTE_OUTBOX_BATCH_SIZE", 100))
+DRAIN_INTERVAL_SECONDS = float(os.environ.get("PUENTE_OUTBOX_INTERVAL", 1.0))
+LEASE_SECONDS = float(os.environ.get("PUENTE_OUTBOX_LEASE", 120.0))
+MAX_ATTEMPTS = int(os.environ.get("PUENTE_OUTBOX_MAX_ATTEMPTS", 8))
+RETRY_BASE_SECONDS = 2.0
+RETRY_MAX_SECONDS = 600.0
+
+RPP_SYNC = ("puente_rpp_service", "/api/rpp/sync-record")
+CATASTRO_ROLLBACK = ("puente_catastral_service", "/api/catastro/update-record")
+
+PENDING = "pending"
+COMPENSATED = "compensated"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    clave_catastral TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    changes TEXT NOT NULL,
+    idempotency_key TEXT NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL,
+    last_error TEXT,
+    claimed_by TEXT,
+    lease_until REAL,
+    updated_at REAL NOT NULL
+)
+"""
+INDEXES = (
+    "CREATE INDEX IF NOT EXISTS outbox_due ON outbox (status, next_attempt_at)",
+    "CREATE INDEX IF NOT EXISTS outbox_clave ON outbox (clave_catastral, status)",
+)
+
+
+def compensate_in_catastro(change: Dict[str, Any]) -> None:
+    """Compensación por defecto: revertir en Catastro un cambio, identificado por su llave."""
+    service_name, endpoint = CATASTRO_ROLLBACK
+    servicios.call_service(service_name, endpoint, {
+        "clave_catastral": change["clave_catastral"],
+        "rollback": True,
+        "idempotency_key": change["idempotency_key"],
+    })
+
+
+def outbox_path() -> str:
+    """Ruta de la bandeja de salida; debe configurarse con PUENTE_OUTBOX_PATH."""
+    if not OUTBOX_PATH:
+        raise RuntimeError("PUENTE_OUTBOX_PATH no configurada")
+    return OUTBOX_PATH
+
+
+class SyncOutbox:
+    """Bandeja de salida SQLite con combinación de cambios por predio."""
+
+    def __init__(self, path: Optional[str] = None,
+                 compensate: Callable[[Dict[str, Any]], None] = compensate_in_catastro):
+        self.path = path or outbox_path()
+        self.compensate = compensate
+        self._lock = threading.Lock()
+        self._worker: Optional[threading.Thread] = None
+        self._connection = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=FULL")
+        self._connection.execute("PRAGMA busy_timeout=5000")
+        self._connection.execute(SCHEMA)
+        for index in INDEXES:
+            self._connection.execute(index)
+        self.metrics = {"enqueued": 0, "coalesced": 0, "delivered": 0, "retried": 0, "compensated": 0}
+
+    def enqueue(self, changes: Dict[str, Any]) -> str:
+        """Guardar un cambio de forma durable; devuelve su llave de idempotencia."""
+        return self.enqueue_many([changes])[0]
+
+    def enqueue_many(self, changes: Iterable[Dict[str, Any]]) -> List[str]:
+        """Guardar varios cambios en una sola transacción."""
+        now = time.time()
+        keys = []
+        with self._lock:
+            self._connection.execute("BEGIN IMMEDIATE")
+            try:
+                for change in changes:
+                    clave = change["clave_catastral"]
+                    key = uuid.uuid4().hex
+                    # Sólo se combina con una entrada que ningún worker está enviando
+                    row = self._connection.execute(
+                        "SELECT id, payload, changes FROM outbox "
+                        "WHERE clave_catastral = ? AND status = ? AND claimed_by IS NULL",
+                        (clave, PENDING)).fetchone()
+                    if row:
+                        entry_id, payload, combined = row
+                        self._connection.execute(
+                            "UPDATE outbox SET payload = ?, changes = ?, idempotency_key = ?, attempts = 0, "
+                            "next_attempt_at = ?, last_error = NULL, updated_at = ? WHERE id = ?",
+                            (json.dumps(dict(json.loads(payload), **change), ensure_ascii=False),
+                             json.dumps(json.loads(combined) + [{"idempotency_key": key, "changes": change}],
+                                        ensure_ascii=False),
+                             key, now, now, entry_id))
+                    else:
+                        self._connection.execute(
+                            "INSERT INTO outbox (clave_catastral, payload, changes, idempotency_key, status, "
+                            "attempts, next_attempt_at, updated_at) VALUES (?, ?, ?, ?, ?, 0, ?, ?)",
+                            (clave, json.dumps(change, ensure_ascii=False),
+                             json.dumps([{"idempotency_key": key, "changes": change}], ensure_ascii=False),
+                             key, PENDING, now, now))
+                    self.metrics["coalesced" if row else "enqueued"] += 1
+                    keys.append(key)
+                self._connection.execute("COMMIT")
+            except Exception:
+                self._connection.execute("ROLLBACK")
+                raise
+        return keys
+
+    def pending_count(self) -> int:
+        """Entradas pendientes de enviar."""
+        with self._lock:
+            return self._connection.execute(
+                "SELECT COUNT(*) FROM outbox WHERE status = ?", (PENDING,)).fetchone()[0]
+
+    def _due(self, limit: int) -> List[Dict[str, Any]]:
+        """Tomar con arrendamiento hasta ``limit`` entradas vencidas; la sentencia es atómica entre procesos."""
+        token = uuid.uuid4().hex
+        now = time.time()
+        with self._lock:
+            self._connection.execute(
+                "UPDATE outbox SET claimed_by = ?, lease_until = ? WHERE id IN ("
+                "SELECT id FROM outbox WHERE status = ? AND next_attempt_at <= ? "
+                "AND (lease_until IS NULL OR lease_until < ?) ORDER BY id LIMIT ?)",
+                (token, now + LEASE_SECONDS, PENDING, now, now, limit))
+            rows = self._connection.execute(
+                "SELECT id, clave_catastral, payload, changes, idempotency_key, attempts FROM outbox "
+                "WHERE claimed_by = ? ORDER BY id", (token,)).fetchall()
+        return [{"id": entry_id, "clave_catastral": clave, "payload": json.loads(payload),
+                 "changes": json.loads(changes), "idempotency_key": key, "attempts": attempts,
+                 "claimed_by": token}
+                for entry_id, clave, payload, changes, key, attempts in rows]
+
+    def drain(self, batch_size: int = BATCH_SIZE) -> Dict[str, int]:
+        """Enviar al RPP un lote de entradas pendientes y registrar el resultado de cada una."""
+        entries = self._due(batch_size)
+        summary = {"delivered": 0, "retried": 0, "compensated": 0}
+        if not entries:
+            return summary
+
+        service_name, endpoint = RPP_SYNC
+        records = [dict(entry["payload"], idempotency_key=entry["idempotency_key"]) for entry in entries]
+        try:
+            results = servicios.call_service(service_name, endpoint, {"records": records}).get("results", [])
+            if len(results) != len(entries):
+                raise ValueError("Respuesta de sincronización incompleta")
+        except Exception as error:
+            results = [{"sync_success": False, "retryable": True, "error": str(error)}] * len(entries)
+
+        for entry, result in zip(entries, results):
+            if result.get("sync_success", False):
+                self._delete(entry)
+                invalidate_parcel(entry["clave_catastral"])
+                summary["delivered"] += 1
+            elif result.get("retryable", True) and entry["attempts"] + 1 < MAX_ATTEMPTS:
+                self._retry(entry, result.get("error"))
+                summary["retried"] += 1
+            else:
+                self._compensate(entry, result.get("error"))
+                summary["compensated"] += 1
+        for name, count in summary.items():
+            self.metrics[name] += count
+        return summary
+
+    def _delete(self, entry: Dict[str, Any]) -> None:
+        # Sólo si el arrendamiento sigue siendo de este worker
+        with self._lock:
+            self._connection.execute("DELETE FROM outbox WHERE id = ? AND claimed_by = ?",
+                                     (entry["id"], entry["claimed_by"]))
+
+    def _retry(self, entry: Dict[str, Any], error: Optional[str]) -> None:
+        delay = min(RETRY_BASE_SECONDS * 2 ** entry["attempts"], RETRY_MAX_SECONDS)
+        with self._lock:
+            self._connection.execute(
+                "UPDATE outbox SET attempts = attempts + 1, next_attempt_at = ?, last_error = ?, "
+                "claimed_by = NULL, lease_until = NULL WHERE id = ? AND claimed_by = ?",
+                (time.time() + delay, error, entry["id"], entry["claimed_by"]))
+
+    def _compensate(self, entry: Dict[str, Any], error: Optional[str]) -> None:
+        # Cada cambio combinado se revierte por separado, del más reciente al más antiguo; si uno
+        # falla la entrada se reintenta y los ya revertidos se repiten con la misma llave.
+        try:
+            for change in reversed(entry["changes"]):
+                self.compensate(dict(change["changes"], clave_catastral=entry["clave_catastral"],
+                                     idempotency_key=change["idempotency_key"]))
+        except Exception as compensation_error:
+            # Sin compensación confirmada la entrada se reintenta más tarde
+            self._retry(entry, f"{error}; compensación fallida: {compensation_error}")
+            return
+        with self._lock:
+            self._connection.execute(
+                "UPDATE outbox SET status = ?, last_error = ?, claimed_by = NULL, lease_until = NULL "
+                "WHERE id = ? AND claimed_by = ?",
+                (COMPENSATED, error, entry["id"], entry["claimed_by"]))
+        invalidate_parcel(entry["clave_catastral"])
+
+    def run_forever(self, interval: float = DRAIN_INTERVAL_SECONDS) -> None:
+        """Vaciar la bandeja continuamente."""
+        while True:
+            try:
+                summary = self.drain()
+            except Exception:
+                summary = {}
+            if not any(summary.values()):
+                time.sleep(interval)
+
+    def ensure_worker(self) -> None:
+        """Arrancar el worker en segundo plano del proceso si aún no corre."""
+        if self._worker is None:
+            with self._lock:
+                if self._worker is None:
+                    self._worker = threading.Thread(target=self.run_forever, name="rpp-outbox", daemon=True)
+                    self._worker.start()
+
+
+_default_outbox: Optional[SyncOutbox] = None
+_default_lock = threading.Lock()
+
+
+def default_outbox() -> SyncOutbox:
+    """Bandeja de salida del proceso (PUENTE_OUTBOX_PATH), con su worker si PUENTE_OUTBOX_WORKER=1."""
+    global _default_outbox
+    if _default_outbox is None:
+        with _default_lock:
+            if _default_outbox is None:
+                _default_outbox = SyncOutbox()
+                if os.environ.get("PUENTE_OUTBOX_WORKER", "0") == "1":
+                    _default_outbox.ensure_worker()
+    return _default_outbox
+
+
+if __name__ == "__main__":
+    default_outbox().run_forever()
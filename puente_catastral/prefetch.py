@@ -0,0 +1,48 @@
+"""
+Precarga especulativa mientras el ciudadano llena el formulario.
+
+Con ``PUENTE_PREFETCH=1``, en cuanto el formulario tiene una clave catastral
+válida se lanzan en segundo plano las consultas del siguiente paso (la
+búsqueda RPP, la búsqueda unificada o la búsqueda para valuación, y el
+análisis de mercado de la zona). Las consultas quedan en el almacén de
+integraciones.py, donde los pasos de integración las consumen.
+"""
+
+from typing import Any, Callable, Dict
+
+from . import integraciones
+from .busqueda_unificada import SEARCH_BACKENDS
+from .datos_mercado import zone_cache, zone_key
+from .formularios import CLAVE_CATASTRAL_RE
+from .integraciones import RPP_SEARCH, VALUATION_SEARCH
+
+
+def prefetch_form(workflow_id: str, form: Dict[str, Any]) -> int:
+    """Lanzar las precargas del workflow para un formulario en captura.
+
+    Se llama con los datos parciales del formulario cada vez que cambian;
+    devuelve cuántas consultas se lanzaron.
+    """
+    clave = form.get("clave_catastral")
+    if not integraciones.PREFETCH_ENABLED or not CLAVE_CATASTRAL_RE.fullmatch(str(clave or "")):
+        return 0
+
+    prefetcher = integraciones.prefetcher
+    started = 0
+    if workflow_id == "actualizacion_catastral_v1":
+        started += prefetcher.start(RPP_SEARCH, {"clave_catastral": clave})
+    elif workflow_id == "certificado_libertad_v1" and form.get("search_type") == "Clave Catastral":
+        payload = {"search_type": "Clave Catastral", "clave_catastral": clave}
+        started += sum(prefetcher.start(backend, payload) for backend in SEARCH_BACKENDS.values())
+    elif workflow_id == "avaluo_catastral_v1":
+        started += prefetcher.start(VALUATION_SEARCH, {"clave_catastral": clave})
+        started += prefetcher.warm(zone_cache.get, zone_key(clave))
+    return started
+
+
+def collect_form_action(workflow_id: str) -> Callable:
+    """Acción de los pasos de captura: espera al ciudadano y precarga con lo ya capturado."""
+    def action(instance, context: Dict[str, Any]) -> Dict[str, Any]:
+        prefetch_form(workflow_id, context)
+        return {"status": "awaiting_input"}
+    return action
@@ -0,0 +1,249 @@
+"""
+Políticas de resiliencia por servicio: timeouts adaptativos, solicitudes
+duplicadas (hedging) y circuit breaker.
+
+Cada servicio guarda, por endpoint, una ventana móvil con la latencia de
+sus últimas peticiones exitosas:
+
+- El timeout de cada lectura idempotente es ``TIMEOUT_MULTIPLIER`` veces
+  el p99 observado, entre ``MIN_TIMEOUT`` y el timeout configurado del
+  servicio.
+- Las lecturas idempotentes envían un duplicado si la primera petición
+  excede el p95 observado y se usa la primera respuesta exitosa de las
+  dos. Ambas peticiones corren en el pool ``HEDGE_WORKERS``, de modo que
+  el llamador no espera a la más lenta. Los duplicados se limitan a
+  ``HEDGE_RATIO`` de las llamadas.
+- Tras ``BREAKER_FAILURES`` fallas consecutivas del servicio (errores de red, timeouts
+  o respuestas 5xx) el circuito se abre y las llamadas fallan de inmediato
+  con ``CircuitOpenError`` durante ``BREAKER_COOLDOWN`` segundos; después,
+  una sola llamada de prueba decide si se cierra de nuevo.
+
+Mientras la ventana tiene menos de ``MIN_SAMPLES`` muestras se usa el
+timeout configurado y no se envían duplicados.
+"""
+
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+ADAPTIVE_TIMEOUTS = os.environ.get("PUENTE_ADAPTIVE_TIMEOUTS", "1") == "1"
+HEDGING = os.environ.get("PUENTE_HEDGING", "1") == "1"
+WINDOW_SIZE = int(os.environ.get("PUENTE_LATENCY_WINDOW", 200))
+MIN_SAMPLES = 20
+MIN_TIMEOUT = float(os.environ.get("PUENTE_MIN_TIMEOUT", 0.5))
+TIMEOUT_MULTIPLIER = float(os.environ.get("PUENTE_TIMEOUT_MULTIPLIER", 3))
+HEDGE_RATIO = float(os.environ.get("PUENTE_HEDGE_RATIO", 0.1))
+HEDGE_BURST = 10
+HEDGE_WORKERS = int(os.environ.get("PUENTE_HEDGE_WORKERS", 32))
+BREAKER_FAILURES = int(os.environ.get("PUENTE_BREAKER_FAILURES", 5))
+BREAKER_COOLDOWN = float(os.environ.get("PUENTE_BREAKER_COOLDOWN", 30))
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """El circuito del servicio está abierto: la petición no se envió."""
+
+
+class LatencyWindow:
+    """Latencias (segundos) de las últimas ``size`` peticiones exitosas."""
+
+    def __init__(self, size: int = WINDOW_SIZE):
+        self._samples: Deque[float] = deque(maxlen=size)
+        self._sorted: Optional[List[float]] = None
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def observe(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+            self._sorted = None
+
+    def percentile(self, q: float) -> Optional[float]:
+        """Percentil ``q`` (0-1) de la ventana; None si aún no hay muestras suficientes."""
+        with self._lock:
+            if len(self._samples) < MIN_SAMPLES:
+                return None
+            if self._sorted is None:
+                self._sorted = sorted(self._samples)
+            ordered = self._sorted
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class CircuitBreaker:
+    """Circuit breaker por fallas consecutivas con una sola llamada de prueba."""
+
+    def __init__(self, failure_threshold: int = BREAKER_FAILURES, cooldown: float = BREAKER_COOLDOWN,
+                 clock: Callable[[], float] = time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.clock = clock
+        self.state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def before_call(self) -> None:
+        """Permitir la llamada o lanzar ``CircuitOpenError``."""
+        with self._lock:
+            if self.state == CLOSED:
+                return
+            if self.state == OPEN and self.clock() - self._opened_at >= self.cooldown:
+                self.state = HALF_OPEN  # Esta llamada es la de prueba
+                return
+            raise CircuitOpenError("Circuito abierto")
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.state = CLOSED
+            self._failures = 0
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self.state == HALF_OPEN or self._failures >= self.failure_threshold:
+                self.state = OPEN
+                self._opened_at = self.clock()
+
+
+_executor = ThreadPoolExecutor(max_workers=HEDGE_WORKERS, thread_name_prefix="hedge")
+
+
+class ServicePolicy:
+    """Circuit breaker del servicio, ventanas de latencia por endpoint y contadores."""
+
+    def __init__(self, service_name: str, breaker: Optional[CircuitBreaker] = None):
+        self.service_name = service_name
+        self.breaker = breaker or CircuitBreaker()
+        self._latencies: Dict[str, LatencyWindow] = {}
+        self._hedge_tokens = 0.0
+        self._lock = threading.Lock()
+        self._counters = {"calls": 0, "failures": 0, "short_circuited": 0, "hedged": 0, "hedge_wins": 0}
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self._counters[name] += 1
+
+    def latencies(self, endpoint: str) -> LatencyWindow:
+        window = self._latencies.get(endpoint)
+        if window is None:
+            with self._lock:
+                window = self._latencies.setdefault(endpoint, LatencyWindow())
+        return window
+
+    def timeout(self, endpoint: str, ceiling: float) -> float:
+        """Timeout de la siguiente lectura al endpoint, sin exceder el configurado."""
+        p99 = self.latencies(endpoint).percentile(0.99) if ADAPTIVE_TIMEOUTS else None
+        return ceiling if p99 is None else min(ceiling, max(MIN_TIMEOUT, p99 * TIMEOUT_MULTIPLIER))
+
+    def hedge_delay(self, endpoint: str) -> Optional[float]:
+        """Espera antes de enviar un duplicado (p95), o None si no se duplicará."""
+        return self.latencies(endpoint).percentile(0.95) if HEDGING else None
+
+    def _take_hedge_token(self) -> bool:
+        with self._lock:
+            if self._hedge_tokens < 1:
+                return False
+            self._hedge_tokens -= 1
+            self._counters["hedged"] += 1
+            return True
+
+    @staticmethod
+    def _timed(window: LatencyWindow, send: Callable[[float], Any], timeout: float) -> Any:
+        start = time.perf_counter()
+        result = send(timeout)
+        window.observe(time.perf_counter() - start)
+        return result
+
+    def _hedged(self, window: LatencyWindow, send: Callable[[float], Any], timeout: float, delay: float) -> Any:
+        """Enviar la petición y, si tarda más de ``delay``, un duplicado; gana la primera exitosa."""
+        primary = _executor.submit(self._timed, window, send, timeout)
+        if wait([primary], timeout=delay).done or not self._take_hedge_token():
+            return primary.result()
+        hedge = _executor.submit(self._timed, window, send, timeout)
+        pending = {primary, hedge}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in (primary, hedge):
+                if future in done and future.exception() is None:
+                    if future is hedge:
+                        self._count("hedge_wins")
+                    return future.result()
+        return primary.result()  # Ambas fallaron: propagar el error de la primera
+
+    def call(self, endpoint: str, send: Callable[[float], Any], ceiling: float, idempotent: bool,
+             is_failure: Callable[[Exception], bool]) -> Any:
+        """Ejecutar ``send(timeout)`` tras consultar el breaker.
+
+        Sólo las lecturas idempotentes usan el timeout adaptativo y se
+        duplican; las escrituras conservan el timeout configurado.
+        """
+        try:
+            self.breaker.before_call()
+        except CircuitOpenError:
+            self._count("short_circuited")
+            raise
+        with self._lock:
+            self._counters["calls"] += 1
+            self._hedge_tokens = min(HEDGE_BURST, self._hedge_tokens + HEDGE_RATIO)
+        window = self.latencies(endpoint)
+        try:
+            if not idempotent:
+                result = self._timed(window, send, ceiling)
+            else:
+                timeout, delay = self.timeout(endpoint, ceiling), self.hedge_delay(endpoint)
+                result = (self._timed(window, send, timeout) if delay is None
+                          else self._hedged(window, send, timeout, delay))
+        except Exception as error:
+            if is_failure(error):
+                self._count("failures")
+                self.breaker.record_failure()
+            else:
+                self.breaker.record_success()  # El servicio respondió (p. ej. un 4xx)
+            raise
+        self.breaker.record_success()
+        return result
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            counters = dict(self._counters)
+            windows = dict(self._latencies)
+        latencies = {}
+        for endpoint, window in windows.items():
+            percentiles = {f"p{int(q * 100)}_ms": window.percentile(q) for q in (0.5, 0.95, 0.99)}
+            latencies[endpoint] = dict(samples=len(window), **{
+                name: None if value is None else value * 1000 for name, value in percentiles.items()})
+        return dict(counters, state=self.breaker.state, latencies=latencies)
+
+
+_policies: Dict[str, ServicePolicy] = {}
+_policies_lock = threading.Lock()
+
+
+def policy(service_name: str) -> ServicePolicy:
+    """Obtener la política de un servicio, creándola si no existe."""
+    service_policy = _policies.get(service_name)
+    if service_policy is None:
+        with _policies_lock:
+            service_policy = _policies.setdefault(service_name, ServicePolicy(service_name))
+    return service_policy
+
+
+def metrics() -> Dict[str, Dict[str, Any]]:
+    """Estado del circuito, latencias y contadores de duplicados por servicio."""
+    with _policies_lock:
+        policies = dict(_policies)
+    return {name: service_policy.metrics() for name, service_policy in policies.items()}
+
+
+def reset() -> None:
+    """Olvidar latencias y estado de todos los servicios (p. ej. en pruebas)."""
+    with _policies_lock:
+        _policies.clear()
@@ -0,0 +1,200 @@
+"""
+Acceso a los servicios de integración PUENTE.
+
+Cada servicio tiene una sola sesión HTTP por proceso, con conexiones
+keep-alive reutilizadas desde un pool. Los endpoints idempotentes
+(búsquedas y consultas) se reintentan con espera exponencial aleatoria
+ante errores de red o respuestas 5xx, y las llamadas idénticas en curso a
+uno de ellos comparten una sola petición al backend (ver singleflight.py).
+Cada servicio tiene además timeouts adaptativos, duplicado de lecturas
+lentas y circuit breaker (ver resiliencia.py).
+
+El transporte es siempre síncrono (``requests`` o ``httpx.Client``): no hay
+cliente asíncrono. ``call_service_async`` sólo permite llamar desde
+corrutinas ejecutando la petición bloqueante en un pool de hilos del
+proceso, de modo que las llamadas concurrentes desde corrutinas quedan
+acotadas por ``PUENTE_HTTP_WORKERS``.
+
+Configuración por variables de entorno:
+
+- ``<SERVICIO>_URL`` / ``PUENTE_SERVICES_BASE_URL``: URL base (obligatoria; sin
+  ninguna de las dos la llamada falla con un error de configuración).
+- ``<SERVICIO>_TIMEOUT``: timeout en segundos.
+- ``<SERVICIO>_POOL_SIZE`` / ``PUENTE_HTTP_POOL_SIZE``: conexiones por servicio.
+- ``PUENTE_HTTP_RETRIES`` y ``PUENTE_HTTP_BACKOFF``: reintentos y espera base.
+- ``PUENTE_HTTP_WORKERS``: hilos que atienden las llamadas desde corrutinas.
+- ``PUENTE_HTTP_TRANSPORT=httpx``: usar el cliente síncrono de httpx con HTTP/2
+  (requiere ``httpx[http2]``).
+"""
+
+import asyncio
+import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from . import resiliencia
+from .singleflight import SingleFlight
+
+# URL base común; cada servicio puede sobrescribirla con <SERVICIO>_URL
+DEFAULT_BASE_URL = os.environ.get("PUENTE_SERVICES_BASE_URL")
+DEFAULT_TIMEOUT = 10.0
+DEFAULT_POOL_SIZE = int(os.environ.get("PUENTE_HTTP_POOL_SIZE", 10))
+RETRIES = int(os.environ.get("PUENTE_HTTP_RETRIES", 2))
+BACKOFF_SECONDS = float(os.environ.get("PUENTE_HTTP_BACKOFF", 0.1))
+TRANSPORT = os.environ.get("PUENTE_HTTP_TRANSPORT", "requests")
+ASYNC_WORKERS = int(os.environ.get("PUENTE_HTTP_WORKERS", 64))
+
+# Endpoints de sólo lectura que pueden reintentarse sin efectos secundarios
+IDEMPOTENT_ENDPOINTS = {
+    "/api/catastro/search-record",
+    "/api/rpp/search-records",
+    "/api/rpp/events",
+    "/api/unified/search-property",
+    "/api/unified/search-for-valuation",
+    "/api/market/zone-analysis",
+}
+
+_sessions: Dict[str, Any] = {}
+_sessions_lock = threading.Lock()
+
+# Hilos del proceso para las llamadas desde corrutinas: un timeout abandona
+# la petición sin que el cierre del event loop tenga que esperarla
+_executor = ThreadPoolExecutor(max_workers=ASYNC_WORKERS, thread_name_prefix="servicios")
+
+# Lecturas idénticas en curso; single_flight.metrics() cuenta las colapsadas
+single_flight = SingleFlight(executor=_executor)
+
+
+def service_url(service_name: str) -> str:
+    """Obtener la URL base de un servicio (p. ej. PUENTE_RPP_SERVICE_URL)."""
+    url = os.environ.get(f"{service_name.upper()}_URL", DEFAULT_BASE_URL)
+    if not url:
+        raise RuntimeError(f"{service_name.upper()}_URL o PUENTE_SERVICES_BASE_URL no configurada")
+    return url.rstrip("/")
+
+
+def service_timeout(service_name: str) -> float:
+    """Obtener el timeout en segundos de un servicio (p. ej. PUENTE_RPP_SERVICE_TIMEOUT)."""
+    return float(os.environ.get(f"{service_name.upper()}_TIMEOUT", DEFAULT_TIMEOUT))
+
+
+def service_pool_size(service_name: str) -> int:
+    """Obtener el tamaño del pool de conexiones de un servicio."""
+    return int(os.environ.get(f"{service_name.upper()}_POOL_SIZE", DEFAULT_POOL_SIZE))
+
+
+def _create_session(service_name: str):
+    pool_size = service_pool_size(service_name)
+    if TRANSPORT == "httpx":
+        import httpx
+        limits = httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size)
+        return httpx.Client(http2=True, limits=limits)
+
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def get_session(service_name: str):
+    """Obtener la sesión HTTP compartida de un servicio, creándola si no existe."""
+    session = _sessions.get(service_name)
+    if session is None:
+        with _sessions_lock:
+            session = _sessions.get(service_name)
+            if session is None:
+                session = _sessions[service_name] = _create_session(service_name)
+    return session
+
+
+def close_sessions() -> None:
+    """Cerrar todas las sesiones (p. ej. al detener el worker)."""
+    with _sessions_lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
+
+
+def _is_retryable(error: Exception) -> bool:
+    if isinstance(error, requests.HTTPError):
+        return error.response is not None and error.response.status_code >= 500
+    if TRANSPORT == "httpx":
+        import httpx
+        if isinstance(error, httpx.HTTPStatusError):
+            return error.response.status_code >= 500
+        return isinstance(error, httpx.TransportError)
+    return isinstance(error, (requests.ConnectionError, requests.Timeout))
+
+
+def _backoff(attempt: int) -> float:
+    """Espera exponencial con jitter completo."""
+    return random.uniform(0, BACKOFF_SECONDS * (2 ** attempt))
+
+
+def request_key(service_name: str, endpoint: str, payload: Dict[str, Any]) -> str:
+    """Llave de una solicitud: servicio, endpoint y payload en forma canónica."""
+    return f"{service_name}{endpoint}:{json.dumps(payload, sort_keys=True, ensure_ascii=False)}"
+
+
+def _request(service_name: str, endpoint: str, payload: Dict[str, Any], timeout: float) -> bytes:
+    """Enviar la petición (con reintentos si el endpoint es idempotente) y devolver el cuerpo.
+
+    ``timeout`` es el máximo; la política del servicio puede reducirlo.
+    """
+    idempotent = endpoint in IDEMPOTENT_ENDPOINTS
+    retries = RETRIES if idempotent else 0
+    session = get_session(service_name)
+    url = service_url(service_name) + endpoint
+
+    def send(call_timeout: float) -> bytes:
+        for attempt in range(retries + 1):
+            try:
+                response = session.post(url, json=payload, timeout=call_timeout)
+                response.raise_for_status()
+                return response.content
+            except Exception as error:
+                if attempt >= retries or not _is_retryable(error):
+                    raise
+                time.sleep(_backoff(attempt))
+
+    return resiliencia.policy(service_name).call(endpoint, send, timeout, idempotent, _is_retryable)
+
+
+def call_service(service_name: str, endpoint: str, payload: Dict[str, Any],
+                 timeout: Optional[float] = None) -> Dict[str, Any]:
+    """Invocar un endpoint de un servicio de integración y devolver su respuesta JSON."""
+    if timeout is None:
+        timeout = service_timeout(service_name)
+    if endpoint in IDEMPOTENT_ENDPOINTS:
+        body = single_flight.do(request_key(service_name, endpoint, payload),
+                                _request, service_name, endpoint, payload, timeout)
+    else:
+        body = _request(service_name, endpoint, payload, timeout)
+    # Cada llamador decodifica su propia copia de la respuesta compartida
+    return json.loads(body)
+
+
+async def call_service_async(service_name: str, endpoint: str, payload: Dict[str, Any],
+                             timeout: Optional[float] = None) -> Dict[str, Any]:
+    """Como ``call_service`` para corrutinas.
+
+    La petición usa el mismo cliente síncrono y ocupa un hilo de ``_executor``
+    mientras dura; sólo las lecturas idénticas que se unen a una en curso
+    esperan su resultado sin ocupar otro hilo.
+    """
+    if endpoint not in IDEMPOTENT_ENDPOINTS:
+        return await asyncio.get_running_loop().run_in_executor(
+            _executor, call_service, service_name, endpoint, payload, timeout)
+    if timeout is None:
+        timeout = service_timeout(service_name)
+    body = await single_flight.do_async(request_key(service_name, endpoint, payload),
+                                        _request, service_name, endpoint, payload, timeout)
+    return json.loads(body)
@@ -0,0 +1,69 @@
+"""
+Escrituras de la actualización catastral: registro en Catastro y sincronización al RPP.
+
+Toda escritura confirmada en Catastro invalida los certificados en caché
+del predio y actualiza su dirección y propietario en el índice de búsqueda
+local. La sincronización al RPP se deja en la bandeja de salida durable
+(outbox), que invalida de nuevo el predio cuando el RPP confirma la entrega.
+"""
+
+from typing import Any, Dict
+
+from . import servicios
+from .busqueda_local import default_index as search_index
+from .cache_certificados import invalidate_parcel
+from .outbox import default_outbox
+
+CATASTRO_UPDATE = ("puente_catastral_service", "/api/catastro/update-record")
+
+# Campos del contexto que se envían como cambios del predio
+UPDATE_FIELDS = ("clave_catastral", "tipo_actualizacion", "observaciones",
+                 "propietario", "direccion", "superficie", "uso_suelo")
+
+
+def update_payload(context: Dict[str, Any]) -> Dict[str, Any]:
+    """Cambios del predio a partir del contexto del workflow."""
+    payload = {field: context[field] for field in UPDATE_FIELDS if context.get(field) is not None}
+    linked = context.get("linked_rpp_record") or {}
+    if linked.get("folio_real"):
+        payload["folio_real"] = linked["folio_real"]
+    return payload
+
+
+def index_parcel(record: Dict[str, Any]) -> None:
+    """Reflejar la dirección y el propietario de un predio en el índice de búsqueda."""
+    if record.get("clave_catastral") and (record.get("direccion") or record.get("propietario")):
+        search_index().upsert(record["clave_catastral"], record.get("direccion"), record.get("propietario"))
+
+
+def update_catastral_record(instance, context: Dict[str, Any]) -> Dict[str, Any]:
+    """Acción del paso update_catastral_record.
+
+    Sólo una actualización confirmada por Catastro (``success``) invalida la
+    caché y el índice de búsqueda; una rechazada no se sincroniza al RPP.
+    """
+    service_name, endpoint = CATASTRO_UPDATE
+    payload = update_payload(context)
+    result = servicios.call_service(service_name, endpoint, payload)
+    if not result.get("success", False):
+        return {"status": "update_failed", "catastro_update_success": False, "catastro_update": result}
+    invalidate_parcel(payload.get("clave_catastral"))
+    index_parcel(payload)
+    return {"status": "updated", "catastro_update_success": True, "catastro_update": result}
+
+
+def sync_to_rpp(instance, context: Dict[str, Any]) -> Dict[str, Any]:
+    """Acción del paso sync_to_rpp: guardar el cambio en la bandeja de salida.
+
+    El paso tiene éxito en cuanto el cambio queda guardado; si no puede
+    guardarse, o Catastro rechazó la actualización, verify_synchronization
+    revierte. La caché del predio se invalida al entregarse el cambio.
+    """
+    if not context.get("catastro_update_success", True):
+        return {"status": "sync_skipped", "sync_success": False,
+                "sync_error": "actualización rechazada por Catastro"}
+    try:
+        idempotency_key = default_outbox().enqueue(update_payload(context))
+    except Exception as error:
+        return {"status": "sync_failed", "sync_success": False, "sync_error": str(error)}
+    return {"status": "sync_queued", "sync_success": True, "sync_idempotency_key": idempotency_key}
@@ -0,0 +1,73 @@
+"""
+Deduplicación de llamadas idénticas en curso (single-flight).
+
+Mientras una llamada con cierta llave está en curso, las llamadas con la
+misma llave que llegan desde otros hilos o tareas asyncio esperan su
+resultado en lugar de repetirla. El resultado (o la excepción) se comparte
+con todos. La llave se libera al terminar: no es una caché, y una llamada
+posterior vuelve a consultar el backend.
+"""
+
+import asyncio
+import threading
+from concurrent.futures import Executor, Future
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+
+class SingleFlight:
+    """Grupo de llamadas en curso indexadas por llave.
+
+    ``executor`` ejecuta las llamadas iniciadas desde corrutinas. Conviene
+    uno del proceso y no el del event loop: ``asyncio.run`` espera a los
+    hilos de su executor al cerrar, aunque el llamador ya haya desistido.
+    """
+
+    def __init__(self, executor: Optional[Executor] = None):
+        self.executor = executor
+        self._calls: Dict[Hashable, Future] = {}
+        self._lock = threading.Lock()
+        self._counters = {"calls": 0, "collapsed": 0}
+
+    def _join(self, key: Hashable) -> Tuple[Future, bool]:
+        """Unirse a la llamada en curso de ``key``; True si este llamador la ejecuta."""
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                self._counters["collapsed"] += 1
+                return future, False
+            future = self._calls[key] = Future()
+            self._counters["calls"] += 1
+            return future, True
+
+    def _run(self, key: Hashable, future: Future, func: Callable, args: Tuple) -> None:
+        try:
+            result, error = func(*args), None
+        except BaseException as exc:
+            result, error = None, exc
+        # Liberar la llave antes de publicar el resultado: nadie se une a una llamada terminada
+        with self._lock:
+            del self._calls[key]
+        if error is None:
+            future.set_result(result)
+        else:
+            future.set_exception(error)
+
+    def do(self, key: Hashable, func: Callable, *args) -> Any:
+        """Ejecutar ``func(*args)`` o esperar el resultado de la llamada idéntica en curso."""
+        future, leader = self._join(key)
+        if leader:
+            self._run(key, future, func, args)
+        return future.result()
+
+    async def do_async(self, key: Hashable, func: Callable, *args) -> Any:
+        """Como ``do`` para corrutinas: ``func`` es bloqueante y corre en ``executor``."""
+        future, leader = self._join(key)
+        if leader:
+            asyncio.get_running_loop().run_in_executor(self.executor, self._run, key, future, func, args)
+        # Cancelar a un llamador (p. ej. por timeout) no cancela la llamada compartida
+        return await asyncio.shield(asyncio.wrap_future(future))
+
+    def metrics(self) -> Dict[str, int]:
+        """Llamadas ejecutadas, llamadas colapsadas en una en curso y llamadas en curso."""
+        with self._lock:
+            return dict(self._counters, in_flight=len(self._calls))
@@ -0,0 +1,147 @@
+"""
+Motor de valuación catastral masiva.
+
+El valor de cada predio es el valor del terreno (superficie por valor
+unitario de suelo de su zona) más el de la construcción (superficie
+construida por valor unitario de su clase de uso, depreciado por edad).
+Todo se calcula sobre arreglos de NumPy, de modo que un sector completo
+se valúa en una sola pasada; el avalúo individual usa el mismo motor con
+un lote de un predio.
+"""
+
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, Optional, Tuple
+
+import numpy as np
+
+from .datos_mercado import zone_key
+
+BATCH_SIZE = 50000
+
+# Valor unitario de construcción por clase de uso ($/m²)
+CONSTRUCTION_UNIT_VALUES = {
+    "baldio": 0.0,
+    "habitacional": 8500.0,
+    "comercial": 11000.0,
+    "industrial": 7000.0,
+    "mixto": 9500.0,
+}
+USE_CLASSES = list(CONSTRUCTION_UNIT_VALUES)
+DEFAULT_USE_CLASS = "habitacional"
+
+# Depreciación lineal por año de antigüedad, con valor residual mínimo
+DEPRECIATION_PER_YEAR = 0.01
+MIN_DEPRECIATION_FACTOR = 0.4
+
+_UNIT_VALUES = np.array([CONSTRUCTION_UNIT_VALUES[name] for name in USE_CLASSES])
+_USE_CODES = {name: code for code, name in enumerate(USE_CLASSES)}
+
+
+def encode_use_classes(names: Iterable[Optional[str]]) -> np.ndarray:
+    """Códigos numéricos de las clases de uso (las desconocidas cuentan como habitacional)."""
+    default = _USE_CODES[DEFAULT_USE_CLASS]
+    return np.fromiter((_USE_CODES.get(str(name or "").lower(), default) for name in names), dtype=np.int8)
+
+
+def appraise(land_surface: np.ndarray, built_surface: np.ndarray, use_class: np.ndarray,
+             zone_unit_value: np.ndarray, age: Optional[np.ndarray] = None) -> Dict[str, np.ndarray]:
+    """Valuar un lote de predios; todos los arreglos tienen un elemento por predio."""
+    land_value = np.asarray(land_surface, dtype=np.float64) * np.asarray(zone_unit_value, dtype=np.float64)
+    depreciation = np.ones_like(land_value)
+    if age is not None:
+        depreciation = np.clip(1.0 - DEPRECIATION_PER_YEAR * np.asarray(age, dtype=np.float64),
+                               MIN_DEPRECIATION_FACTOR, 1.0)
+    built_value = np.asarray(built_surface, dtype=np.float64) * _UNIT_VALUES[use_class] * depreciation
+    return {
+        "valor_terreno": np.round(land_value, 2),
+        "valor_construccion": np.round(built_value, 2),
+        "valor_catastral": np.round(land_value + built_value, 2),
+    }
+
+
+def _column(records: List[Mapping[str, Any]], field: str) -> np.ndarray:
+    return np.array([float(r.get(field) or 0.0) for r in records], dtype=np.float64)
+
+
+def appraise_records(records: List[Mapping[str, Any]],
+                     zone_values: Mapping[str, float]) -> List[Dict[str, float]]:
+    """Valuar una lista de predios con los valores unitarios de suelo por zona."""
+    if not records:
+        return []
+    zone_value = np.array([float(zone_values.get(zone_key(r.get("clave_catastral")), 0.0)) for r in records])
+    result = appraise(
+        _column(records, "superficie_terreno"),
+        _column(records, "superficie_construccion"),
+        encode_use_classes(r.get("uso_suelo") for r in records),
+        zone_value,
+        _column(records, "antiguedad"),
+    )
+    return [dict(zip(result, values)) for values in zip(*(column.tolist() for column in result.values()))]
+
+
+def appraise_sector(records: Iterable[Mapping[str, Any]], zone_values: Mapping[str, float],
+                    batch_size: int = BATCH_SIZE) -> Iterator[Tuple[Mapping[str, Any], Dict[str, float]]]:
+    """Revaluar un sector completo por lotes, generando (predio, valuación)."""
+    iterator = iter(records)
+    while True:
+        batch = list(islice(iterator, batch_size))
+        if not batch:
+            return
+        yield from zip(batch, appraise_records(batch, zone_values))
+
+
+def land_unit_values(comparables: Iterable[Mapping[str, Any]]) -> List[float]:
+    """Valor unitario de suelo implícito en cada venta comparable (método residual).
+
+    Al precio total de la venta (``precio``, o ``precio_m2`` por
+    ``superficie_terreno``) se le resta el valor de su construcción
+    calculado con el mismo motor, y el resto se divide entre la superficie
+    del terreno. Las ventas sin superficie de terreno o de construcción
+    conocida se descartan: su precio no separa suelo y construcción.
+    """
+    usable = [sale for sale in comparables
+              if float(sale.get("superficie_terreno") or 0) > 0 and sale.get("superficie_construccion") is not None
+              and (sale.get("precio") or sale.get("precio_m2"))]
+    if not usable:
+        return []
+    land_surface = _column(usable, "superficie_terreno")
+    price = np.array([float(sale.get("precio") or float(sale["precio_m2"]) * float(sale["superficie_terreno"]))
+                      for sale in usable])
+    built_value = appraise(land_surface, _column(usable, "superficie_construccion"),
+                           encode_use_classes(sale.get("uso_suelo") for sale in usable),
+                           np.zeros(len(usable)), _column(usable, "antiguedad"))["valor_construccion"]
+    land_values = (price - built_value) / land_surface
+    return [float(value) for value in land_values if value > 0]
+
+
+def perform_valuation(instance, context: Dict[str, Any]) -> Dict[str, Any]:
+    """Acción del paso perform_valuation: avalúo de un predio como lote de uno.
+
+    Los datos del predio se toman de ``property_record`` (o del propio
+    contexto) y el valor unitario de suelo del análisis de mercado de la
+    zona (``market_data.valor_unitario_suelo``); si la zona no lo tiene se
+    usa la mediana del valor de suelo implícito en las ventas comparables
+    (ver ``land_unit_values``). Sin ninguno de los dos el resultado es
+    ``insufficient_data`` y el avalúo no continúa; también lo es si el
+    servicio de mercado no respondió.
+    """
+    if context.get("status") == "market_data_unavailable":
+        return {"status": "completed", "valuation_result": "insufficient_data"}
+    record = dict(context.get("property_record") or context)
+    record.setdefault("clave_catastral", context.get("clave_catastral"))
+    market_data = context.get("market_data") or {}
+    comparable_values = land_unit_values(context.get("comparables") or [])
+    comparables_m2 = float(np.median(comparable_values)) if comparable_values else None
+
+    unit_value = market_data.get("valor_unitario_suelo") or comparables_m2
+    if unit_value is None:
+        return {"status": "completed", "valuation_result": "insufficient_data"}
+
+    valuation = appraise_records([record], {zone_key(record["clave_catastral"]): unit_value})[0]
+    return {
+        "status": "completed",
+        "valuation_result": "success",
+        "comparables_count": len(comparable_values),
+        "precio_m2_comparables": comparables_m2,
+        **valuation,
+    }
@@ -0,0 +1,227 @@
+"""
+Motor de vinculación de registros Catastro ↔ RPP.
+
+Los candidatos se agrupan por bloque (los dos primeros segmentos de la
+clave catastral, ``XX-XXX``) y se califican por propietario, dirección y
+superficie. La similitud de texto se calcula con vectores de bigramas de
+caracteres, de modo que cada lote se compara en una sola operación
+matricial de NumPy.
+"""
+
+import unicodedata
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+MATCH_THRESHOLD = 90
+COMPARISON_FIELDS = ("propietario", "direccion", "superficie")
+FEATURE_DIM = 256
+BATCH_SIZE = 10000
+
+# Peso de cada atributo en la calificación final
+WEIGHTS = {"propietario": 0.45, "direccion": 0.35, "superficie": 0.20}
+
+# Signos de puntuación ASCII -> espacio
+_PUNCTUATION = str.maketrans({chr(c): " " for c in range(128) if not chr(c).isalnum()})
+
+
+def normalize_text(value: Any) -> str:
+    """Normalizar texto: mayúsculas, sin acentos ni signos, espacios simples."""
+    if not value:
+        return ""
+    text = unicodedata.normalize("NFKD", str(value).upper()).encode("ascii", "ignore").decode("ascii")
+    return " ".join(text.translate(_PUNCTUATION).split())
+
+
+def block_key(clave_catastral: Optional[str]) -> Optional[str]:
+    """Bloque de una clave catastral: región y manzana (``XX-XXX``)."""
+    if not clave_catastral:
+        return None
+    return "-".join(str(clave_catastral).split("-")[:2])
+
+
+def text_features(texts: List[Any], dim: int = FEATURE_DIM) -> np.ndarray:
+    """Vectores normalizados de bigramas de caracteres, uno por texto."""
+    encoded = [(" " + normalize_text(t) + " ").encode("ascii") for t in texts]
+    if not encoded:
+        return np.zeros((0, dim), dtype=np.float32)
+
+    lengths = np.fromiter((len(e) for e in encoded), dtype=np.int64, count=len(encoded))
+    chars = np.frombuffer(b"".join(encoded), dtype=np.uint8).astype(np.int64)
+    rows = np.repeat(np.arange(len(encoded)), lengths)
+
+    # Bigramas consecutivos dentro del mismo texto
+    same_text = rows[:-1] == rows[1:]
+    codes = ((chars[:-1] * 131 + chars[1:]) * 2654435761 % dim)[same_text]
+    counts = np.bincount(rows[:-1][same_text] * dim + codes, minlength=len(encoded) * dim)
+    features = counts.reshape(len(encoded), dim).astype(np.float32)
+
+    # Textos vacíos sólo tienen el bigrama de relleno "  "; se dejan en cero
+    empty = lengths <= 2
+    features[empty] = 0.0
+    norms = np.linalg.norm(features, axis=1, keepdims=True)
+    np.divide(features, norms, out=features, where=norms > 0)
+    return features
+
+
+def _surfaces(records: List[Dict[str, Any]]) -> np.ndarray:
+    values = [record.get("superficie") for record in records]
+    return np.array([float(v) if v not in (None, "") else np.nan for v in values], dtype=np.float64)
+
+
+def _combine(owner: np.ndarray, address: np.ndarray, surface: np.ndarray) -> np.ndarray:
+    """Calificación 0-100; los atributos ausentes no cuentan en el promedio."""
+    features = np.stack([owner, address, surface])
+    weights = np.array([WEIGHTS["propietario"], WEIGHTS["direccion"], WEIGHTS["superficie"]])
+    weights = weights.reshape((3,) + (1,) * (features.ndim - 1))
+    present = ~np.isnan(features)
+    total = np.where(present, weights, 0.0).sum(axis=0)
+    weighted = np.where(present, features * weights, 0.0).sum(axis=0)
+    return np.round(100.0 * np.divide(weighted, total, out=np.zeros_like(weighted), where=total > 0), 2)
+
+
+def _text_similarity(left: np.ndarray, right: np.ndarray) -> np.ndarray:
+    """Matriz de similitud coseno; nan cuando alguno de los textos está vacío."""
+    similarity = (left @ right.T).astype(np.float64)
+    missing = ~left.any(axis=1)[:, None] | ~right.any(axis=1)[None, :]
+    similarity[missing] = np.nan
+    return similarity
+
+
+def _surface_similarity(left: np.ndarray, right: np.ndarray) -> np.ndarray:
+    """Similitud de superficies: 1 - diferencia relativa; nan si falta alguna."""
+    a, b = left[:, None], right[None, :]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        similarity = 1.0 - np.abs(a - b) / np.maximum(a, b)
+    return np.clip(similarity, 0.0, 1.0)
+
+
+def score_matrix(catastro: List[Dict[str, Any]], rpp: List[Dict[str, Any]]) -> np.ndarray:
+    """Calificar todos los pares (catastro x rpp) en una sola pasada vectorizada."""
+    owner = _text_similarity(text_features([r.get("propietario") for r in catastro]),
+                             text_features([r.get("propietario") for r in rpp]))
+    address = _text_similarity(text_features([r.get("direccion") for r in catastro]),
+                               text_features([r.get("direccion") for r in rpp]))
+    surface = _surface_similarity(_surfaces(catastro), _surfaces(rpp))
+    return _combine(owner, address, surface)
+
+
+def score_candidates(record: Dict[str, Any], candidates: List[Dict[str, Any]]) -> np.ndarray:
+    """Calificar los candidatos RPP de un registro catastral.
+
+    Los candidatos cuya clave pertenece a otro bloque se descartan con
+    calificación 0.
+    """
+    if not candidates:
+        return np.zeros(0)
+    scores = score_matrix([record], candidates)[0]
+    block = block_key(record.get("clave_catastral"))
+    if block:
+        other_block = np.array([
+            bool(c.get("clave_catastral")) and block_key(c.get("clave_catastral")) != block
+            for c in candidates
+        ])
+        scores[other_block] = 0.0
+    return scores
+
+
+def best_match(record: Dict[str, Any], candidates: List[Dict[str, Any]]) -> Tuple[Optional[int], float]:
+    """Índice y calificación del mejor candidato, o (None, 0.0) si no hay."""
+    scores = score_candidates(record, candidates)
+    if not len(scores):
+        return None, 0.0
+    index = int(np.argmax(scores))
+    return index, float(scores[index])
+
+
+def _blocks(records: Iterable[Dict[str, Any]]) -> Iterator[Tuple[str, List[Dict[str, Any]]]]:
+    """Agrupar un padrón ordenado por clave catastral en bloques consecutivos."""
+    current, group = None, []
+    for record in records:
+        key = block_key(record.get("clave_catastral")) or ""
+        if current is not None and key < current:
+            raise ValueError("El padrón debe estar ordenado por clave_catastral")
+        if key != current and group:
+            yield current, group
+            group = []
+        current = key
+        group.append(record)
+    if group:
+        yield current, group
+
+
+def link_roll(catastro: Iterable[Dict[str, Any]], rpp: Iterable[Dict[str, Any]],
+              batch_size: int = BATCH_SIZE
+              ) -> Iterator[Tuple[Dict[str, Any], Optional[Dict[str, Any]], float]]:
+    """Vincular un padrón catastral completo contra el RPP.
+
+    Ambos padrones deben venir ordenados por clave catastral; se recorren
+    en paralelo bloque por bloque, por lo que la memoria queda acotada por
+    el tamaño del lote y no por el del padrón. Genera tuplas
+    (registro catastral, mejor registro RPP o None, calificación).
+    """
+    rpp_blocks = _blocks(rpp)
+    rpp_key, rpp_group = next(rpp_blocks, (None, []))
+    pending: List[Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]] = []
+    pending_size = 0
+
+    for key, group in _blocks(catastro):
+        while rpp_key is not None and rpp_key < key:
+            rpp_key, rpp_group = next(rpp_blocks, (None, []))
+        pending.append((group, rpp_group if rpp_key == key else []))
+        pending_size += len(group)
+        if pending_size >= batch_size:
+            yield from _link_batch(pending)
+            pending, pending_size = [], 0
+
+    if pending:
+        yield from _link_batch(pending)
+
+
+def _link_batch(pending: List[Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]]
+                ) -> Iterator[Tuple[Dict[str, Any], Optional[Dict[str, Any]], float]]:
+    """Calificar un lote de bloques, calculando los vectores de todo el lote a la vez."""
+    catastro = [record for group, _ in pending for record in group]
+    rpp = [record for _, candidates in pending for record in candidates]
+    owner = (text_features([r.get("propietario") for r in catastro]),
+             text_features([r.get("propietario") for r in rpp]))
+    address = (text_features([r.get("direccion") for r in catastro]),
+               text_features([r.get("direccion") for r in rpp]))
+    surface = (_surfaces(catastro), _surfaces(rpp))
+
+    row, col = 0, 0
+    for group, candidates in pending:
+        rows, cols = slice(row, row + len(group)), slice(col, col + len(candidates))
+        if candidates:
+            scores = _combine(_text_similarity(owner[0][rows], owner[1][cols]),
+                              _text_similarity(address[0][rows], address[1][cols]),
+                              _surface_similarity(surface[0][rows], surface[1][cols]))
+            best = scores.argmax(axis=1)
+            for i, record in enumerate(group):
+                yield record, candidates[best[i]], float(scores[i, best[i]])
+        else:
+            for record in group:
+                yield record, None, 0.0
+        row += len(group)
+        col += len(candidates)
+
+
+def auto_linking_process(instance, context: Dict[str, Any]) -> Dict[str, Any]:
+    """Acción del paso auto_linking_process.
+
+    Califica los registros RPP encontrados (``rpp_records``) contra el
+    registro catastral consultado (``catastro_record``). Si el registro no
+    se obtuvo o no tiene ningún atributo comparable, la calificación es 0 y
+    el trámite pasa a revisión manual.
+    """
+    record = context.get("catastro_record") or {}
+    if not any(record.get(field) not in (None, "") for field in COMPARISON_FIELDS):
+        return {"status": "processed", "match_score": 0.0, "linked_rpp_record": None,
+                "linking_issue": "catastro_record_missing"}
+    candidates = context.get("rpp_records") or []
+    index, score = best_match(record, candidates)
+    return {
+        "status": "processed",
+        "match_score": score,
+        "linked_rpp_record": candidates[index] if index is not None else None,
+    }
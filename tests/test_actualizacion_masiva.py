@@ -0,0 +1,138 @@
+"""
+Tests para la actualización catastral masiva.
+"""
+
+import io
+import json
+
+import pytest
+from puente_catastral import actualizacion_masiva, cache_certificados, outbox
+from puente_catastral.sincronizacion import UPDATE_FIELDS
+
+# Registros vigentes en Catastro; el resto de las claves están a nombre de ANA ROJAS
+CATASTRO_RECORDS = {
+    "09-123-002": {"propietario": "PEDRO INFANTE", "direccion": "OTRA", "superficie": 900},
+    "09-123-003": None,
+}
+
+
+@pytest.fixture
+def sent_records():
+    """Registros enviados a cada endpoint."""
+    return {}
+
+
+@pytest.fixture
+def fake_services(monkeypatch, tmp_path, sent_records):
+    """Servicios simulados que registran cada llamada por lote y los registros enviados."""
+    monkeypatch.setattr(outbox, "_default_outbox", outbox.SyncOutbox(str(tmp_path / "outbox.sqlite3")))
+    monkeypatch.setattr(cache_certificados, "_default_store",
+                        cache_certificados.GenerationStore(str(tmp_path / "generations.sqlite3")))
+    calls = []
+
+    def call_service(service_name, endpoint, payload, timeout=None):
+        calls.append((endpoint, len(payload["records"])))
+        records = payload["records"]
+        sent_records.setdefault(endpoint, []).extend(records)
+        if endpoint == "/api/catastro/search-record":
+            default = {"propietario": "ANA ROJAS", "direccion": "CALLE 1", "superficie": 100}
+            return {"results": [{"record": CATASTRO_RECORDS.get(r["clave_catastral"], default)} for r in records]}
+        if endpoint == "/api/rpp/search-records":
+            return {"results": [{"records": [{"folio_real": "F-" + r["clave_catastral"], "propietario": "ANA ROJAS",
+                                              "direccion": "CALLE 1", "superficie": 100}]} for r in records]}
+        if endpoint == "/api/catastro/update-record":
+            return {"results": [{"success": not r["clave_catastral"].endswith("999")} for r in records]}
+        return {"results": [{"sync_success": True} for _ in records]}
+
+    monkeypatch.setattr(actualizacion_masiva.servicios, "call_service", call_service)
+    return calls
+
+
+def _write_updates(path, rows):
+    with open(path, "w", encoding="utf-8") as target:
+        for row in rows:
+            target.write(json.dumps(row, ensure_ascii=False) + "\n")
+
+
+def test_bulk_update_batches_service_calls(tmp_path, fake_services):
+    """Las filas se envían a los servicios en lotes."""
+    rows = [{"clave_catastral": f"09-124-{i:03d}", "tipo_actualizacion": "Cambio de propietario",
+             "propietario": "Ana Rojas", "direccion": "Calle 1", "superficie": 100} for i in range(25)]
+    path = tmp_path / "updates.jsonl"
+    _write_updates(path, rows)
+
+    summary = actualizacion_masiva.run_bulk_update(str(path), batch_size=10)
+
+    assert summary["rows"] == 25
+    assert summary["states"] == {"actualizacion_completada": 25}
+    assert len(fake_services) == 9
+    assert [endpoint for endpoint, _ in fake_services[:3]] == [
+        "/api/catastro/search-record", "/api/rpp/search-records", "/api/catastro/update-record"]
+    assert [size for _, size in fake_services[:3]] == [10, 10, 10]
+    assert outbox.default_outbox().pending_count() == 25
+
+
+def test_bulk_update_routes_rows_to_terminal_states(tmp_path, fake_services):
+    """Cada fila termina en el mismo estado terminal que el workflow."""
+    base = {"tipo_actualizacion": "Cambio de propietario", "direccion": "Calle 1", "superficie": 100}
+    rows = [
+        dict(base, clave_catastral="09-123-001", propietario="Ana Rojas"),
+        dict(base, clave_catastral="09-123-999", propietario="Ana Rojas"),
+        dict(base, clave_catastral="09-123-002", propietario="Pedro Infante", direccion="Otra", superficie=900),
+        dict(base, clave_catastral="0912", propietario="Ana Rojas"),
+    ]
+    path = tmp_path / "updates.jsonl"
+    _write_updates(path, rows)
+    output = io.StringIO()
+
+    summary = actualizacion_masiva.run_bulk_update(str(path), output=output)
+    states = {json.loads(line)["clave_catastral"]: json.loads(line)["state"] for line in output.getvalue().splitlines()}
+
+    assert summary["rows_per_second"] > 0
+    assert states == {
+        "09-123-001": "actualizacion_completada",
+        "09-123-999": "rollback_changes",
+        "09-123-002": "manual_review_required",
+        "0912": "validation_failed",
+    }
+
+
+def test_bulk_update_collects_invalid_rows(tmp_path, fake_services, monkeypatch):
+    """Las filas sin registro catastral o con superficie no numérica van a revisión sin detener el lote."""
+    invalidated = []
+    monkeypatch.setattr(actualizacion_masiva, "invalidate_parcel", invalidated.append)
+    base = {"tipo_actualizacion": "Cambio de propietario", "propietario": "Ana Rojas", "direccion": "Calle 1"}
+    rows = [
+        dict(base, clave_catastral="09-123-001", superficie=100),
+        dict(base, clave_catastral="09-123-002", superficie="cien"),
+        {"clave_catastral": "09-123-003", "tipo_actualizacion": "Cambio de propietario"},
+    ]
+    path = tmp_path / "updates.jsonl"
+    _write_updates(path, rows)
+    output = io.StringIO()
+
+    actualizacion_masiva.run_bulk_update(str(path), output=output)
+    results = {json.loads(line)["clave_catastral"]: json.loads(line) for line in output.getvalue().splitlines()}
+
+    assert results["09-123-001"]["state"] == "actualizacion_completada"
+    assert results["09-123-002"]["errors"] == ["superficie inválido"]
+    assert results["09-123-003"]["state"] == "manual_review_required"
+    assert results["09-123-003"]["linking_issue"] == "catastro_record_missing"
+    assert invalidated == ["09-123-001"]
+
+
+def test_bulk_update_links_against_catastro_record_and_sends_update_payload(tmp_path, fake_services, sent_records):
+    """Un cambio de propietario se vincula con el titular vigente y envía sólo los campos del predio."""
+    row = {"clave_catastral": "09-123-001", "tipo_actualizacion": "Cambio de propietario",
+           "propietario": "Pedro Infante", "direccion": "", "superficie": "100", "notas": "interno"}
+    path = tmp_path / "updates.csv"
+    path.write_text(",".join(row) + "\n" + ",".join(row.values()) + "\n", encoding="utf-8")
+
+    summary = actualizacion_masiva.run_bulk_update(str(path))
+
+    assert summary["states"] == {"actualizacion_completada": 1}
+    assert sent_records["/api/catastro/update-record"] == [{
+        "clave_catastral": "09-123-001", "tipo_actualizacion": "Cambio de propietario",
+        "propietario": "Pedro Infante", "superficie": 100.0, "folio_real": "F-09-123-001",
+    }]
+    assert set(sent_records["/api/catastro/update-record"][0]) <= set(UPDATE_FIELDS) | {"folio_real"}
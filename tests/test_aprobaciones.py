@@ -0,0 +1,167 @@
+"""
+Tests para la cola de aprobaciones y la rueda de temporizadores.
+"""
+
+import random
+
+import pytest
+from puente_catastral import aprobaciones
+from puente_catastral.aprobaciones import REVIEW_ROLE, TIMED_OUT, ApprovalScheduler, TimerWheel, connect
+
+
+class Clock:
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def test_timer_wheel_expires_each_key_at_its_deadline():
+    """Cada temporizador vence en su tick, incluso a días de distancia."""
+    rng = random.Random(7)
+    start = 1_000_000.0
+    wheel = TimerWheel(tick=1.0, slots=(16, 8, 8), now=start)
+    deadlines = {key: start + rng.randint(1, 3000) for key in range(500)}
+    for key, deadline in deadlines.items():
+        wheel.schedule(key, deadline)
+    for key in range(0, 500, 5):
+        wheel.cancel(key)
+        del deadlines[key]
+
+    expired_at = {}
+    for second in range(1, 3001):
+        for key in wheel.advance(start + second):
+            expired_at[key] = start + second
+
+    assert expired_at == deadlines
+    assert len(wheel) == 0
+
+
+def test_claims_follow_purpose_priority_and_age():
+    """Se toman primero los propósitos prioritarios y, dentro de cada uno, los más antiguos."""
+    clock = Clock()
+    scheduler = ApprovalScheduler(clock=clock)
+    for approval_id, proposito in [("a", "Donación"), ("b", "Crédito hipotecario"), ("c", "Donación"),
+                                   ("d", "Crédito hipotecario")]:
+        scheduler.enqueue(REVIEW_ROLE, proposito, approval_id=approval_id)
+        clock.now += 1
+
+    claimed = [scheduler.claim(REVIEW_ROLE, "sup1").approval_id for _ in range(4)]
+
+    assert claimed == ["b", "d", "a", "c"]
+    assert scheduler.claim(REVIEW_ROLE, "sup1") is None
+
+
+def test_assignment_balances_supervisors_and_complete_frees_capacity():
+    """Cada asignación va al supervisor con menos trabajo en curso."""
+    scheduler = ApprovalScheduler(clock=Clock(), max_in_progress=2)
+    for supervisor in ("sup1", "sup2"):
+        scheduler.add_supervisor(REVIEW_ROLE, supervisor)
+    for _ in range(6):
+        scheduler.enqueue(REVIEW_ROLE, "Compraventa")
+
+    assigned = [scheduler.assign(REVIEW_ROLE) for _ in range(5)]
+
+    assert [approval.supervisor for approval in assigned[:4]] == ["sup1", "sup2", "sup1", "sup2"]
+    assert assigned[4] is None
+    scheduler.complete(assigned[1].approval_id, approved=True)
+    assert scheduler.assign(REVIEW_ROLE).supervisor == "sup2"
+    metrics = scheduler.metrics()
+    assert metrics["queue_depth"] == {REVIEW_ROLE: {"Compraventa": 1}}
+    assert metrics["in_progress"] == {REVIEW_ROLE: {"sup1": 2, "sup2": 2}}
+    with pytest.raises(ValueError):
+        scheduler.complete(assigned[1].approval_id, approved=False)
+
+
+def test_pending_and_claimed_approvals_time_out():
+    """Las aprobaciones vencen a las 24 horas, tomadas o no."""
+    clock = Clock()
+    timed_out = []
+    scheduler = ApprovalScheduler(clock=clock, on_decision=timed_out.append)
+    scheduler.enqueue(REVIEW_ROLE, "Herencia", approval_id="pending")
+    scheduler.enqueue(REVIEW_ROLE, "Herencia", approval_id="claimed")
+    scheduler.claim(REVIEW_ROLE, "sup1")
+
+    assert scheduler.tick(clock.now + 23 * 3600) == []
+    expired = scheduler.tick(clock.now + 24 * 3600)
+
+    assert {approval.approval_id for approval in expired} == {"pending", "claimed"}
+    assert timed_out == expired
+    assert scheduler.claim(REVIEW_ROLE, "sup1") is None
+    assert scheduler.metrics()["timed_out"] == 2
+    assert scheduler.metrics()["timers"] == 0
+
+
+def test_open_approvals_survive_restart(tmp_path):
+    """La cola, lo tomado y los plazos se restauran al reabrir el planificador."""
+    clock = Clock()
+    path = str(tmp_path / "approvals.sqlite3")
+    scheduler = ApprovalScheduler(clock=clock, path=path)
+    scheduler.enqueue(REVIEW_ROLE, "Herencia", approval_id="claimed")
+    scheduler.enqueue(REVIEW_ROLE, "Compraventa", approval_id="pending")
+    scheduler.claim(REVIEW_ROLE, "sup1")
+
+    restored = ApprovalScheduler(clock=clock, path=path)
+
+    assert restored.metrics()["queue_depth"] == {REVIEW_ROLE: {"Herencia": 1}}
+    assert restored.metrics()["in_progress"] == {REVIEW_ROLE: {"sup1": 1}}
+    assert restored.complete("pending", approved=True).status == "approved"
+    assert {approval.approval_id for approval in restored.tick(clock.now + 24 * 3600)} == {"claimed"}
+
+
+def test_undelivered_decisions_are_retried(tmp_path):
+    """Una decisión que el workflow no acepta se reintenta, también tras reiniciar."""
+    clock = Clock()
+    path = str(tmp_path / "approvals.sqlite3")
+    resolved = []
+
+    def resolver(approval):
+        if not resolved and approval.status == TIMED_OUT:
+            resolved.append(None)
+            raise RuntimeError("instancia ocupada")
+        resolved.append((approval.approval_id, approval.status))
+
+    scheduler = ApprovalScheduler(clock=clock, on_decision=resolver, path=path)
+    scheduler.enqueue(REVIEW_ROLE, "Herencia", approval_id="i-1")
+    scheduler.tick(clock.now + 24 * 3600)
+    assert scheduler.metrics()["undelivered"] == 1
+
+    restored = ApprovalScheduler(clock=clock, on_decision=resolver, path=path)
+    restored.tick()
+
+    assert resolved[1:] == [("i-1", TIMED_OUT)]
+    assert restored.metrics()["undelivered"] == 0
+    assert ApprovalScheduler(clock=clock, path=path).metrics()["undelivered"] == 0
+
+
+def test_reviews_submitted_by_workflow_workers_reach_the_scheduler(tmp_path, monkeypatch):
+    """Las revisiones que registra otro proceso se cargan en el siguiente tick del planificador."""
+    clock = Clock()
+    path = str(tmp_path / "approvals.sqlite3")
+    scheduler = ApprovalScheduler(clock=clock, path=path)
+    monkeypatch.setattr(aprobaciones, "_connection", connect(path))
+
+    class Instance:
+        instance_id = "i-1"
+
+    context = {"proposito_avaluo": "Compraventa", "clave_catastral": "09-123-456", "valor_catastral": 1000.0}
+    assert aprobaciones.enqueue_review(Instance(), context)["approval_id"] == "i-1"
+    aprobaciones.enqueue_review(Instance(), context)  # Reintento del paso: no se duplica
+    assert scheduler.claim(REVIEW_ROLE, "sup1") is None
+
+    scheduler.tick()
+
+    approval = scheduler.claim(REVIEW_ROLE, "sup1")
+    assert (approval.approval_id, approval.payload["clave_catastral"]) == ("i-1", "09-123-456")
+    assert scheduler.metrics()["queue_depth"] == {REVIEW_ROLE: {}}
+    assert scheduler.metrics()["enqueued"] == 1
+
+
+def test_approvals_path_must_be_configured(monkeypatch):
+    """Sin PUENTE_APPROVALS_PATH no se abre una tabla en el directorio actual."""
+    monkeypatch.setattr(aprobaciones, "APPROVALS_PATH", None)
+    monkeypatch.setattr(aprobaciones, "_connection", None)
+
+    with pytest.raises(RuntimeError):
+        aprobaciones.enqueue_review(None, {"proposito_avaluo": "Compraventa"})
@@ -0,0 +1,87 @@
+"""
+Tests para el índice local de búsqueda por dirección y propietario.
+"""
+
+import pytest
+from puente_catastral import busqueda_local
+from puente_catastral.busqueda_local import SearchIndex, normalize_address
+
+
+@pytest.fixture
+def index():
+    index = SearchIndex()
+    index.upsert("09-123-456", "Av. Juárez 123, Col. Centro", "José Pérez López")
+    index.upsert("09-123-457", "Calle Morelos 45, Col. Roma", "María Gómez Ruiz")
+    index.upsert("09-124-001", "Av. Juárez 800, Col. Centro", "Pedro Sánchez Cruz")
+    return index
+
+
+def test_normalize_address_folds_abbreviations():
+    """Acentos y abreviaturas de domicilios se normalizan."""
+    assert normalize_address("C. Niños Héroes #5, Col. Doctores") == "CALLE NINOS HEROES 5 COLONIA DOCTORES"
+
+
+def test_search_ranks_closest_address_first(index):
+    """La dirección más parecida encabeza los candidatos."""
+    results = index.search("direccion", "avenida juarez 123 colonia centro")
+
+    assert results[0]["clave_catastral"] == "09-123-456"
+    assert results[0]["score"] == 1.0
+    assert results[1]["clave_catastral"] == "09-124-001"
+
+
+def test_search_tolerates_typos_in_owner(index):
+    """Las búsquedas por propietario toleran errores de captura."""
+    assert index.search("propietario", "Maria Gomes Ruiz")[0]["clave_catastral"] == "09-123-457"
+
+
+def test_incremental_update_and_snapshot(index, tmp_path):
+    """Las actualizaciones se reflejan en el índice y en su instantánea."""
+    index.upsert("09-123-456", propietario="Ana Torres Vega")
+    path = str(tmp_path / "busqueda.jsonl.gz")
+    index.save(path)
+    loaded = SearchIndex.load(path)
+
+    assert len(loaded) == 3
+    assert loaded.search("propietario", "Ana Torres Vega")[0]["clave_catastral"] == "09-123-456"
+    assert all(r["clave_catastral"] != "09-123-456" for r in loaded.search("propietario", "Jose Perez Lopez"))
+    assert loaded.search("direccion", "Av Juarez 123")[0]["clave_catastral"] == "09-123-456"
+
+
+def test_second_instance_sees_updates(tmp_path):
+    """Las escrituras de un proceso se ven desde otra instancia sobre la misma tabla."""
+    path = str(tmp_path / "busqueda.sqlite3")
+    writer, reader = SearchIndex(path), SearchIndex(path)
+    writer.upsert("09-123-456", "Av. Juárez 123, Col. Centro", "José Pérez López")
+    assert reader.search("propietario", "Jose Perez Lopez")[0]["clave_catastral"] == "09-123-456"
+
+    writer.upsert("09-123-456", propietario="Ana Torres Vega")
+    writer.upsert("09-123-457", "Calle Morelos 45, Col. Roma", "María Gómez Ruiz")
+    writer.remove("09-123-457")
+
+    assert reader.search("propietario", "Ana Torres Vega")[0]["clave_catastral"] == "09-123-456"
+    assert reader.search("direccion", "Av Juarez 123")[0]["clave_catastral"] == "09-123-456"
+    assert len(reader) == 1
+    assert len(SearchIndex(path)) == 1
+
+
+def test_resolve_search_criteria_by_address(index, monkeypatch):
+    """Una búsqueda por dirección exacta resuelve la clave catastral."""
+    monkeypatch.setattr(busqueda_local, "_default_index", index)
+
+    result = busqueda_local.resolve_search_criteria({"search_type": "Dirección",
+                                                     "direccion": "Calle Morelos 45, Colonia Roma"})
+
+    assert result["clave_catastral"] == "09-123-457"
+    assert busqueda_local.resolve_search_criteria({"search_type": "Clave Catastral", "clave_catastral": "09-123-456"}) == {}
+
+
+def test_approximate_match_requires_confirmation(index, monkeypatch):
+    """Sin coincidencia exacta se devuelven candidatos para que el solicitante confirme."""
+    monkeypatch.setattr(busqueda_local, "_default_index", index)
+
+    result = busqueda_local.resolve_search_criteria({"search_type": "Dirección", "direccion": "Calle Morelos 45"})
+
+    assert "clave_catastral" not in result
+    assert result["candidate_confirmation_required"] is True
+    assert result["search_candidates"][0]["clave_catastral"] == "09-123-457"
@@ -0,0 +1,77 @@
+"""
+Tests para la búsqueda concurrente Catastro/RPP.
+"""
+
+import json
+import threading
+
+import pytest
+from puente_catastral import busqueda_unificada, servicios
+
+
+def _fake_service(responses, blocks=None):
+    """Servicio simulado; cada servicio de ``blocks`` espera a su función antes de responder."""
+    def request(service_name, endpoint, payload, timeout):
+        (blocks or {}).get(service_name, lambda: None)()
+        return json.dumps(responses[service_name]).encode()
+    return request
+
+
+def test_search_queries_both_registries_concurrently(monkeypatch):
+    """Ambos registros se consultan en paralelo y se combinan."""
+    # Cada consulta espera a la otra: en serie la barrera se rompe y la búsqueda queda parcial
+    both_started = threading.Barrier(2, timeout=2)
+    monkeypatch.setattr(servicios, "_request", _fake_service(
+        {"puente_catastral_service": {"record": {"clave_catastral": "09-123-456"}},
+         "puente_rpp_service": {"records": [{"folio_real": "F-1"}]}},
+        {"puente_catastral_service": both_started.wait, "puente_rpp_service": both_started.wait}
+    ))
+
+    result = busqueda_unificada.search_unified_records(None, {"clave_catastral": "09-123-456"})
+
+    assert result["property_found"] is True
+    assert result["partial_results"] is False
+    assert result["rpp_records"] == [{"folio_real": "F-1"}]
+
+
+def test_search_reports_partial_results_on_timeout(monkeypatch):
+    """Si un registro excede su timeout se reportan resultados parciales."""
+    release = threading.Event()
+    monkeypatch.setattr(servicios, "_request", _fake_service(
+        {"puente_catastral_service": {"record": {"clave_catastral": "09-123-456"}},
+         "puente_rpp_service": {"records": []}},
+        {"puente_rpp_service": lambda: release.wait(10)}
+    ))
+    monkeypatch.setitem(busqueda_unificada.SEARCH_TIMEOUTS, "rpp", 0.1)
+
+    try:
+        result = busqueda_unificada.search_unified_records(None, {"clave_catastral": "09-123-456"})
+    finally:
+        release.set()
+
+    assert result["property_found"] is True
+    assert result["partial_results"] is True
+    assert result["unavailable_sources"] == ["rpp"]
+
+
+def test_backend_timeout_bounds_the_step(monkeypatch):
+    """El paso no espera al hilo de un backend que excedió su timeout."""
+    release, finished = threading.Event(), threading.Event()
+    monkeypatch.setattr(servicios, "_request", _fake_service(
+        {"puente_catastral_service": {"record": {"clave_catastral": "09-123-456"}},
+         "puente_rpp_service": {"records": []}},
+        {"puente_rpp_service": lambda: release.wait(10) and finished.set()}
+    ))
+    monkeypatch.setitem(busqueda_unificada.SEARCH_TIMEOUTS, "rpp", 0.2)
+
+    try:
+        result = busqueda_unificada.search_unified_records(None, {"clave_catastral": "09-123-456"})
+        # El paso terminó mientras la consulta al RPP sigue bloqueada
+        assert not finished.is_set()
+    finally:
+        release.set()
+
+    assert result["unavailable_sources"] == ["rpp"]
+    # Con el predio en Catastro pero sin respuesta del RPP no se emite el certificado
+    assert result["property_found"] is True
+    assert busqueda_unificada.rpp_available(None, result) is False
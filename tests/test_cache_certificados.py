@@ -0,0 +1,105 @@
+"""
+Tests para la caché de resultados del certificado de libertad de gravamen.
+"""
+
+import pytest
+from puente_catastral import cache_certificados, outbox, sincronizacion
+from puente_catastral.cache_certificados import CertificateCache, GenerationStore
+
+
+@pytest.fixture
+def cache(monkeypatch, tmp_path):
+    cache = CertificateCache(generations=GenerationStore(str(tmp_path / "generations.sqlite3")))
+    monkeypatch.setattr(cache_certificados, "certificate_cache", cache)
+    monkeypatch.setattr(cache_certificados, "search_unified_records",
+                        lambda instance, context: {"status": "searched", "property_found": True, "rpp_records": []})
+    monkeypatch.setattr(cache_certificados, "analyze_lien_status",
+                        lambda instance, context: {"status": "analyzed", "liens_found": False, "gravamenes": []})
+    return cache
+
+
+def _run_certificate(clave):
+    context = {"clave_catastral": clave}
+    context.update(cache_certificados.search_with_cache(None, context))
+    if not context["certificate_cache_hit"]:
+        context.update(cache_certificados.analyze_with_cache(None, context))
+    return context
+
+
+def test_repeated_certificate_is_served_from_cache(cache):
+    """Una segunda solicitud del mismo predio reutiliza el resultado."""
+    assert _run_certificate("09-123-456")["certificate_cache_hit"] is False
+    second = _run_certificate("09-123-456")
+
+    assert second["certificate_cache_hit"] is True
+    assert second["liens_found"] is False
+    assert cache.metrics()["hit_ratio"] == 0.5
+
+
+def test_catastral_write_invalidates_cached_certificate(cache, monkeypatch, tmp_path):
+    """Una actualización confirmada del predio invalida su certificado; encolarla al RPP no."""
+    box = outbox.SyncOutbox(str(tmp_path / "outbox.sqlite3"))
+    monkeypatch.setattr(outbox, "_default_outbox", box)
+    monkeypatch.setattr(sincronizacion, "index_parcel", lambda record: None)
+    monkeypatch.setattr(sincronizacion.servicios, "call_service",
+                        lambda service_name, endpoint, payload, timeout=None: {"success": True})
+    _run_certificate("09-123-456")
+
+    context = {"clave_catastral": "09-123-456"}
+    context.update(sincronizacion.update_catastral_record(None, context))
+    assert _run_certificate("09-123-456")["certificate_cache_hit"] is False
+
+    context.update(sincronizacion.sync_to_rpp(None, context))
+    assert _run_certificate("09-123-456")["certificate_cache_hit"] is True
+    assert cache.metrics()["invalidations"] == 1
+
+
+def test_delivered_sync_invalidates_cached_certificate(cache, monkeypatch, tmp_path):
+    """La entrega confirmada del cambio al RPP invalida el certificado."""
+    box = outbox.SyncOutbox(str(tmp_path / "outbox.sqlite3"))
+    monkeypatch.setattr(outbox.servicios, "call_service", lambda service_name, endpoint, payload, timeout=None: {
+        "results": [{"sync_success": True} for _ in payload["records"]]})
+    box.enqueue({"clave_catastral": "09-123-456"})
+    _run_certificate("09-123-456")
+
+    assert box.drain()["delivered"] == 1
+    assert _run_certificate("09-123-456")["certificate_cache_hit"] is False
+
+
+def test_rejected_update_is_not_synchronized(cache, monkeypatch, tmp_path):
+    """Una actualización rechazada por Catastro no invalida la caché ni se encola."""
+    box = outbox.SyncOutbox(str(tmp_path / "outbox.sqlite3"))
+    monkeypatch.setattr(outbox, "_default_outbox", box)
+    monkeypatch.setattr(sincronizacion.servicios, "call_service",
+                        lambda service_name, endpoint, payload, timeout=None: {"success": False})
+    context = {"clave_catastral": "09-123-456"}
+
+    context.update(sincronizacion.update_catastral_record(None, context))
+    context.update(sincronizacion.sync_to_rpp(None, context))
+
+    assert context["sync_success"] is False
+    assert box.pending_count() == 0
+    assert cache.metrics()["invalidations"] == 0
+
+
+def test_generations_are_shared_between_processes(tmp_path):
+    """Una escritura registrada por otro proceso invalida la caché local."""
+    path = str(tmp_path / "generations.sqlite3")
+    local = CertificateCache(generations=GenerationStore(path))
+    worker = CertificateCache(generations=GenerationStore(path))
+    local.put("09-123-456", {"liens_found": False}, local.generation("09-123-456"))
+
+    worker.invalidate("09-123-456")
+
+    assert local.get("09-123-456") is None
+
+
+def test_result_computed_before_a_write_is_not_stored(cache):
+    """Un resultado calculado antes de una escritura no se guarda."""
+    context = {"clave_catastral": "09-123-456"}
+    context.update(cache_certificados.search_with_cache(None, context))
+    cache.invalidate("09-123-456")
+    context.update(cache_certificados.analyze_with_cache(None, context))
+
+    assert cache.get("09-123-456") is None
+    assert cache.metrics()["stale_puts"] == 1
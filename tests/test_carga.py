@@ -0,0 +1,28 @@
+"""
+Tests para la prueba de carga con servicios simulados.
+"""
+
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+
+def test_load_run_reaches_terminal_states(tmp_path):
+    """Una corrida corta lleva cada instancia a su estado esperado y escribe JSON."""
+    output = tmp_path / "carga.json"
+    result = subprocess.run([sys.executable, os.path.join("benchmarks", "bench_carga.py"), "--instances", "30",
+                             "--concurrency", "10", "--latency-ms", "0", "--output", str(output)],
+                            cwd=ROOT, capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+
+    document = json.loads(output.read_text(encoding="utf-8"))
+    states = {workflow_id: run["states"] for workflow_id, run in document["workflows"].items()}
+    assert states == {
+        "actualizacion_catastral_v1": {"actualizacion_completada": 10},
+        "certificado_libertad_v1": {"certificado_emitido": 10},
+        "avaluo_catastral_v1": {"valuation_review": 10},
+    }
+    assert document["version"] and document["services"]["puente_rpp_service"]["requests"] >= 20
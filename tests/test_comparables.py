@@ -0,0 +1,59 @@
+"""
+Tests para el índice espacial de comparables.
+"""
+
+import json
+from datetime import date
+
+import pytest
+from puente_catastral.comparables import ComparablesIndex, load_sales
+
+SALES = [
+    {"sale_id": 1, "latitud": 19.4326, "longitud": -99.1332, "fecha": "2025-06-01", "uso_suelo": "habitacional", "precio_m2": 30000},
+    {"sale_id": 2, "latitud": 19.4335, "longitud": -99.1340, "fecha": "2025-03-01", "uso_suelo": "habitacional", "precio_m2": 32000},
+    {"sale_id": 3, "latitud": 19.4330, "longitud": -99.1335, "fecha": "2025-05-01", "uso_suelo": "comercial", "precio_m2": 45000},
+    {"sale_id": 4, "latitud": 19.4326, "longitud": -99.1330, "fecha": "2019-01-01", "uso_suelo": "habitacional", "precio_m2": 18000},
+    {"sale_id": 5, "latitud": 19.5000, "longitud": -99.2000, "fecha": "2025-06-01", "uso_suelo": "habitacional", "precio_m2": 20000},
+]
+
+
+@pytest.fixture
+def index():
+    index = ComparablesIndex(cell_size=100)
+    for sale in SALES:
+        index.insert(sale)
+    return index
+
+
+def test_nearest_within_radius_and_window(index):
+    """Sólo se devuelven ventas dentro del radio y la ventana de tiempo, por distancia."""
+    results = index.nearest(19.4327, -99.1333, k=5, radius=500, window_days=365, on="2025-10-01")
+
+    assert [sale["sale_id"] for sale in results] == [1, 3, 2]
+    assert results[0]["distancia_m"] < results[1]["distancia_m"] < results[2]["distancia_m"]
+
+
+def test_nearest_filters_by_use_class_and_k(index):
+    """El filtro de uso y el límite k se aplican a los candidatos."""
+    results = index.nearest(19.4327, -99.1333, k=1, radius=500, on="2025-10-01", uso_suelo="habitacional")
+    assert [sale["sale_id"] for sale in results] == [1]
+
+
+def test_incremental_insert_is_visible(index):
+    """Las ventas nuevas se consultan sin reconstruir el índice."""
+    index.insert({"sale_id": 6, "latitud": 19.50001, "longitud": -99.20001, "fecha": "2025-09-01",
+                  "uso_suelo": "habitacional", "precio_m2": 21000})
+    results = index.nearest(19.5, -99.2, radius=50, on="2025-10-01")
+    assert sorted(sale["sale_id"] for sale in results) == [5, 6]
+
+
+def test_sales_file_loads_recent_sales(tmp_path):
+    """Al arrancar se cargan las ventas recientes exportadas, con el cursor del feed."""
+    path = tmp_path / "ventas.jsonl"
+    sales = [dict(SALES[0], fecha=date.today().isoformat(), sequence=7), dict(SALES[3], sequence=9)]
+    path.write_text("".join(json.dumps(sale) + "\n" for sale in sales), encoding="utf-8")
+
+    index = load_sales(str(path), ComparablesIndex(cell_size=100))
+
+    assert len(index) == 1
+    assert index.last_sequence == 9
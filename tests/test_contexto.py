@@ -0,0 +1,84 @@
+"""
+Tests para los contextos tipados y las instantáneas binarias.
+"""
+
+import json
+
+import pytest
+from puente_catastral import contexto
+from puente_catastral.contexto import context_dict, dump_snapshot, load_snapshot, typed_context
+
+AVALUO = {
+    "clave_catastral": "09-123-456", "proposito_avaluo": "Compraventa", "solicitante": "ANA ROJAS",
+    "records_complete": True, "property_record": {"superficie_terreno": 200, "uso_suelo": "habitacional"},
+    "market_data": {"valor_unitario_suelo": 2500.0}, "valor_catastral": 812345.5,
+    "comparables": [{"precio_m2": 2400.0, "distancia_m": 120.5}] * 10,
+    "campo_adicional": "se conserva",
+}
+
+
+def test_snapshot_round_trip_preserves_context():
+    """Una instancia restaurada tiene el mismo contexto, paso e identificador."""
+    data = dump_snapshot("avaluo_catastral_v1", AVALUO, instance_id="i-1", step_id="valuation_review")
+    snapshot = load_snapshot(data)
+
+    assert (snapshot.workflow_id, snapshot.instance_id, snapshot.step_id) == (
+        "avaluo_catastral_v1", "i-1", "valuation_review")
+    assert context_dict(snapshot.context) == AVALUO
+    assert snapshot.context.records_complete is True
+    assert len(data) < len(json.dumps(AVALUO).encode("utf-8")) / 2
+
+
+def test_typed_context_converts_field_types():
+    """Los campos se validan y convierten según el modelo del workflow."""
+    context = typed_context("actualizacion_catastral_v1", {"match_score": "92.5", "sync_success": True})
+    assert context.match_score == 92.5
+    with pytest.raises(ValueError):
+        typed_context("actualizacion_catastral_v1", {"match_score": "alto"})
+
+
+def test_snapshot_from_another_schema_is_rejected(monkeypatch):
+    """Una instantánea de un esquema distinto no se restaura."""
+    data = dump_snapshot("certificado_libertad_v1", {"clave_catastral": "09-123-456", "liens_found": False})
+    monkeypatch.setitem(contexto._FINGERPRINTS, "certificado_libertad_v1", 0)
+
+    with pytest.raises(ValueError):
+        load_snapshot(data)
+
+
+def test_snapshot_from_before_appended_fields_is_restored(monkeypatch):
+    """Una instantánea guardada antes de agregar campos al final del modelo se restaura."""
+    fields = contexto._FIELDS["avaluo_catastral_v1"]
+    with monkeypatch.context() as previous:
+        previous.setitem(contexto._FIELDS, "avaluo_catastral_v1", fields[:-2])
+        previous.setitem(contexto._FINGERPRINTS, "avaluo_catastral_v1", contexto._fingerprint(fields[:-2]))
+        data = dump_snapshot("avaluo_catastral_v1", {"clave_catastral": "09-123-456", "valor_catastral": 1000.0,
+                                                     "records_complete": True})
+
+    snapshot = load_snapshot(data)
+
+    assert context_dict(snapshot.context) == {"clave_catastral": "09-123-456", "valor_catastral": 1000.0,
+                                              "records_complete": True}
+    assert getattr(snapshot.context, fields[-1]) is None
+
+
+def test_explicit_none_survives_round_trip():
+    """Un campo asignado a None sigue asignado al restaurarse."""
+    context = {"clave_catastral": "09-123-456", "liens_found": None, "property_found": True}
+    snapshot = load_snapshot(dump_snapshot("certificado_libertad_v1", context))
+
+    assert context_dict(snapshot.context) == context
+
+
+def test_actualizacion_fields_survive_round_trip():
+    """Los campos que producen los pasos de actualización son del modelo y sobreviven la instantánea."""
+    context = {
+        "clave_catastral": "09-123-456", "validation_result": "failed", "validation_errors": ["superficie inválido"],
+        "catastro_record": {"propietario": "ANA ROJAS", "superficie": 100.0}, "match_score": 0.0,
+        "linking_issue": "catastro_record_missing", "catastro_update_success": False,
+    }
+    snapshot = load_snapshot(dump_snapshot("actualizacion_catastral_v1", context, step_id="manual_review"))
+
+    assert context_dict(snapshot.context) == context
+    assert set(context) <= set(contexto.ActualizacionContext.model_fields if contexto.PYDANTIC_V2
+                               else contexto.ActualizacionContext.__fields__)
@@ -0,0 +1,103 @@
+"""
+Tests para la caché de datos de mercado por zona.
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from puente_catastral import datos_mercado, resiliencia
+from puente_catastral.datos_mercado import ZoneCache, fetch_zone_analysis, gather_market_data, zone_key
+from puente_catastral.valuacion import perform_valuation
+
+
+def test_zone_key_uses_leading_segments():
+    """La zona son los dos primeros segmentos de la clave."""
+    assert zone_key("09-123-456") == "09-123"
+
+
+class Clock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def test_concurrent_misses_share_one_backend_call():
+    """Las solicitudes simultáneas de una zona hacen una sola consulta."""
+    calls = []
+    release = threading.Event()
+
+    def loader(zone):
+        calls.append(zone)
+        release.wait(10)
+        return {"zona": zone}
+
+    cache = ZoneCache(loader)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get("09-123"))) for _ in range(10)]
+    for thread in threads:
+        thread.start()
+    # Las diez solicitudes llegan mientras la primera consulta sigue en curso
+    while cache.metrics()["misses"] < 10:
+        time.sleep(0.001)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert calls == ["09-123"]
+    assert results == [{"zona": "09-123"}] * 10
+    assert cache.get("09-123") == {"zona": "09-123"}
+    assert cache.metrics()["hits"] == 1
+
+
+def test_stale_entry_is_served_while_revalidating():
+    """Una entrada vencida se sirve mientras se actualiza en segundo plano."""
+    versions = iter([1, 2])
+    clock = Clock()
+    executor = ThreadPoolExecutor(max_workers=1)
+    cache = ZoneCache(lambda zone: next(versions), ttl=60, stale_ttl=600, clock=clock, executor=executor)
+
+    assert cache.get("09-123") == 1
+    clock.now += 61
+    assert cache.get("09-123") == 1
+    executor.shutdown(wait=True)  # Esperar la revalidación en segundo plano
+    assert cache.get("09-123") == 2
+    assert cache.metrics()["refreshes"] == 1
+
+
+def test_least_recently_used_zone_is_evicted():
+    """Al superar el tamaño máximo se desaloja la zona menos usada."""
+    cache = ZoneCache(lambda zone: zone, max_size=2)
+    cache.get("01-001")
+    cache.get("01-002")
+    cache.get("01-001")
+    cache.get("01-003")
+
+    metrics = cache.metrics()
+    assert metrics["evictions"] == 1
+    assert metrics["size"] == 2
+    cache.get("01-001")
+    assert cache.metrics()["hits"] == 2
+
+
+def test_open_circuit_ends_in_insufficient_valuation_data(monkeypatch):
+    """Con el circuito del servicio de mercado abierto el avalúo no continúa, sin excepción."""
+    monkeypatch.setenv("MARKET_DATA_SERVICE_URL", "http://mercado.invalid")
+    monkeypatch.setattr(datos_mercado, "zone_cache", ZoneCache(fetch_zone_analysis))
+    resiliencia.reset()
+    breaker = resiliencia.policy(datos_mercado.MARKET_SERVICE[0]).breaker
+    for _ in range(breaker.failure_threshold):
+        breaker.record_failure()
+
+    context = {"clave_catastral": "09-123-456", "property_record": {"superficie_terreno": 200}}
+    try:
+        context.update(gather_market_data(None, context))
+    finally:
+        resiliencia.reset()
+
+    assert context["valuation_result"] == "insufficient_data"
+    assert context["unavailable_sources"] == ["market_data_service"]
+    assert perform_valuation(None, context)["valuation_result"] == "insufficient_data"
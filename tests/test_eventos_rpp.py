@@ -0,0 +1,131 @@
+"""
+Tests para el consumidor del feed de eventos del RPP.
+"""
+
+from datetime import date
+
+import pytest
+from puente_catastral import eventos_rpp, gravamenes
+from puente_catastral.comparables import ComparablesIndex
+from puente_catastral.eventos_rpp import RppEventConsumer
+from puente_catastral.gravamenes import LienIndex
+
+FEED = [
+    {"event": "inscripcion", "lien_id": "H-1", "clave_catastral": "09-123-456", "folio_real": "F-100",
+     "tipo_gravamen": "hipoteca", "fecha_inicio": "2020-01-15", "sequence": 1},
+    {"event": "compraventa", "clave_catastral": "09-123-457", "sequence": 2},
+    {"event": "cancelacion", "lien_id": "H-1", "fecha_cancelacion": "2024-06-30", "sequence": 3},
+]
+
+
+@pytest.fixture
+def feed(monkeypatch):
+    """Feed simulado: devuelve hasta ``limit`` eventos posteriores a ``after_sequence``."""
+    invalidated = []
+
+    def call_service(service_name, endpoint, payload, timeout=None):
+        events = [event for event in FEED if event["sequence"] > payload["after_sequence"]]
+        return {"events": events[:payload["limit"]], "last_sequence": FEED[-1]["sequence"]}
+
+    monkeypatch.setattr(eventos_rpp.servicios, "call_service", call_service)
+    monkeypatch.setattr(eventos_rpp, "invalidate_parcel", invalidated.append)
+    return invalidated
+
+
+def test_feed_keeps_lien_index_current(feed):
+    """Los eventos se aplican en orden e invalidan los certificados del predio."""
+    index = LienIndex()
+    consumer = RppEventConsumer(index, ComparablesIndex())
+
+    assert consumer.poll() == 3
+    assert index.last_sequence == 3
+    assert consumer.is_current()
+    assert index.active_liens("09-123-456", "2023-01-01")[0]["lien_id"] == "H-1"
+    assert index.active_liens("09-123-456", "2024-07-01") == []
+    assert feed == ["09-123-456", "09-123-456", "F-100"]
+
+
+def test_index_behind_the_feed_is_not_current(feed):
+    """Mientras falten eventos por aplicar el índice no está al día."""
+    consumer = RppEventConsumer(LienIndex(), ComparablesIndex())
+    assert not consumer.is_current()
+
+    consumer.poll(limit=1)
+    assert consumer.head_sequence == 3
+    assert not consumer.is_current()
+
+    consumer.poll(limit=10)
+    assert consumer.is_current()
+
+
+def test_stale_sync_fails_closed(feed, monkeypatch):
+    """Si el feed deja de leerse, el índice deja de considerarse al día."""
+    consumer = RppEventConsumer(LienIndex(), ComparablesIndex(), max_lag=60)
+    consumer.poll()
+    monkeypatch.setattr(eventos_rpp.time, "time", lambda: consumer.synced_at + 61)
+
+    assert not consumer.is_current()
+
+
+def test_lien_index_check_uses_default_consumer(feed, monkeypatch):
+    """La condición del workflow consulta el consumidor del proceso."""
+    consumer = RppEventConsumer(LienIndex(), ComparablesIndex())
+    monkeypatch.setattr(eventos_rpp, "_default_consumer", consumer)
+
+    assert eventos_rpp.lien_index_current(None, {}) is False
+    consumer.poll()
+    assert eventos_rpp.lien_index_current(None, {}) is True
+
+
+def test_default_consumer_is_current_on_first_certificate(feed, monkeypatch):
+    """El consumidor que lee el feed se pone al día antes de la primera condición."""
+    monkeypatch.setattr(eventos_rpp, "_default_consumer", None)
+    monkeypatch.setattr(gravamenes, "_default_index", LienIndex())
+    comparables = ComparablesIndex()
+    monkeypatch.setattr(eventos_rpp, "default_comparables", lambda: comparables)
+    monkeypatch.setattr(RppEventConsumer, "ensure_worker", lambda self: None)
+
+    assert eventos_rpp.lien_index_current(None, {}) is True
+
+
+def test_process_without_feed_follows_published_index(feed, tmp_path):
+    """Un proceso que no lee el feed ve el índice y la sincronización publicados."""
+    path = str(tmp_path / "gravamenes.npy")
+    writer = RppEventConsumer(LienIndex(), ComparablesIndex(), path=path, compact_interval=0)
+    reader = RppEventConsumer(LienIndex(), ComparablesIndex(), path=path)
+    reader.refresh()
+    assert not reader.is_current()
+
+    writer.poll(limit=1)
+    reader.refresh()
+    assert not reader.is_current()
+    assert reader.index.active_liens("09-123-456", "2024-07-01")[0]["lien_id"] == "H-1"
+
+    writer.poll()
+    reader.refresh()
+    assert reader.is_current()
+    assert reader.index.last_sequence == 3
+    assert reader.index.active_liens("09-123-456", "2024-07-01") == []
+    assert writer.metrics["compactions"] == 2
+
+
+def test_sale_events_feed_comparables(monkeypatch):
+    """Las compraventas recientes del feed se agregan al índice de comparables."""
+    today = date.today().isoformat()
+    events = [
+        {"event": "compraventa", "sequence": 4, "latitud": 19.4326, "longitud": -99.1332, "fecha": today,
+         "uso_suelo": "habitacional", "precio_m2": 30000},
+        {"event": "compraventa", "sequence": 5, "latitud": 19.4330, "longitud": -99.1335, "fecha": "2001-01-01"},
+    ]
+    monkeypatch.setattr(eventos_rpp.servicios, "call_service", lambda service_name, endpoint, payload, timeout=None:
+                        {"events": [e for e in events if e["sequence"] > payload["after_sequence"]],
+                         "last_sequence": 5})
+    index, comparables = LienIndex(last_sequence=3), ComparablesIndex(cell_size=100)
+    consumer = RppEventConsumer(index, comparables)
+
+    consumer.poll()
+
+    assert len(comparables) == 1
+    assert comparables.last_sequence == index.last_sequence == 5
+    assert comparables.nearest(19.4327, -99.1333)[0]["precio_m2"] == 30000
+    assert consumer.is_current()
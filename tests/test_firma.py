@@ -0,0 +1,100 @@
+"""
+Tests para la firma de certificados por lotes.
+"""
+
+import hashlib
+import threading
+
+import pytest
+from puente_catastral import firma
+
+
+def _digest(i):
+    return hashlib.sha256(f"certificado-{i}".encode()).digest()
+
+
+@pytest.mark.parametrize("size", [1, 2, 5, 8])
+def test_every_document_has_a_valid_inclusion_proof(size):
+    """Cada documento del lote se verifica contra la raíz con su prueba."""
+    hashes = [_digest(i) for i in range(size)]
+    root, proofs = firma.merkle_tree(hashes)
+
+    for document_hash, proof in zip(hashes, proofs):
+        assert firma.verify_inclusion(document_hash, proof, root)
+    assert not firma.verify_inclusion(_digest(99), proofs[0], root)
+
+
+def test_batch_signer_signs_one_root_per_batch():
+    """Los documentos concurrentes comparten una sola firma de raíz."""
+    roots_signed = []
+    signer = firma.BatchSigner(lambda root: roots_signed.append(root) or "firma", batch_size=10, max_wait=0.5)
+
+    results = [None] * 10
+    def sign(i):
+        results[i] = signer.sign(_digest(i))
+    threads = [threading.Thread(target=sign, args=(i,)) for i in range(10)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(roots_signed) == 1
+    assert {result["merkle_root"] for result in results} == {roots_signed[0].hex()}
+    for i, result in enumerate(results):
+        assert firma.verify_inclusion(_digest(i), result["inclusion_proof"], roots_signed[0])
+
+
+def test_sign_certificate_action(monkeypatch):
+    """El paso sign_certificate devuelve firma y prueba de inclusión."""
+    monkeypatch.setenv("PUENTE_SIGNING_KEY", "secreto")
+    monkeypatch.setattr(firma, "_signer", firma.BatchSigner(firma.hmac_signer, max_wait=0.01))
+
+    result = firma.sign_certificate(None, {"clave_catastral": "09-123-456", "liens_found": False})
+
+    assert result["status"] == "signed"
+    assert result["signature"] == firma.hmac_signer(bytes.fromhex(result["merkle_root"]))
+    assert firma.verify_inclusion(bytes.fromhex(result["document_hash"]), result["inclusion_proof"],
+                                  bytes.fromhex(result["merkle_root"]))
+
+
+def test_missing_signing_key_fails_at_configuration(monkeypatch):
+    """Sin llave privada ni firmante configurado el error se reporta antes de firmar."""
+    monkeypatch.setenv("PUENTE_SIGNING_KEY", "secreto")
+    monkeypatch.setattr(firma, "SIGNING_KEY_PATH", None)
+    monkeypatch.setattr(firma, "_signer", None)
+
+    with pytest.raises(firma.SigningConfigurationError):
+        firma.check_signing_configuration()
+
+    firma.configure_signer(firma.hmac_signer)
+    firma.check_signing_configuration()
+
+
+def test_unreadable_private_key_fails_at_configuration(monkeypatch, tmp_path):
+    """Una llave que no carga también se reporta al construir el workflow."""
+    pytest.importorskip("cryptography")
+    key_path = tmp_path / "firma.pem"
+    key_path.write_text("no es una llave")
+    monkeypatch.setattr(firma, "SIGNING_KEY_PATH", str(key_path))
+    monkeypatch.setattr(firma, "_signer", None)
+
+    with pytest.raises(firma.SigningConfigurationError):
+        firma.check_signing_configuration()
+
+
+def test_private_key_signature_verifies_with_public_key(monkeypatch, tmp_path):
+    """Por defecto la raíz se firma con la llave privada y se verifica con la pública."""
+    pytest.importorskip("cryptography")
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.primitives.asymmetric import ed25519
+
+    key = ed25519.Ed25519PrivateKey.generate()
+    key_path = tmp_path / "firma.pem"
+    key_path.write_bytes(key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+                                           serialization.NoEncryption()))
+    monkeypatch.setattr(firma, "SIGNING_KEY_PATH", str(key_path))
+    monkeypatch.setattr(firma, "_signer", None)
+
+    result = firma.sign_certificate(None, {"clave_catastral": "09-123-456", "liens_found": False})
+
+    key.public_key().verify(bytes.fromhex(result["signature"]), bytes.fromhex(result["merkle_root"]))
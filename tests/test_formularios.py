@@ -0,0 +1,49 @@
+"""
+Tests para la validación compilada de formularios.
+"""
+
+from puente_catastral.formularios import FORM_VALIDATORS, compile_form, validate_form_action
+
+FORM = {"fields": [
+    {"name": "clave_catastral", "required": True, "pattern": "^[0-9]{2}-[0-9]{3}-[0-9]{3}$"},
+    {"name": "tipo", "type": "select", "options": ["A", "B"]},
+    {"name": "observaciones"},
+]}
+
+
+def test_validate_many_returns_errors_per_row():
+    """El lote devuelve los mismos errores que la validación fila por fila."""
+    validator = compile_form(FORM)
+    rows = [
+        {"clave_catastral": "09-123-456", "tipo": "A"},
+        {"clave_catastral": "", "tipo": "C"},
+        {"clave_catastral": "09-123-456\n"},
+        {"tipo": "B", "observaciones": "sin clave"},
+    ]
+    errors = validator.validate_many(rows)
+    assert errors == [
+        [],
+        ["clave_catastral requerido", "tipo inválido"],
+        ["clave_catastral inválido"],
+        ["clave_catastral requerido"],
+    ]
+    assert errors == [validator.validate(row) for row in rows]
+
+
+def test_workflow_forms_share_compiled_validator():
+    """Los formularios de los workflows se compilan al cargar y validan el paso interactivo."""
+    assert set(FORM_VALIDATORS) == {"actualizacion_catastral_v1", "certificado_libertad_v1", "avaluo_catastral_v1"}
+    action = validate_form_action("actualizacion_catastral_v1")
+    assert action(None, {"clave_catastral": "09-123-456", "tipo_actualizacion": "Cambio de propietario",
+                         "observaciones": "x"})["validation_result"] == "success"
+    failed = action(None, {"clave_catastral": "9-12-456", "tipo_actualizacion": "Otro"})
+    assert failed["validation_result"] == "failed"
+    assert "clave_catastral inválido" in failed["validation_errors"]
+
+
+def test_unhashable_select_value_is_invalid():
+    """Un valor no hashable en un campo select es un error de la fila, no una excepción."""
+    validator = compile_form(FORM)
+    rows = [{"clave_catastral": "09-123-456", "tipo": ["A"]}, {"clave_catastral": "09-123-456", "tipo": {"A": 1}}]
+
+    assert validator.validate_many(rows) == [["tipo inválido"], ["tipo inválido"]]
@@ -0,0 +1,65 @@
+"""
+Tests para el índice local de gravámenes.
+"""
+
+import pytest
+from puente_catastral.gravamenes import LienIndex, analyze_lien_status
+
+EVENTS = [
+    {"event": "inscripcion", "lien_id": "H-1", "clave_catastral": "09-123-456", "folio_real": "F-100",
+     "tipo_gravamen": "hipoteca", "fecha_inicio": "2020-01-15", "sequence": 1},
+    {"event": "inscripcion", "lien_id": "E-1", "clave_catastral": "09-123-456",
+     "tipo_gravamen": "embargo", "fecha_inicio": "2023-03-01", "fecha_fin": "2023-09-01", "sequence": 2},
+    {"event": "cancelacion", "lien_id": "H-1", "fecha_cancelacion": "2024-06-30", "sequence": 3},
+]
+
+
+def test_active_liens_at_date():
+    """Sólo se devuelven los gravámenes vigentes en la fecha consultada."""
+    index = LienIndex()
+    index.apply_events(EVENTS)
+
+    assert [lien["lien_id"] for lien in index.active_liens("09-123-456", "2019-12-31")] == []
+    assert [lien["lien_id"] for lien in index.active_liens("09-123-456", "2023-05-01")] == ["H-1", "E-1"]
+    assert [lien["lien_id"] for lien in index.active_liens("F-100", "2024-01-01")] == ["H-1"]
+    assert index.active_liens("09-123-456", "2024-07-01") == []
+
+
+def test_compacted_index_is_memory_mapped(tmp_path):
+    """El índice compactado se reabre desde disco con el mismo contenido."""
+    index = LienIndex()
+    index.apply_events(EVENTS[:2])
+    path = str(tmp_path / "gravamenes.npy")
+
+    loaded = index.compact(path)
+    loaded.apply_event(EVENTS[2])
+
+    assert loaded.last_sequence == 3
+    assert [lien["lien_id"] for lien in loaded.active_liens("09-123-456", "2023-05-01")] == ["H-1", "E-1"]
+    assert loaded.active_liens("F-100", "2024-07-01") == []
+    assert LienIndex.load(path).last_sequence == 2
+
+
+def test_analyze_lien_status_uses_default_index(monkeypatch):
+    """El paso analyze_lien_status consulta el índice del proceso."""
+    index = LienIndex()
+    index.apply_events(EVENTS[:1])
+    monkeypatch.setattr("puente_catastral.gravamenes._default_index", index)
+
+    result = analyze_lien_status(None, {"clave_catastral": "09-123-456", "rpp_records": [{"folio_real": "F-100"}]})
+
+    assert result["liens_found"] is True
+    assert [lien["lien_id"] for lien in result["gravamenes"]] == ["H-1"]
+    assert analyze_lien_status(None, {"clave_catastral": "01-001-001"})["liens_found"] is False
+
+
+def test_lien_keys_of_compacted_and_pending_liens(tmp_path):
+    """Las llaves de un gravamen se encuentran tanto en la base compactada como en la capa incremental."""
+    index = LienIndex()
+    index.apply_events(EVENTS[:1])
+    index.compact(str(tmp_path / "gravamenes.npy"))
+    index.apply_event(EVENTS[1])
+
+    assert sorted(index.lien_keys("H-1")) == ["09-123-456", "F-100"]
+    assert index.lien_keys("E-1") == ["09-123-456"]
+    assert index.lien_keys("X-9") == []
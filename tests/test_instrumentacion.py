@@ -0,0 +1,58 @@
+"""
+Tests para la instrumentación por paso.
+"""
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from puente_catastral import instrumentacion
+from puente_catastral.instrumentacion import StepMetrics, instrument_workflow
+
+
+def _workflow():
+    manual_review = SimpleNamespace(step_id="manual_review_required", next_steps=[])
+    update = SimpleNamespace(step_id="update_catastral_record", next_steps=[],
+                             execute=lambda instance, context: {"status": "updated"})
+    decision = SimpleNamespace(step_id="linking_decision", next_steps=[update, manual_review],
+                               condition=lambda instance, context: context["match_score"] >= 90)
+    failing = SimpleNamespace(step_id="sync_to_rpp", next_steps=[], action=lambda instance, context: 1 / 0)
+    return SimpleNamespace(steps={step.step_id: step for step in (decision, update, manual_review, failing)})
+
+
+def test_steps_record_latency_outcomes_and_branches():
+    """Cada paso registra latencia y resultado; las condiciones, la rama tomada."""
+    registry = StepMetrics()
+    workflow = instrument_workflow("actualizacion_catastral_v1", _workflow(), registry)
+    steps = workflow.steps
+
+    for score in (95, 40, 30):
+        steps["linking_decision"].condition(None, {"match_score": score})
+    steps["update_catastral_record"].execute(None, {})
+    with pytest.raises(ZeroDivisionError):
+        steps["sync_to_rpp"].action(None, {})
+
+    assert registry.branch_counts("actualizacion_catastral_v1", "linking_decision") == {
+        "update_catastral_record": 1, "manual_review_required": 2}
+    assert registry.outcome_counts("actualizacion_catastral_v1", "sync_to_rpp") == {"error": 1}
+    text = registry.render_prometheus()
+    assert ('puente_step_duration_seconds_count{workflow="actualizacion_catastral_v1",'
+            'step="update_catastral_record",kind="SimpleNamespace"} 1') in text
+    assert ('puente_step_branches_total{workflow="actualizacion_catastral_v1",step="linking_decision",'
+            'branch="manual_review_required"} 2') in text
+
+
+def test_async_steps_and_trace_spans(monkeypatch):
+    """Los pasos asíncronos se miden y, con PUENTE_TRACE, dejan spans por instancia."""
+    monkeypatch.setattr(instrumentacion, "TRACE", True)
+    registry = StepMetrics()
+
+    async def execute(instance, context):
+        return {"status": "searched"}
+
+    step = SimpleNamespace(step_id="search_unified_records", next_steps=[], execute=execute)
+    instrument_workflow("certificado_libertad_v1", SimpleNamespace(steps=[step]), registry)
+    asyncio.run(step.execute(SimpleNamespace(instance_id="abc"), {}))
+
+    [span] = registry.spans("abc")
+    assert span["step_id"] == "search_unified_records" and span["outcome"] == "ok"
@@ -0,0 +1,111 @@
+"""
+Tests para la bandeja de salida de sincronización al RPP.
+"""
+
+import pytest
+from puente_catastral import cache_certificados, outbox
+from puente_catastral.outbox import SyncOutbox
+
+
+@pytest.fixture
+def rpp(monkeypatch, tmp_path):
+    """Servicio RPP simulado; ``responses`` define el resultado por clave."""
+    monkeypatch.setattr(cache_certificados, "_default_store",
+                        cache_certificados.GenerationStore(str(tmp_path / "generations.sqlite3")))
+    state = {"batches": [], "responses": {}}
+
+    def call_service(service_name, endpoint, payload, timeout=None):
+        state["batches"].append(payload["records"])
+        return {"results": [state["responses"].get(r["clave_catastral"], {"sync_success": True})
+                            for r in payload["records"]]}
+
+    monkeypatch.setattr(outbox.servicios, "call_service", call_service)
+    monkeypatch.setattr(outbox, "RETRY_BASE_SECONDS", 0)
+    return state
+
+
+def test_changes_to_same_parcel_are_coalesced(tmp_path, rpp):
+    """Varios cambios del mismo predio se envían como una sola entrada."""
+    box = SyncOutbox(str(tmp_path / "outbox.sqlite3"))
+    box.enqueue({"clave_catastral": "09-123-456", "propietario": "ANA"})
+    key = box.enqueue({"clave_catastral": "09-123-456", "direccion": "CALLE 1"})
+    box.enqueue({"clave_catastral": "09-123-457", "propietario": "LUIS"})
+
+    assert box.pending_count() == 2
+    assert box.drain()["delivered"] == 2
+    sent = {record["clave_catastral"]: record for record in rpp["batches"][0]}
+    assert sent["09-123-456"] == {"clave_catastral": "09-123-456", "propietario": "ANA",
+                                  "direccion": "CALLE 1", "idempotency_key": key}
+    assert box.pending_count() == 0
+
+
+def test_entries_survive_restart(tmp_path, rpp):
+    """Las entradas guardadas siguen pendientes al reabrir la bandeja."""
+    path = str(tmp_path / "outbox.sqlite3")
+    SyncOutbox(path).enqueue({"clave_catastral": "09-123-456"})
+
+    assert SyncOutbox(path).pending_count() == 1
+
+
+def test_failed_entries_are_retried_then_compensated(tmp_path, rpp, monkeypatch):
+    """Los fallos se reintentan y, al agotar los intentos, se compensan."""
+    monkeypatch.setattr(outbox, "MAX_ATTEMPTS", 2)
+    compensated = []
+    box = SyncOutbox(str(tmp_path / "outbox.sqlite3"), compensate=compensated.append)
+    rpp["responses"]["09-123-456"] = {"sync_success": False, "error": "timeout"}
+    box.enqueue_many([{"clave_catastral": "09-123-456"}, {"clave_catastral": "09-123-457"}])
+
+    assert box.drain() == {"delivered": 1, "retried": 1, "compensated": 0}
+    assert box.drain() == {"delivered": 0, "retried": 0, "compensated": 1}
+    assert [entry["clave_catastral"] for entry in compensated] == ["09-123-456"]
+    assert box.pending_count() == 0
+
+
+def test_change_during_delivery_is_sent_again(tmp_path, rpp):
+    """Un cambio combinado mientras se enviaba la entrada no se pierde."""
+    box = SyncOutbox(str(tmp_path / "outbox.sqlite3"))
+    box.enqueue({"clave_catastral": "09-123-456", "propietario": "ANA"})
+    entries = box._due(10)
+    box.enqueue({"clave_catastral": "09-123-456", "propietario": "LUIS"})
+    box._delete(entries[0])
+
+    assert box.pending_count() == 1
+
+
+def test_concurrent_workers_claim_disjoint_entries(tmp_path, rpp):
+    """Dos workers sobre la misma tabla no toman la misma entrada mientras dura el arrendamiento."""
+    path = str(tmp_path / "outbox.sqlite3")
+    first, second = SyncOutbox(path), SyncOutbox(path)
+    first.enqueue_many([{"clave_catastral": f"09-123-{i:03d}"} for i in range(5)])
+
+    claimed = first._due(3)
+    other = second._due(10)
+
+    assert len(claimed) == 3 and len(other) == 2
+    assert not {entry["id"] for entry in claimed} & {entry["id"] for entry in other}
+    assert second._due(10) == []
+
+
+def test_coalesced_entry_is_compensated_change_by_change(tmp_path, rpp, monkeypatch):
+    """Cada cambio combinado se revierte con la llave que recibió su workflow."""
+    monkeypatch.setattr(outbox, "MAX_ATTEMPTS", 1)
+    compensated = []
+    box = SyncOutbox(str(tmp_path / "outbox.sqlite3"), compensate=compensated.append)
+    rpp["responses"]["09-123-456"] = {"sync_success": False, "retryable": False, "error": "rechazado"}
+    first = box.enqueue({"clave_catastral": "09-123-456", "propietario": "ANA"})
+    second = box.enqueue({"clave_catastral": "09-123-456", "direccion": "CALLE 1"})
+
+    assert box.drain()["compensated"] == 1
+    assert compensated == [
+        {"clave_catastral": "09-123-456", "direccion": "CALLE 1", "idempotency_key": second},
+        {"clave_catastral": "09-123-456", "propietario": "ANA", "idempotency_key": first},
+    ]
+
+
+def test_outbox_path_must_be_configured(monkeypatch):
+    """Sin PUENTE_OUTBOX_PATH no se crea una bandeja en el directorio actual."""
+    monkeypatch.setattr(outbox, "OUTBOX_PATH", None)
+    monkeypatch.setattr(outbox, "_default_outbox", None)
+
+    with pytest.raises(RuntimeError):
+        outbox.default_outbox()
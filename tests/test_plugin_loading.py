@@ -0,0 +1,100 @@
+"""
+Tests de carga diferida del plugin.
+"""
+
+import importlib.util
+import os
+import subprocess
+import sys
+
+import yaml
+from puente_catastral import catastral_workflows
+
+ROOT = os.path.join(os.path.dirname(__file__), "..")
+
+
+def test_civicstream_yaml_workflows_are_registered():
+    """Cada función declarada en civicstream.yaml tiene un workflow registrado."""
+    with open(os.path.join(ROOT, "civicstream.yaml"), encoding="utf-8") as config:
+        functions = [entry["function"] for entry in yaml.safe_load(config)["workflows"]]
+
+    registered = {function for _, function in catastral_workflows.WORKFLOW_MODULES.values()}
+    assert functions
+    for function in functions:
+        assert function in registered
+        assert callable(getattr(catastral_workflows, function))
+
+
+def test_registry_is_derived_from_manifest(tmp_path):
+    """El registro sale de civicstream.yaml: cada workflow apunta a un módulo existente."""
+    assert set(catastral_workflows.WORKFLOW_MODULES) == {
+        "actualizacion_catastral_v1", "certificado_libertad_v1", "avaluo_catastral_v1"}
+    for module_name, function in catastral_workflows.WORKFLOW_MODULES.values():
+        assert importlib.util.find_spec(module_name, "puente_catastral") is not None
+
+    manifest = tmp_path / "civicstream.yaml"
+    manifest.write_text("workflows:\n  - module: puente_catastral.catastral_workflows\n"
+                        "    function: create_nuevo_tramite_workflow\n")
+    assert catastral_workflows.load_manifest(str(manifest)) == {
+        "nuevo_tramite_v1": (".nuevo_tramite", "create_nuevo_tramite_workflow")}
+
+
+def test_manifest_honours_module_and_id(tmp_path):
+    """Se respetan el ``id`` declarado y las funciones de otros módulos, en cualquier formato YAML."""
+    manifest = tmp_path / "civicstream.yaml"
+    manifest.write_text("workflows:\n"
+                        "  - function: create_avaluo_catastral_workflow\n"
+                        "    module: puente_catastral.catastral_workflows\n"
+                        "    id: avaluo_catastral_v2\n"
+                        "  - {module: otro_plugin.tramites, function: crear_tramite, id: tramite_externo_v1}\n")
+
+    assert catastral_workflows.load_manifest(str(manifest)) == {
+        "avaluo_catastral_v2": (".avaluo_catastral", "create_avaluo_catastral_workflow"),
+        "tramite_externo_v1": ("otro_plugin.tramites", "crear_tramite"),
+    }
+
+
+def test_plugin_import_is_lazy():
+    """Importar el módulo principal no carga los módulos de cada workflow."""
+    code = ("import sys, puente_catastral.catastral_workflows; "
+            "print(any(m.endswith(('actualizacion_catastral', 'certificado_libertad', 'avaluo_catastral')) "
+            "for m in sys.modules))")
+    result = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == "False"
+
+
+def test_plugin_import_does_not_load_heavy_dependencies():
+    """Importar el plugin no carga numpy, los clientes HTTP, pydantic ni los servicios (ver bench_import.py)."""
+    heavy = ("numpy", "requests", "httpx", "pydantic", "puente_catastral.servicios", "puente_catastral.vinculacion")
+    code = f"import sys, puente_catastral.catastral_workflows; print([m for m in {heavy!r} if m in sys.modules])"
+    result = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == "[]"
+
+
+def test_definition_version_covers_dependent_modules():
+    """La versión de una definición depende de los formularios y acciones que importa."""
+    modules = catastral_workflows.definition_modules("puente_catastral.actualizacion_catastral")
+    assert "puente_catastral.formularios" in modules
+    assert "puente_catastral.vinculacion" in modules
+    assert "puente_catastral.servicios" in modules
+
+
+def test_definition_version_changes_on_reload(tmp_path, monkeypatch):
+    """La versión se calcula una vez y cambia al recargar si cambió un módulo del que depende."""
+    package = tmp_path / "paquete_prueba"
+    package.mkdir()
+    (package / "__init__.py").write_text("")
+    (package / "acciones.py").write_text("VALOR = 1\n")
+    (package / "definicion.py").write_text("from .acciones import VALOR\n\ndef create():\n    return VALOR\n")
+    monkeypatch.syspath_prepend(str(tmp_path))
+    monkeypatch.setattr(catastral_workflows, "__package__", "paquete_prueba")
+    from paquete_prueba.definicion import create
+
+    try:
+        first = catastral_workflows.definition_version(create)
+        (package / "acciones.py").write_text("VALOR = 2  # cambio\n")
+        assert catastral_workflows.definition_version(create) == first
+        catastral_workflows.reload_definitions()
+        assert catastral_workflows.definition_version(create) != first
+    finally:
+        catastral_workflows.reload_definitions()
@@ -0,0 +1,73 @@
+"""
+Tests para la precarga especulativa de consultas.
+"""
+
+import time
+
+import pytest
+from puente_catastral import cache_certificados, integraciones, prefetch
+from puente_catastral.integraciones import Prefetcher, TokenBucket
+
+
+@pytest.fixture
+def service(monkeypatch):
+    """Servicio simulado que registra cada llamada."""
+    calls = []
+
+    def call_service(service_name, endpoint, payload, timeout=None):
+        calls.append((endpoint, payload))
+        return {"records": [{"folio_real": "FR-1"}]}
+
+    monkeypatch.setattr(integraciones.servicios, "call_service", call_service)
+    monkeypatch.setattr(integraciones, "PREFETCH_ENABLED", True)
+    monkeypatch.setattr(integraciones, "prefetcher", Prefetcher(ttl=60))
+    return calls
+
+
+def test_prefetched_result_is_consumed_by_the_step(service):
+    """La búsqueda lanzada durante la captura se reutiliza al enviar el formulario."""
+    assert prefetch.prefetch_form("actualizacion_catastral_v1", {"clave_catastral": "09-123-456"}) == 1
+    action = integraciones.integration_action(integraciones.RPP_SEARCH, ("clave_catastral",), records="rpp_records")
+
+    assert action(None, {"clave_catastral": "09-123-456"}) == {"rpp_records": [{"folio_real": "FR-1"}]}
+    assert len(service) == 1
+    assert integraciones.prefetcher.metrics()["hits"] == 1
+
+
+def test_incomplete_clave_is_not_prefetched(service):
+    """Una clave incompleta o un formulario sin clave no lanza consultas."""
+    assert prefetch.prefetch_form("actualizacion_catastral_v1", {"clave_catastral": "09-12"}) == 0
+    assert prefetch.prefetch_form("certificado_libertad_v1",
+                                  {"search_type": "Dirección", "clave_catastral": "09-123-456"}) == 0
+    assert service == []
+
+
+def test_abandoned_results_expire(service, monkeypatch):
+    """Un resultado no consumido expira y la consulta se repite en vivo."""
+    monkeypatch.setattr(integraciones, "prefetcher", Prefetcher(ttl=0.05))
+    prefetch.prefetch_form("actualizacion_catastral_v1", {"clave_catastral": "09-123-456"})
+    time.sleep(0.1)
+
+    integraciones.fetch("puente_rpp_service", "/api/rpp/search-records", {"clave_catastral": "09-123-456"})
+    assert len(service) == 2
+    assert integraciones.prefetcher.metrics()["expired"] == 1
+
+
+def test_rate_limit_skips_prefetch(service, monkeypatch):
+    """Sin fichas disponibles la precarga se omite."""
+    monkeypatch.setattr(integraciones, "prefetcher", Prefetcher(bucket=TokenBucket(rate=0, burst=1)))
+    assert prefetch.prefetch_form("actualizacion_catastral_v1", {"clave_catastral": "09-123-456"}) == 1
+    assert prefetch.prefetch_form("actualizacion_catastral_v1", {"clave_catastral": "09-123-457"}) == 0
+    assert integraciones.prefetcher.metrics()["rate_limited"] == 1
+
+
+def test_write_discards_prefetched_results(service, monkeypatch, tmp_path):
+    """Una escritura sobre el predio descarta sus consultas precargadas."""
+    store = cache_certificados.GenerationStore(str(tmp_path / "generations.sqlite3"))
+    monkeypatch.setattr(cache_certificados, "certificate_cache", cache_certificados.CertificateCache(generations=store))
+    prefetch.prefetch_form("actualizacion_catastral_v1", {"clave_catastral": "09-123-456"})
+
+    cache_certificados.invalidate_parcel("09-123-456")
+
+    assert integraciones.prefetcher.metrics()["discarded"] == 1
+    assert integraciones.prefetcher.take(*integraciones.RPP_SEARCH, {"clave_catastral": "09-123-456"}) is None
@@ -0,0 +1,141 @@
+"""
+Tests para los timeouts adaptativos, el hedging y el circuit breaker.
+"""
+
+import threading
+
+import pytest
+import requests
+from puente_catastral import integraciones, resiliencia
+from puente_catastral.integraciones import RPP_SEARCH, integration_action
+from puente_catastral.resiliencia import CircuitBreaker, CircuitOpenError, ServicePolicy
+from puente_catastral.vinculacion import auto_linking_process
+
+ENDPOINT = "/api/rpp/search-records"
+
+
+def _never_failure(error):
+    return False
+
+
+@pytest.fixture(autouse=True)
+def fresh_policies():
+    resiliencia.reset()
+    yield
+    resiliencia.reset()
+
+
+def test_breaker_opens_then_lets_one_probe_through():
+    """Tras las fallas consecutivas se falla de inmediato hasta que una prueba tenga éxito."""
+    now = [0.0]
+    breaker = CircuitBreaker(failure_threshold=3, cooldown=30, clock=lambda: now[0])
+    for _ in range(3):
+        breaker.before_call()
+        breaker.record_failure()
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+    now[0] = 31
+    breaker.before_call()  # Llamada de prueba
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    breaker.record_success()
+    assert breaker.state == resiliencia.CLOSED
+
+
+def test_timeout_adapts_to_observed_latency():
+    """El timeout sigue al p99 observado sin exceder el configurado."""
+    policy = ServicePolicy("puente_rpp_service")
+    assert policy.timeout(ENDPOINT, 10.0) == 10.0
+    for _ in range(resiliencia.MIN_SAMPLES):
+        policy.latencies(ENDPOINT).observe(0.4)
+    assert policy.timeout(ENDPOINT, 10.0) == pytest.approx(0.4 * resiliencia.TIMEOUT_MULTIPLIER)
+    assert policy.timeout(ENDPOINT, 1.0) == 1.0
+    assert policy.timeout("/api/otro", 10.0) == 10.0
+
+
+def test_slow_read_is_hedged(monkeypatch):
+    """Una lectura que excede el p95 envía un duplicado y gana la primera respuesta exitosa."""
+    monkeypatch.setattr(resiliencia, "HEDGE_RATIO", 1.0)
+    policy = ServicePolicy("puente_rpp_service")
+    for _ in range(resiliencia.MIN_SAMPLES):
+        policy.latencies(ENDPOINT).observe(0.01)
+    release = threading.Event()
+    responses = [b"lenta", b"duplicado"]
+
+    def send(timeout):
+        response = responses.pop(0)
+        if response == b"lenta":
+            release.wait(10)  # La primera petición no responde hasta terminar la prueba
+        return response
+
+    try:
+        assert policy.call(ENDPOINT, send, 10.0, True, _never_failure) == b"duplicado"
+    finally:
+        release.set()
+    assert policy.metrics()["hedged"] == 1
+    assert policy.metrics()["hedge_wins"] == 1
+
+
+def test_failed_primary_falls_back_to_hedge(monkeypatch):
+    """Si la primera petición falla se usa la respuesta del duplicado."""
+    monkeypatch.setattr(resiliencia, "HEDGE_RATIO", 1.0)
+    policy = ServicePolicy("puente_rpp_service")
+    for _ in range(resiliencia.MIN_SAMPLES):
+        policy.latencies(ENDPOINT).observe(0.01)
+    hedge_sent, primary_failed = threading.Event(), threading.Event()
+    calls = []
+
+    def send(timeout):
+        calls.append(timeout)
+        if len(calls) == 1:
+            hedge_sent.wait(10)
+            primary_failed.set()
+            raise TimeoutError("sin respuesta")
+        hedge_sent.set()
+        primary_failed.wait(10)  # El duplicado responde después de la falla
+        return b"{}"
+
+    assert policy.call(ENDPOINT, send, 10.0, True, _never_failure) == b"{}"
+    assert policy.metrics()["hedge_wins"] == 1
+
+
+def test_fast_primary_is_not_hedged(monkeypatch):
+    """La primera petición que responde antes del p95 no envía duplicado."""
+    monkeypatch.setattr(resiliencia, "HEDGE_RATIO", 1.0)
+    policy = ServicePolicy("puente_rpp_service")
+    for _ in range(resiliencia.MIN_SAMPLES):
+        policy.latencies(ENDPOINT).observe(5.0)
+
+    assert policy.call(ENDPOINT, lambda timeout: b"{}", 10.0, True, _never_failure) == b"{}"
+    assert policy.metrics()["hedged"] == 0
+
+
+def test_open_circuit_sends_rpp_search_to_manual_review(monkeypatch):
+    """Con el circuito del RPP abierto la búsqueda falla rápido hacia la revisión manual."""
+    monkeypatch.setenv("PUENTE_RPP_SERVICE_URL", "http://rpp.invalid")
+    breaker = resiliencia.policy("puente_rpp_service").breaker
+    for _ in range(breaker.failure_threshold):
+        breaker.record_failure()
+    action = integration_action(RPP_SEARCH, ("clave_catastral",), fallback={"rpp_records": []},
+                                records="rpp_records")
+
+    context = {"clave_catastral": "09-123-456"}
+    context.update(action(None, context))
+    assert context["unavailable_sources"] == ["puente_rpp_service"]
+    assert auto_linking_process(None, context)["match_score"] == 0
+    assert resiliencia.policy("puente_rpp_service").metrics()["short_circuited"] == 1
+
+
+def test_unexpected_error_is_not_sent_to_fallback(monkeypatch):
+    """Sólo las fallas de transporte llevan a la rama de resultado negativo."""
+    errors = [ValueError("respuesta mal formada"), requests.ConnectionError("sin conexión")]
+
+    def call_service(*args, **kwargs):
+        raise errors.pop(0)
+    monkeypatch.setattr(integraciones.servicios, "call_service", call_service)
+    action = integration_action(RPP_SEARCH, ("clave_catastral",), fallback={"rpp_records": []})
+
+    with pytest.raises(ValueError):
+        action(None, {"clave_catastral": "09-123-456"})
+    assert action(None, {"clave_catastral": "09-123-456"})["unavailable_sources"] == ["puente_rpp_service"]
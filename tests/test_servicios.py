@@ -0,0 +1,74 @@
+"""
+Tests para el cliente HTTP de los servicios de integración.
+"""
+
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+from puente_catastral import servicios
+
+
+class _FlakyHandler(BaseHTTPRequestHandler):
+    """Responde 503 a la primera petición y 200 a las siguientes."""
+    protocol_version = "HTTP/1.1"
+    requests_seen = 0
+
+    def do_POST(self):
+        type(self).requests_seen += 1
+        self.rfile.read(int(self.headers["Content-Length"]))
+        status = 503 if type(self).requests_seen == 1 else 200
+        body = json.dumps({"ok": status == 200}).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def rpp_server(monkeypatch):
+    _FlakyHandler.requests_seen = 0
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _FlakyHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setenv("PUENTE_RPP_SERVICE_URL", f"http://127.0.0.1:{server.server_port}")
+    monkeypatch.setattr(servicios, "BACKOFF_SECONDS", 0.001)
+    yield server
+    servicios.close_sessions()
+    server.shutdown()
+
+
+def test_session_is_shared_per_service():
+    """Cada servicio reutiliza una sola sesión."""
+    try:
+        assert servicios.get_session("puente_rpp_service") is servicios.get_session("puente_rpp_service")
+        assert servicios.get_session("puente_rpp_service") is not servicios.get_session("market_data_service")
+    finally:
+        servicios.close_sessions()
+
+
+def test_idempotent_endpoint_is_retried(rpp_server):
+    """Las búsquedas se reintentan ante errores 5xx."""
+    assert servicios.call_service("puente_rpp_service", "/api/rpp/search-records", {}) == {"ok": True}
+    assert _FlakyHandler.requests_seen == 2
+
+
+def test_non_idempotent_endpoint_is_not_retried(rpp_server):
+    """Las escrituras no se reintentan."""
+    with pytest.raises(requests.HTTPError):
+        servicios.call_service("puente_rpp_service", "/api/rpp/sync-record", {})
+    assert _FlakyHandler.requests_seen == 1
+
+
+def test_missing_base_url_is_a_configuration_error(monkeypatch):
+    """Sin URL configurada la llamada falla en vez de ir a un host por defecto."""
+    monkeypatch.delenv("PUENTE_RPP_SERVICE_URL", raising=False)
+    monkeypatch.setattr(servicios, "DEFAULT_BASE_URL", None)
+
+    with pytest.raises(RuntimeError):
+        servicios.call_service("puente_rpp_service", "/api/rpp/sync-record", {})
@@ -0,0 +1,82 @@
+"""
+Tests para la deduplicación de llamadas idénticas en curso.
+"""
+
+import asyncio
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from puente_catastral import servicios
+from puente_catastral.singleflight import SingleFlight
+
+
+def _slow(calls, result="ok", delay=0.2):
+    def func():
+        calls.append(threading.current_thread().name)
+        time.sleep(delay)
+        return result
+    return func
+
+
+def test_concurrent_threads_share_one_call():
+    """Las llamadas idénticas en curso desde varios hilos se ejecutan una sola vez."""
+    group, calls = SingleFlight(), []
+    with ThreadPoolExecutor(max_workers=5) as executor:
+        results = list(executor.map(lambda _: group.do("09-123-456", _slow(calls)), range(5)))
+    assert results == ["ok"] * 5
+    assert len(calls) == 1
+    assert group.metrics() == {"calls": 1, "collapsed": 4, "in_flight": 0}
+
+    # Terminada la llamada, la llave se libera: no es una caché
+    assert group.do("09-123-456", _slow(calls, delay=0)) == "ok"
+    assert len(calls) == 2
+
+
+def test_asyncio_tasks_and_threads_share_one_call():
+    """Tareas asyncio y un hilo esperan la misma llamada, incluida su excepción."""
+    group, calls = SingleFlight(), []
+
+    def failing():
+        calls.append(1)
+        time.sleep(0.2)
+        raise ConnectionError("servicio caído")
+
+    def in_thread():
+        with pytest.raises(ConnectionError):
+            group.do("clave", failing)
+
+    async def main():
+        tasks = [asyncio.ensure_future(group.do_async("clave", failing)) for _ in range(3)]
+        await asyncio.sleep(0.05)
+        await asyncio.to_thread(in_thread)
+        return await asyncio.gather(*tasks, return_exceptions=True)
+
+    results = asyncio.run(main())
+    assert all(isinstance(result, ConnectionError) for result in results)
+    assert len(calls) == 1
+    assert group.metrics()["collapsed"] == 3
+
+
+def test_identical_service_reads_are_collapsed(monkeypatch):
+    """Búsquedas idénticas simultáneas al servicio producen una sola petición HTTP."""
+    requests_sent = []
+
+    def request(service_name, endpoint, payload, timeout):
+        requests_sent.append(endpoint)
+        time.sleep(0.2)
+        return json.dumps({"records": []}).encode()
+
+    monkeypatch.setattr(servicios, "_request", request)
+    monkeypatch.setattr(servicios, "single_flight", SingleFlight())
+    payload = {"clave_catastral": "09-123-456"}
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        results = list(executor.map(
+            lambda _: servicios.call_service("puente_linking_service", "/api/unified/search-property", payload),
+            range(4)))
+
+    assert len(requests_sent) == 1
+    assert results == [{"records": []}] * 4
+    assert results[0] is not results[1]
@@ -0,0 +1,69 @@
+"""
+Tests para el motor de valuación catastral.
+"""
+
+import numpy as np
+import pytest
+from puente_catastral.valuacion import (
+    appraise, appraise_sector, encode_use_classes, land_unit_values, perform_valuation
+)
+
+
+def test_appraise_batch():
+    """Terreno por valor de zona más construcción depreciada por edad."""
+    result = appraise(
+        land_surface=np.array([200.0, 500.0]),
+        built_surface=np.array([100.0, 0.0]),
+        use_class=encode_use_classes(["comercial", "baldio"]),
+        zone_unit_value=np.array([2000.0, 1000.0]),
+        age=np.array([10, 0]),
+    )
+    assert result["valor_terreno"].tolist() == [400000.0, 500000.0]
+    assert result["valor_construccion"].tolist() == [990000.0, 0.0]
+    assert result["valor_catastral"].tolist() == [1390000.0, 500000.0]
+
+
+def test_appraise_sector_in_batches():
+    """Un sector se valúa por lotes usando el valor de cada zona."""
+    records = [{"clave_catastral": f"09-{i % 2:03d}-{i:03d}", "superficie_terreno": 100} for i in range(5)]
+    results = list(appraise_sector(records, {"09-000": 1000.0, "09-001": 3000.0}, batch_size=2))
+
+    assert [valuation["valor_catastral"] for _, valuation in results] == [100000.0, 300000.0, 100000.0, 300000.0, 100000.0]
+
+
+def test_perform_valuation_uses_zone_market_data():
+    """El avalúo individual usa el mismo motor con un lote de uno."""
+    context = {
+        "clave_catastral": "09-123-456",
+        "property_record": {"superficie_terreno": 150, "superficie_construccion": 120,
+                            "uso_suelo": "Habitacional", "antiguedad": 70},
+        "market_data": {"valor_unitario_suelo": 3000.0},
+    }
+    result = perform_valuation(None, context)
+
+    assert result["valuation_result"] == "success"
+    assert result["valor_catastral"] == 450000.0 + 120 * 8500.0 * 0.4
+    assert perform_valuation(None, {"clave_catastral": "09-123-456"})["valuation_result"] == "insufficient_data"
+
+
+def test_comparables_yield_land_only_unit_value():
+    """Al precio de cada comparable se le resta su construcción antes de usarlo como valor de suelo."""
+    comparables = [
+        {"precio": 200 * 3000.0 + 100 * 8500.0, "superficie_terreno": 200, "superficie_construccion": 100,
+         "uso_suelo": "habitacional", "antiguedad": 0},
+        {"precio_m2": 2000.0, "superficie_terreno": 300, "superficie_construccion": 0, "uso_suelo": "baldio"},
+        {"precio_m2": 30000.0},
+    ]
+    assert land_unit_values(comparables) == [3000.0, 2000.0]
+
+    context = {"clave_catastral": "09-123-456", "comparables": comparables,
+               "property_record": {"superficie_terreno": 100, "superficie_construccion": 0, "uso_suelo": "baldio"}}
+    result = perform_valuation(None, context)
+    assert result["valor_catastral"] == 100 * 2500.0
+    assert result["comparables_count"] == 2
+
+
+def test_comparables_without_land_breakdown_are_insufficient():
+    """Ventas sin superficie de terreno y construcción no sirven como valor de suelo."""
+    context = {"clave_catastral": "09-123-456", "comparables": [{"precio_m2": 30000.0}] * 5}
+    assert perform_valuation(None, context)["valuation_result"] == "insufficient_data"
@@ -0,0 +1,83 @@
+"""
+Tests para el motor de vinculación Catastro ↔ RPP.
+"""
+
+import json
+
+import pytest
+from puente_catastral import servicios
+from puente_catastral.integraciones import CATASTRO_RECORD, RPP_SEARCH, integration_action
+from puente_catastral.vinculacion import MATCH_THRESHOLD, auto_linking_process, link_roll, normalize_text
+
+CATASTRO = {"clave_catastral": "09-123-456", "propietario": "José Pérez López",
+            "direccion": "Av. Juárez 123", "superficie": 200}
+
+
+def test_normalize_text_folds_accents_and_punctuation():
+    """La normalización elimina acentos y signos."""
+    assert normalize_text("Av. Juárez #123, Col. Niños Héroes") == "AV JUAREZ 123 COL NINOS HEROES"
+
+
+def test_auto_linking_scores_best_candidate():
+    """El mejor candidato del mismo bloque supera el umbral de vinculación."""
+    candidates = [
+        {"clave_catastral": "09-123-458", "propietario": "María Gómez", "direccion": "Calle 5 de Mayo 10", "superficie": 90},
+        {"clave_catastral": "09-123-456", "propietario": "JOSE PEREZ LOPEZ", "direccion": "AV JUAREZ 123", "superficie": 201},
+        {"clave_catastral": "10-001-001", "propietario": "JOSE PEREZ LOPEZ", "direccion": "AV JUAREZ 123", "superficie": 200},
+    ]
+    result = auto_linking_process(None, {"catastro_record": CATASTRO, "rpp_records": candidates})
+
+    assert result["match_score"] >= MATCH_THRESHOLD
+    assert result["linked_rpp_record"] is candidates[1]
+
+
+def test_auto_linking_without_candidates_requires_review():
+    """Sin candidatos RPP la calificación queda en cero."""
+    result = auto_linking_process(None, {"catastro_record": CATASTRO})
+    assert result["match_score"] == 0.0
+    assert result["linked_rpp_record"] is None
+
+
+def test_auto_linking_from_form_context_uses_catastro_record(monkeypatch):
+    """Con sólo los datos del formulario, la vinculación compara contra el registro consultado en Catastro."""
+    responses = {"puente_catastral_service": {"record": CATASTRO},
+                 "puente_rpp_service": {"records": [dict(CATASTRO, superficie=201)]}}
+    monkeypatch.setattr(servicios, "_request", lambda service_name, endpoint, payload, timeout:
+                        json.dumps(responses[service_name]).encode())
+    context = {"clave_catastral": "09-123-456", "tipo_actualizacion": "Cambio de propietario"}
+
+    context.update(integration_action(CATASTRO_RECORD, ("clave_catastral",), fallback={"catastro_record": None},
+                                      record="catastro_record")(None, context))
+    context.update(integration_action(RPP_SEARCH, ("clave_catastral",), records="rpp_records")(None, context))
+
+    assert auto_linking_process(None, context)["match_score"] >= MATCH_THRESHOLD
+
+
+def test_auto_linking_without_catastro_record_requires_review():
+    """Sin registro catastral no hay atributos que comparar: calificación 0."""
+    context = {"clave_catastral": "09-123-456", "rpp_records": [CATASTRO], "catastro_record": None}
+    result = auto_linking_process(None, context)
+    assert result["match_score"] == 0.0
+    assert result["linking_issue"] == "catastro_record_missing"
+
+
+def test_link_roll_matches_sorted_rolls_in_batches():
+    """La vinculación masiva recorre ambos padrones por bloque."""
+    catastro = [{"clave_catastral": f"01-{i // 10:03d}-{i % 10:03d}", "propietario": f"TITULAR {i}",
+                 "direccion": f"CALLE {i}", "superficie": 100 + i} for i in range(100)]
+    rpp = [dict(record, superficie=record["superficie"] + 1) for record in catastro if record["clave_catastral"] < "01-005"]
+
+    results = list(link_roll(catastro, rpp, batch_size=7))
+
+    assert len(results) == 100
+    for record, match, score in results[:50]:
+        assert match["direccion"] == record["direccion"]
+        assert score >= MATCH_THRESHOLD
+    assert all(match is None for _, match, _ in results[50:])
+
+
+def test_link_roll_requires_sorted_input():
+    """Un padrón desordenado se rechaza."""
+    records = [{"clave_catastral": "02-001-001"}, {"clave_catastral": "01-001-001"}]
+    with pytest.raises(ValueError):
+        list(link_roll(records, []))
@@ -3,6 +3,7 @@ Tests básicos para workflows PUENTE.
 """
 
 import pytest
+from puente_catastral import catastral_workflows, firma
 from puente_catastral.catastral_workflows import (
     create_actualizacion_catastral_workflow,
     create_certificado_libertad_workflow,
@@ -10,6 +11,24 @@ from puente_catastral.catastral_workflows import (
 )
 
 
+def _civicstream_available():
+    try:
+        from puente_catastral import civicstream  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+requires_civicstream = pytest.mark.skipif(not _civicstream_available(), reason="CivicStream no está instalado")
+
+
+@pytest.fixture(autouse=True)
+def signing_key(monkeypatch):
+    """El workflow de certificados exige un firmante configurado al construirse."""
+    monkeypatch.setenv("PUENTE_SIGNING_KEY", "pruebas")
+    monkeypatch.setattr(firma, "_signer", firma.BatchSigner(firma.hmac_signer))
+
+
 def test_actualizacion_catastral_workflow():
     """Test workflow de actualización catastral."""
     workflow = create_actualizacion_catastral_workflow()
@@ -37,4 +56,24 @@ def test_avaluo_catastral_workflow():
     assert workflow["workflow_id"] == "avaluo_catastral_v1"
     assert workflow["name"] == "Avalúo Catastral Unificado"
     assert len(workflow["steps"]) > 0
-    assert workflow["start_step_id"] == "collect_avaluo_request"
\ No newline at end of file
+    assert workflow["start_step_id"] == "collect_avaluo_request"
+
+
+@requires_civicstream
+def test_workflow_registry_returns_shared_definition():
+    """El registro construye cada workflow una sola vez."""
+    assert create_certificado_libertad_workflow() is create_certificado_libertad_workflow()
+
+
+@requires_civicstream
+def test_workflow_registry_invalidates_changed_definition(monkeypatch):
+    """Una nueva clave de versión invalida la definición compilada."""
+    compiled = catastral_workflows.get_compiled_workflow("avaluo_catastral_v1")
+    catastral_workflows.reload_definitions()
+    assert catastral_workflows.get_compiled_workflow("avaluo_catastral_v1") is compiled
+
+    monkeypatch.setattr(catastral_workflows, "definition_version", lambda factory: "changed")
+    recompiled = catastral_workflows.get_compiled_workflow("avaluo_catastral_v1")
+
+    assert recompiled.version == "changed"
+    assert recompiled.workflow is not compiled.workflow